@@ -49,11 +49,32 @@
 
 import json
 import logging
+from typing import Dict
 from agno.agent import Agent
 from app.config import config
+from app.agents.base import arun_agent, parse_batch_response
+from app.rate_limit import RateLimitError
+from app.criteria import evaluate_criteria
+from app.compaction import compact_prompt_data
+from app.json_extract import extract, strip_reasoning
 
 logger = logging.getLogger(__name__)
 
+def _prompt_data(company_data: dict) -> str:
+    if config.COMPACTION['enabled']:
+        return compact_prompt_data("analysis_agent", company_data, config.TOKEN_LIMITS['analysis_agent'])
+    return json.dumps(company_data)
+
+
+def analysis_batch_item(ticker: str, company_data: dict, criteria_result: dict) -> str:
+    """One company's section of a batched analysis prompt"""
+    return (
+        f"{ticker}: {_prompt_data(company_data)}\n"
+        f"  violations (already verified): {json.dumps(criteria_result['criteria_violations'])}; "
+        f"not checkable: {json.dumps(criteria_result['criteria_unknown'])}"
+    )
+
+
 class AnalysisAgent:
     def __init__(self):
         self.agent = Agent(
@@ -66,45 +87,91 @@ class AnalysisAgent:
                 "Assess risk factors based on news sentiment and analyst recommendations",
                 "Generate a summary of financial health and risks",
                 "Output in concise JSON format",
-                "Include 'criteria_violations' array for unmet user criteria"
+                "Criteria violations are computed for you; explain their impact instead of re-checking them"
             ],
             show_tool_calls=False
         )
     
-    def analyze(self, company_data: dict, criteria: dict) -> dict:
-        """Analyze company data against investment criteria"""
+    async def aanalyze(self, company_data: dict, criteria: dict, criteria_result: dict = None) -> dict:
+        """Analyze company data without blocking the event loop"""
         try:
-            # Create enhanced prompt with explicit criteria matching
-            prompt = (
-                f"Analyze this company data based on investor criteria:\n\n"
-                f"{json.dumps(company_data)}\n\n"
-                f"Criteria:\n{json.dumps(criteria)}\n\n"
-                "Explicitly check these user criteria:\n"
-                f"- Max P/E ratio: {criteria.get('max_pe', 'N/A')}\n"
-                f"- Min revenue growth: {criteria.get('min_revenue_growth', 'N/A')}\n"
-                f"- Max debt-to-equity: {criteria.get('max_debt_equity', 'N/A')}\n"
-                "Include 'criteria_violations' array in output for any unmet criteria"
+            criteria_result = criteria_result or evaluate_criteria([company_data], criteria)[0]
+            response = await arun_agent(
+                self.agent,
+                self._build_prompt(company_data, criteria, criteria_result),
+                config.TOKEN_LIMITS['analysis_agent']
             )
-            
-            # Get response
-            response = self.agent.run(prompt)
-            
-            # Extract content
-            if hasattr(response, 'content'):
-                return response.content
-            elif hasattr(response, 'data'):
-                return response.data
-            elif isinstance(response, dict):
-                return response
-            elif isinstance(response, str):
-                try:
-                    return json.loads(response)
-                except:
-                    return {"analysis": response}
-            
-            return {"error": f"Unexpected response type: {type(response)}"}
+            return self._attach_criteria(self._parse_response(response), criteria_result)
+        except RateLimitError:
+            raise
         except Exception as e:
             return {"error": str(e)}
+
+    async def aanalyze_batch(self, items: Dict[str, str], criteria: dict,
+                             criteria_results: Dict[str, dict], max_tokens: int = 0) -> Dict[str, dict]:
+        """Analyze several companies in one call.
+
+        items maps ticker to its analysis_batch_item. Tickers missing from the
+        reply or with an empty analysis are left out for per-ticker fallback.
+        """
+        prompt = (
+            f"Analyze each company below based on investor criteria.\n\n"
+            f"Criteria:\n{json.dumps(criteria)}\n\n"
+            f"Companies:\n" + "\n".join(items.values()) + "\n\n"
+            'Return ONLY a JSON array with one object per company: {"ticker": "...", "analysis": "..."}. '
+            "Each analysis summarizes financial health and risks in light of the verified violations"
+        )
+        response = await arun_agent(self.agent, prompt, max_tokens)
+        tickers = {ticker.upper(): ticker for ticker in items}
+        analyses = {}
+        for element in parse_batch_response(response):
+            ticker = tickers.get(str(element['ticker']).upper())
+            analysis = element.get('analysis')
+            if ticker and analysis:
+                analyses[ticker] = self._attach_criteria(analysis, criteria_results[ticker])
+        return analyses
+
+    def _build_prompt(self, company_data: dict, criteria: dict, criteria_result: dict) -> str:
+        # Numeric criteria are checked by the rule engine; the LLM only narrates
+        return (
+            f"Analyze this company data based on investor criteria:\n\n"
+            f"{_prompt_data(company_data)}\n\n"
+            f"Criteria:\n{json.dumps(criteria)}\n\n"
+            f"Criteria violations (already verified): {json.dumps(criteria_result['criteria_violations'])}\n"
+            f"Criteria not checkable from the data: {json.dumps(criteria_result['criteria_unknown'])}\n"
+            "Summarize financial health and risks in light of these results"
+        )
+
+    def _attach_criteria(self, analysis, criteria_result: dict) -> dict:
+        """Combine the LLM narrative with the rule engine's verdict.
+
+        The result stays a dict, so "error" is only ever a key of failed
+        analyses; it is serialized when the recommendation prompt is built.
+        """
+        if isinstance(analysis, dict) and "error" in analysis:
+            return analysis
+        return {"analysis": analysis, **criteria_result}
+
+    def _parse_response(self, response):
+        # Extract content
+        if hasattr(response, 'content'):
+            content = response.content
+        elif hasattr(response, 'data'):
+            content = response.data
+        else:
+            content = response
+
+        if isinstance(content, dict):
+            return content
+        elif isinstance(content, str):
+            # Keep the structured analysis when there is one, otherwise the narrative
+            extraction = extract(content)
+            if extraction.status == "failed":
+                return strip_reasoning(content)
+            return extraction.value
+
+        return {"error": f"Unexpected response type: {type(response)}"}
+
     def close(self):
         """Close any resources used by this agent"""
         if hasattr(self.agent, 'client') and hasattr(self.agent.client, 'close'):
@@ -0,0 +1,102 @@
+import time
+from typing import List
+from app.concurrency import run_blocking
+from app.metrics import registry
+from app import tracing
+from app.compaction import count_tokens
+from app.json_extract import JSONStreamExtractor, extract
+from app.rate_limit import (
+    RateLimitError, get_limiter, is_rate_limit_error, retry_after_from
+)
+
+LLM_TOKENS = registry.counter("llm_tokens_total", "Tokens reported by the model provider", ["agent", "model", "kind"])
+LLM_CALLS = registry.counter("llm_calls_total", "LLM calls by outcome", ["agent", "model", "outcome"])
+LLM_CALL_SECONDS = registry.histogram("llm_call_seconds", "Wall time of one agent run, excluding limiter waits", ["agent", "model"])
+
+
+def parse_batch_response(response) -> List[dict]:
+    """Read the JSON array of per-ticker objects returned by a batched prompt.
+
+    Accepts a bare array or an object wrapping one (e.g. {"results": [...]}).
+    A truncated reply keeps its complete elements and drops the one that was
+    cut off; anything unparseable yields an empty list so callers fall back
+    per ticker.
+    """
+    content = getattr(response, 'content', response)
+    cut_element = False
+    if isinstance(content, str):
+        root = "["
+        extraction = extract(content, root=root)
+        if extraction.status == "failed":
+            root = "{"
+            extraction = extract(content)
+        if extraction.truncated:
+            cut_element = _cut_inside_element(content, root)
+        content = extraction.value
+    if isinstance(content, dict):
+        content = next((value for value in content.values() if isinstance(value, list)), [])
+    if not isinstance(content, list):
+        return []
+    if cut_element:
+        content = content[:-1]
+    return [item for item in content if isinstance(item, dict) and item.get('ticker')]
+
+
+def _cut_inside_element(text: str, root: str) -> bool:
+    """Whether a reply cut off mid-array stopped inside its last element rather than between two"""
+    scanner = JSONStreamExtractor(root)
+    scanner.feed(text)
+    # The array itself is open at depth 1, or at depth 2 inside a wrapper object
+    return scanner.depth > (1 if root == "[" else 2)
+
+
+def _token_count(response, key: str):
+    metrics = getattr(response, 'metrics', None)
+    if isinstance(metrics, dict) and metrics.get(key):
+        total = metrics[key]
+        return sum(total) if isinstance(total, list) else int(total)
+    return None
+
+
+def _record_tokens(agent_name: str, model_id: str, response, span):
+    for kind, key in (("prompt", "input_tokens"), ("completion", "output_tokens")):
+        count = _token_count(response, key)
+        if count:
+            LLM_TOKENS.inc(count, agent=agent_name, model=model_id, kind=kind)
+            span.set_attribute(f"{kind}_tokens", count)
+
+
+async def arun_agent(agent, prompt: str, max_tokens: int = 0):
+    """Run an agno agent through its async path, falling back to the worker pool.
+
+    Calls are admitted by the shared limiter for the agent's model, and rate
+    limit errors are re-raised as RateLimitError carrying any Retry-After hint.
+    """
+    model_id = getattr(agent.model, 'id', 'default')
+    agent_name = getattr(agent, 'name', None) or 'agent'
+    limiter = get_limiter(model_id)
+    estimated = count_tokens(prompt) + max_tokens
+    with tracing.span("llm.call", agent=agent_name, model=model_id, estimated_tokens=estimated) as span:
+        requested = time.perf_counter()
+        async with limiter.acquire(estimated):
+            start = time.perf_counter()
+            span.set_attribute("limiter_wait_ms", round((start - requested) * 1000, 1))
+            try:
+                if hasattr(agent, 'arun'):
+                    response = await agent.arun(prompt)
+                else:
+                    response = await run_blocking(agent.run, prompt)
+            except Exception as e:
+                LLM_CALL_SECONDS.observe(time.perf_counter() - start, agent=agent_name, model=model_id)
+                if is_rate_limit_error(e):
+                    LLM_CALLS.inc(agent=agent_name, model=model_id, outcome="rate_limited")
+                    retry_after = retry_after_from(e)
+                    limiter.on_rate_limit(retry_after)
+                    raise RateLimitError(str(e), retry_after) from e
+                LLM_CALLS.inc(agent=agent_name, model=model_id, outcome="error")
+                raise
+            LLM_CALL_SECONDS.observe(time.perf_counter() - start, agent=agent_name, model=model_id)
+            LLM_CALLS.inc(agent=agent_name, model=model_id, outcome="ok")
+            _record_tokens(agent_name, model_id, response, span)
+            limiter.on_success(estimated, _token_count(response, 'total_tokens'))
+    return response
@@ -78,26 +78,43 @@
 from agno.agent import Agent
 from agno.tools.yfinance import YFinanceTools
 from app.config import config
-import json
+from app.agents.base import arun_agent
+from app.rate_limit import RateLimitError
+from app.concurrency import run_blocking
+from app.tracing import trace_tool_call
+from app.json_extract import extract, strip_reasoning
+from app.sentiment import add_news_sentiment_batch
+from app.market_store import read_fresh, track_fetched
 import logging
-from textblob import TextBlob  
 
 logger = logging.getLogger(__name__)
 
+
+def finance_tools():
+    """YFinanceTools, or the offline fixture when MODEL_PROVIDER is mock"""
+    if config.MODEL_PROVIDER == "mock":
+        from app.mock_llm import FixtureFinanceTools
+        return FixtureFinanceTools(config.DATA_SOURCE['fixture_path'])
+    return YFinanceTools(
+        stock_price=True,
+        analyst_recommendations=True,
+        stock_fundamentals=True,
+        company_news=True
+    )
+
+
+def add_news_sentiment(company_data: dict):
+    """Add sentiment analysis to news"""
+    add_news_sentiment_batch([company_data])
+
+
 class DataAgent:
     def __init__(self):
         self.agent = Agent(
             name="Financial Data Agent",
             role="Collect comprehensive financial data for SOFTWARE COMPANIES",
             model=config.AGENT_CONFIG["data_agent"],
-            tools=[
-                YFinanceTools(
-                    stock_price=True,
-                    analyst_recommendations=True,
-                    stock_fundamentals=True,
-                    company_news=True
-                )
-            ],
+            tools=[finance_tools()],
             instructions=[
                 "Collect ONLY essential financial data for the given SOFTWARE COMPANY ticker",
                 "Include ONLY: current price, P/E ratio, EPS, debt-to-equity, revenue growth, sentiment score",
@@ -111,60 +128,53 @@ class DataAgent:
                 "  - GOOGL: Use GOOG as fallback",
                 "  - MSFT: Use Microsoft full name if needed"
             ],
+            tool_hooks=[trace_tool_call],
             show_tool_calls=True
         )
     
-    def collect_data(self, ticker: str) -> dict:
-        """Collect financial data for a single company"""
+    async def acollect_data(self, ticker: str) -> dict:
+        """Collect financial data for a single company without blocking the event loop"""
         try:
-            # Special handling for Google
-            if ticker == "GOOGL":
-                logger.info("Collecting Google data")
-                # First try with GOOG
-                response = self.agent.run(f"Collect financial data for GOOG")
-                if not response or (isinstance(response, dict) and "error" in response):
-                    # Then try with full name
-                    response = self.agent.run(f"Get Alphabet Inc. (GOOGL) financial data")
-            else:
-                response = self.agent.run(f"Collect financial data for {ticker}")
-            
-            # Extract content
-            if hasattr(response, 'content'):
-                content = response.content
-            elif hasattr(response, 'data'):
-                content = response.data
-            else:
-                content = response
-            
-            # Parse JSON if string
-            if isinstance(content, str):
-                try:
-                    parsed_content = json.loads(content)
-                except:
-                    parsed_content = {"raw_response": content}
-            elif isinstance(content, dict):
-                parsed_content = content
-            else:
-                parsed_content = {"error": f"Unexpected response type: {type(content)}", "response": str(content)}
-            
-            # Add sentiment analysis to news
-            if 'news' in parsed_content and isinstance(parsed_content['news'], list):
-                for news_item in parsed_content['news']:
-                    if 'title' in news_item:
-                        text = news_item['title']
-                        if 'summary' in news_item and news_item['summary']:
-                            text += " " + news_item['summary']
-                        
-                        # Perform sentiment analysis
-                        analysis = TextBlob(text)
-                        news_item['sentiment'] = {
-                            'polarity': analysis.sentiment.polarity,
-                            'subjectivity': analysis.sentiment.subjectivity
-                        }
-            
+            stored = await run_blocking(read_fresh, ticker)
+            if stored is not None:
+                await run_blocking(add_news_sentiment, stored)
+                return stored
+
+            # Fallback symbols such as GOOG for GOOGL are raced by the orchestrator
+            response = await self._arun(f"Collect financial data for {ticker}")
+
+            parsed_content = self._parse_response(response)
+            await run_blocking(add_news_sentiment, parsed_content)
+            if "error" not in parsed_content and "raw_response" not in parsed_content:
+                await run_blocking(track_fetched, ticker)
             return parsed_content
+        except RateLimitError:
+            raise
         except Exception as e:
             return {"error": str(e)}
+
+    async def _arun(self, prompt: str):
+        return await arun_agent(self.agent, prompt, config.TOKEN_LIMITS['data_agent'])
+
+    def _parse_response(self, response) -> dict:
+        # Extract content
+        if hasattr(response, 'content'):
+            content = response.content
+        elif hasattr(response, 'data'):
+            content = response.data
+        else:
+            content = response
+
+        # Parse JSON if string, repairing it rather than asking the model again
+        if isinstance(content, str):
+            extraction = extract(content)
+            if extraction.status == "failed":
+                return {"raw_response": strip_reasoning(content)}
+            return extraction.value
+        elif isinstance(content, dict):
+            return content
+        return {"error": f"Unexpected response type: {type(content)}", "response": str(content)}
+
     def close(self):
         """Close any resources used by this agent"""
         if hasattr(self.agent, 'client') and hasattr(self.agent.client, 'close'):
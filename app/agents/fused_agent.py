@@ -0,0 +1,81 @@
+import json
+import logging
+from agno.agent import Agent
+from pydantic import ValidationError
+from app.config import config
+from app.agents.base import arun_agent
+from app.compaction import compact_prompt_data
+from app.json_extract import extract
+from app.rate_limit import RateLimitError
+from app.schemas import RecommendationOutput
+
+logger = logging.getLogger(__name__)
+
+
+class FusedAgent:
+    """Produces the final recommendation straight from company data in one schema-constrained call"""
+    def __init__(self):
+        self.agent = Agent(
+            name="Fused Recommendation Agent",
+            role="Analyze company data and generate a structured investment recommendation",
+            model=config.AGENT_CONFIG["fused_agent"],
+            instructions=[
+                "Analyze the company data against the investor criteria",
+                "Criteria violations are computed for you; copy them and explain their impact",
+                "Assess risk from fundamentals, news sentiment and analyst consensus",
+                "key_metrics holds only numbers taken from the provided data"
+            ],
+            response_model=RecommendationOutput,
+            use_json_mode=True,
+            show_tool_calls=False
+        )
+
+    async def arecommend(self, company_data: dict, criteria: dict, criteria_result: dict) -> dict:
+        """Return recommendation fields validated against RecommendationOutput"""
+        try:
+            response = await arun_agent(
+                self.agent,
+                self._build_prompt(company_data, criteria, criteria_result),
+                config.TOKEN_LIMITS['recommendation_agent']
+            )
+            return self._parse_response(response)
+        except RateLimitError:
+            raise
+        except Exception as e:
+            logger.error(f"Fused recommendation error: {str(e)}")
+            return {"error": str(e)}
+
+    def _build_prompt(self, company_data: dict, criteria: dict, criteria_result: dict) -> str:
+        if config.COMPACTION['enabled']:
+            data = compact_prompt_data("fused_agent", company_data, config.TOKEN_LIMITS['analysis_agent'])
+        else:
+            data = json.dumps(company_data)
+        return (
+            f"Company data:\n{data}\n\n"
+            f"Criteria:\n{json.dumps(criteria)}\n\n"
+            f"Criteria violations (already verified): {json.dumps(criteria_result['criteria_violations'])}\n"
+            f"Criteria not checkable from the data: {json.dumps(criteria_result['criteria_unknown'])}"
+        )
+
+    def _parse_response(self, response) -> dict:
+        content = getattr(response, 'content', response)
+        try:
+            if isinstance(content, RecommendationOutput):
+                output = content
+            elif isinstance(content, dict):
+                output = RecommendationOutput.model_validate(content)
+            else:
+                extraction = extract(str(content))
+                if extraction.status == "failed":
+                    return {"error": f"Invalid structured response: {extraction.error}"}
+                output = RecommendationOutput.model_validate(extraction.value)
+        except ValidationError as e:
+            return {"error": f"Invalid structured response: {e.error_count()} validation errors"}
+        return output.model_dump()
+
+    def close(self):
+        if hasattr(self, 'agent') and hasattr(self.agent, 'client'):
+            try:
+                self.agent.client.close()
+            except Exception as e:
+                logger.error(f"Error closing client: {str(e)}")
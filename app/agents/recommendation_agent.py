@@ -136,11 +136,35 @@
 
 import json
 import logging
+from typing import Dict, Union
 from agno.agent import Agent
+from pydantic import ValidationError
 from app.config import config
+from app.agents.base import arun_agent, parse_batch_response
+from app.rate_limit import RateLimitError
+from app.compaction import compact_analysis
+from app.json_extract import extract
+from app.schemas import InvestmentRecommendation
+from app.numeric import normalize_metrics_batch
 
 logger = logging.getLogger(__name__)
 
+BATCH_REQUIRED_FIELDS = ("confidence_score", "investment_thesis", "risk_assessment")
+
+
+def analysis_text(analysis: Union[dict, str]) -> str:
+    """Serialize an analysis for the recommendation prompt"""
+    return analysis if isinstance(analysis, str) else json.dumps(analysis)
+
+
+def recommendation_batch_item(ticker: str, analysis: Union[dict, str]) -> str:
+    """One company's section of a batched recommendation prompt"""
+    analysis = analysis_text(analysis)
+    if config.COMPACTION['enabled']:
+        analysis = compact_analysis("recommendation_agent", analysis, config.TOKEN_LIMITS['recommendation_agent'])
+    return f"{ticker}: {analysis}"
+
+
 class RecommendationAgent:
     def __init__(self):
         self.agent = Agent(
@@ -166,16 +190,63 @@ class RecommendationAgent:
             show_tool_calls=False
         )
 
-    def generate(self, analysis: str) -> dict:
+    async def agenerate(self, analysis: Union[dict, str]) -> dict:
         try:
-            response = self.agent.run(analysis)
+            response = await arun_agent(
+                self.agent, self._build_prompt(analysis), config.TOKEN_LIMITS['recommendation_agent']
+            )
             content = self._extract_content(response)
             recommendation = self._parse_content(content)
             return self._validate_recommendation(recommendation)
+        except RateLimitError:
+            raise
         except Exception as e:
             logger.error(f"Recommendation error: {str(e)}")
             return self._create_error_response(str(e))
 
+    def _build_prompt(self, analysis: Union[dict, str]) -> str:
+        analysis = analysis_text(analysis)
+        if not config.COMPACTION['enabled']:
+            return analysis
+        return compact_analysis("recommendation_agent", analysis, config.TOKEN_LIMITS['recommendation_agent'])
+
+    async def agenerate_batch(self, items: Dict[str, str], max_tokens: int = 0) -> Dict[str, dict]:
+        """Generate recommendations for several analyses in one call.
+
+        items maps ticker to its recommendation_batch_item. Each element of the
+        reply is validated on its own; invalid or missing tickers are left out
+        for per-ticker fallback.
+        """
+        prompt = (
+            "Generate an investment recommendation for each company analysis below.\n\n"
+            + "\n".join(items.values()) + "\n\n"
+            "Return ONLY a JSON array with one object per company. Each object has a \"ticker\" field "
+            "plus the recommendation fields described in your instructions"
+        )
+        response = await arun_agent(self.agent, prompt, max_tokens)
+        tickers = {ticker.upper(): ticker for ticker in items}
+        recommendations = {}
+        elements = parse_batch_response(response)
+        # One pass over every element's metrics instead of one per recommendation
+        batch_metrics = normalize_metrics_batch([element.get('key_metrics') for element in elements])
+        for element, metrics in zip(elements, batch_metrics):
+            element['key_metrics'] = metrics
+        for element in elements:
+            ticker = tickers.get(str(element.pop('ticker')).upper())
+            if ticker is None or any(field not in element for field in BATCH_REQUIRED_FIELDS):
+                continue
+            recommendation = self._validate_recommendation(element)
+            try:
+                InvestmentRecommendation(ticker=ticker, **{
+                    field: recommendation[field] for field in
+                    ("confidence_score", "investment_thesis", "risk_assessment", "key_metrics", "warnings")
+                })
+            except (ValidationError, TypeError) as e:
+                logger.warning(f"Discarding batched recommendation for {ticker}: {str(e)}")
+                continue
+            recommendations[ticker] = recommendation
+        return recommendations
+
     def _extract_content(self, response):
         if hasattr(response, 'content'):
             return response.content
@@ -186,10 +257,11 @@ class RecommendationAgent:
     def _parse_content(self, content):
         if isinstance(content, dict):
             return content
-        try:
-            return json.loads(content)
-        except json.JSONDecodeError:
+        extraction = extract(content)
+        if extraction.status == "failed":
+            logger.warning(f"Unparseable recommendation: {extraction.error}")
             return {"error": "Invalid JSON response"}
+        return extraction.value
 
     def _validate_recommendation(self, rec):
         # Ensure all required fields exist
@@ -209,7 +281,9 @@ class RecommendationAgent:
         return rec
 
     def _create_error_response(self, error):
+        # "error" keeps the orchestrator from caching this as a recommendation
         return {
+            "error": error,
             "confidence_score": 0.0,
             "investment_thesis": f"Error: {error}",
             "risk_assessment": "high",
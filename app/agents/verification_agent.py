@@ -1,34 +1,122 @@
 import logging
-from app.schemas import InvestmentRecommendation
+from typing import Any, Dict, List, Optional
+import numpy as np
+from app.config import config
+from app.features import canonical_metric, extract_features
+from app.numeric import parse_number
 
 logger = logging.getLogger(__name__)
 
+# Unit scales tried on a reported value before comparing it with the source
+# feature: growth rates and margins come back as percentages or fractions,
+# yfinance debtToEquity is a percentage, and market caps are often quoted in
+# millions, billions or trillions
+FRACTION_SCALES = (1.0, 0.01)
+UNIT_SCALES: Dict[str, tuple] = {
+    'debt_to_equity': FRACTION_SCALES,
+    'revenue_growth': FRACTION_SCALES,
+    'earnings_growth': FRACTION_SCALES,
+    'profit_margin': FRACTION_SCALES,
+    'return_on_equity': FRACTION_SCALES,
+    'dividend_yield': FRACTION_SCALES,
+    'price_change_3m': FRACTION_SCALES,
+    'market_cap': (1.0, 1e6, 1e9, 1e12),
+}
+_MAX_SCALES = max(len(scales) for scales in UNIT_SCALES.values())
+
+
+def _as_list(value: Any) -> List[Any]:
+    """Read an LLM field that should be a list: a bare string becomes one item, anything else none"""
+    if isinstance(value, str):
+        return [value]
+    return list(value) if isinstance(value, list) else []
+
+
 class VerificationAgent:
-    def __init__(self):
-        pass
-    
-    def verify(self, recommendation: dict, source_data: dict) -> dict:
-        """Verify recommendation against source data"""
-        warnings = recommendation.get('warnings', [])
-        sources = recommendation.get('sources', [])
-        
-        # Metric verification
-        metric_discrepancies = []
-        for metric, rec_value in recommendation.get('key_metrics', {}).items():
-            src_value = source_data.get('fundamentals', {}).get(metric)
-            if src_value and rec_value and abs(rec_value - src_value) > 0.05 * src_value:
-                metric_discrepancies.append(metric)
-                sources.append(f"Source discrepancy in {metric}: Rec {rec_value} vs Source {src_value}")
-        
-        if metric_discrepancies:
-            warnings.append(f"Metric discrepancies: {', '.join(metric_discrepancies)}")
-        
-        # Confidence check
-        if recommendation.get('confidence_score', 0) < 0.7:
-            warnings.append("Low confidence - human review recommended")
-        
+    """Checks recommended key metrics against the source data, deterministically.
+
+    Metric names are resolved through the feature alias index, so 'pe_ratio',
+    'P/E' and 'trailingPE' all check against the same source field.
+    """
+    def verify(self, recommendation: Dict[str, Any], source_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Verify one recommendation against its company data"""
+        return self.verify_batch([recommendation], [source_data])[0]
+
+    def verify_batch(self, recommendations: List[Dict[str, Any]],
+                     sources: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Verify many recommendations in one vectorized comparison.
+
+        Each result carries structured 'discrepancies' records, the
+        'metric_discrepancies' names and the metrics that could not be checked.
+        """
+        settings = config.VERIFICATION
+        rows, metrics, features, reported, source = [], [], [], [], []
+        unverified = [[] for _ in recommendations]
+        for row, (recommendation, source_data) in enumerate(zip(recommendations, sources)):
+            source_features = extract_features(source_data or {})
+            for metric, value in (recommendation.get('key_metrics') or {}).items():
+                feature = canonical_metric(metric)
+                rec_value = parse_number(value)
+                src_value = source_features.get(feature) if feature else None
+                if rec_value is None or src_value is None:
+                    unverified[row].append(metric)
+                    continue
+                rows.append(row)
+                metrics.append(metric)
+                features.append(feature)
+                reported.append(rec_value)
+                source.append(src_value)
+
+        discrepancies: List[List[dict]] = [[] for _ in recommendations]
+        if rows:
+            reported_values = np.array(reported, dtype=float)
+            source_values = np.array(source, dtype=float)
+            scales = np.full((len(rows), _MAX_SCALES), np.nan)
+            for i, feature in enumerate(features):
+                feature_scales = UNIT_SCALES.get(feature, (1.0,))
+                scales[i, :len(feature_scales)] = feature_scales
+            # Pick the unit reading closest to the source
+            candidates = reported_values[:, None] * scales
+            best = np.nanargmin(np.abs(candidates - source_values[:, None]), axis=1)
+            scaled = candidates[np.arange(len(rows)), best]
+
+            tolerance = np.array([settings['tolerances'].get(f, settings['default_tolerance']) for f in features])
+            floor = np.array([settings['abs_tolerance'].get(f, 0.0) for f in features])
+            error = np.abs(scaled - source_values)
+            allowed = np.maximum(tolerance * np.abs(source_values), floor)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                relative = np.where(source_values != 0, error / np.abs(source_values), np.inf)
+            for i in np.flatnonzero(error > allowed):
+                discrepancies[rows[i]].append({
+                    "metric": metrics[i],
+                    "feature": features[i],
+                    "reported": reported[i],
+                    "source": source[i],
+                    "relative_error": round(float(relative[i]), 4) if np.isfinite(relative[i]) else None,
+                    "tolerance": float(tolerance[i]),
+                })
+
+        return [
+            self._annotate(recommendation, found, missing)
+            for recommendation, found, missing in zip(recommendations, discrepancies, unverified)
+        ]
+
+    def _annotate(self, recommendation: Dict[str, Any], discrepancies: List[dict],
+                  unverified: List[str]) -> Dict[str, Any]:
+        warnings = _as_list(recommendation.get('warnings'))
+        names = [d['metric'] for d in discrepancies]
+        if names:
+            warnings.append(f"Metric discrepancies: {', '.join(names)}")
+
+        confidence = recommendation.get('confidence_score', 0)
+        if confidence < config.MIN_CONFIDENCE:
+            warnings.append(f"Low confidence ({confidence})")
+
         return {
             **recommendation,
             "warnings": warnings,
-            "sources": sources
-        }
\ No newline at end of file
+            "sources": _as_list(recommendation.get('sources')),
+            "discrepancies": discrepancies,
+            "metric_discrepancies": names,
+            "unverified_metrics": unverified,
+        }
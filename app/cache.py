@@ -0,0 +1,285 @@
+import os
+import pickle
+import sqlite3
+import threading
+import time
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+from app.config import config
+from app.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+CACHE_HITS = registry.counter("cache_hits_total", "Cache lookups that returned a value", ["cache"])
+CACHE_MISSES = registry.counter("cache_misses_total", "Cache lookups that found nothing usable", ["cache"])
+CACHE_EVICTIONS = registry.counter("cache_evictions_total", "Entries evicted to respect the size cap", ["cache"])
+CACHE_STALE_HITS = registry.counter(
+    "cache_stale_hits_total", "Expired entries served while a refresh runs", ["cache"]
+)
+CACHE_EXPIRATIONS = registry.counter("cache_expirations_total", "Entries dropped because their TTL passed", ["cache"])
+CACHE_ENTRIES = registry.gauge("cache_entries", "Number of entries currently cached", ["cache"])
+CACHE_HIT_RATIO = registry.gauge("cache_hit_ratio", "Share of lookups served from the cache", ["cache"])
+
+class MemoryBackend:
+    """In-process LRU storage ordered from least to most recently used"""
+    def __init__(self):
+        self._entries: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Tuple[Any, float]]:
+        return self._entries.get(key)
+
+    def touch(self, key: str):
+        self._entries.move_to_end(key)
+
+    def set(self, key: str, value: Any, expires_at: float):
+        self._entries[key] = (value, expires_at)
+        self._entries.move_to_end(key)
+
+    def delete(self, key: str):
+        self._entries.pop(key, None)
+
+    def pop_lru(self):
+        self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+    def close(self):
+        pass
+
+    def __len__(self):
+        return len(self._entries)
+
+
+class SQLiteBackend:
+    """On-disk storage so cached entries survive restarts"""
+    def __init__(self, path: str, table: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.table = table
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} ("
+            "key TEXT PRIMARY KEY, value BLOB, expires_at REAL, accessed_at REAL)"
+        )
+        self._conn.execute(f"CREATE INDEX IF NOT EXISTS {table}_accessed ON {table} (accessed_at)")
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[Tuple[Any, float]]:
+        row = self._conn.execute(
+            f"SELECT value, expires_at FROM {self.table} WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        return pickle.loads(row[0]), row[1]
+
+    def touch(self, key: str):
+        self._conn.execute(f"UPDATE {self.table} SET accessed_at = ? WHERE key = ?", (time.time(), key))
+        self._conn.commit()
+
+    def set(self, key: str, value: Any, expires_at: float):
+        self._conn.execute(
+            f"INSERT OR REPLACE INTO {self.table} (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+            (key, pickle.dumps(value), expires_at, time.time())
+        )
+        self._conn.commit()
+
+    def delete(self, key: str):
+        self._conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+        self._conn.commit()
+
+    def pop_lru(self):
+        self._conn.execute(
+            f"DELETE FROM {self.table} WHERE key = "
+            f"(SELECT key FROM {self.table} ORDER BY accessed_at LIMIT 1)"
+        )
+        self._conn.commit()
+
+    def clear(self):
+        self._conn.execute(f"DELETE FROM {self.table}")
+        self._conn.commit()
+
+    def close(self):
+        self._conn.close()
+
+    def __len__(self):
+        return self._conn.execute(f"SELECT COUNT(*) FROM {self.table}").fetchone()[0]
+
+
+class TTLCache:
+    """Size-bounded LRU cache whose entries expire after a fixed TTL.
+
+    With stale_ttl, expired entries are kept that much longer so get_stale
+    can serve them while the caller refreshes (stale-while-revalidate); get
+    still treats them as misses.
+    """
+    def __init__(self, name: str, ttl: float, max_size: int, backend=None, stale_ttl: float = 0):
+        self.name = name
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.max_size = max_size
+        self.backend = backend or MemoryBackend()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._lock = threading.Lock()
+
+    def _lookup(self, key: str) -> Optional[Tuple[Any, float]]:
+        """Value and seconds of freshness left for an entry that is live or still servable stale"""
+        entry = self.backend.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        now = time.time()
+        if expires_at > now:
+            return value, expires_at - self.stale_ttl - now
+        self.backend.delete(key)
+        self.expirations += 1
+        CACHE_EXPIRATIONS.inc(cache=self.name)
+        return None
+
+    def get(self, key: str, default: Any = None) -> Any:
+        with self._lock:
+            entry = self._lookup(key)
+            if entry is not None and entry[1] > 0:
+                self.backend.touch(key)
+                self.hits += 1
+                CACHE_HITS.inc(cache=self.name)
+                return entry[0]
+            self.misses += 1
+            CACHE_MISSES.inc(cache=self.name)
+            return default
+
+    def get_stale(self, key: str) -> Optional[Tuple[Any, bool]]:
+        """Return (value, fresh) for a live or stale entry, or None on a miss"""
+        with self._lock:
+            entry = self._lookup(key)
+            if entry is None:
+                self.misses += 1
+                CACHE_MISSES.inc(cache=self.name)
+                return None
+            self.backend.touch(key)
+            fresh = entry[1] > 0
+            if fresh:
+                self.hits += 1
+                CACHE_HITS.inc(cache=self.name)
+            else:
+                self.stale_hits += 1
+                CACHE_STALE_HITS.inc(cache=self.name)
+            return entry[0], fresh
+
+    def time_left(self, key: str) -> Optional[float]:
+        """Seconds until the entry goes stale (negative once it has), or None if absent"""
+        with self._lock:
+            entry = self.backend.get(key)
+            if entry is None or entry[1] <= time.time():
+                return None
+            return entry[1] - self.stale_ttl - time.time()
+
+    def peek(self, key: str) -> Any:
+        """Return a live entry without touching LRU order or hit/miss counters"""
+        with self._lock:
+            entry = self.backend.get(key)
+            if entry is not None and entry[1] - self.stale_ttl > time.time():
+                return entry[0]
+            return None
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None):
+        with self._lock:
+            expires_at = time.time() + (self.ttl if ttl is None else ttl) + self.stale_ttl
+            self.backend.set(key, value, expires_at)
+            while len(self.backend) > self.max_size:
+                self.backend.pop_lru()
+                self.evictions += 1
+                CACHE_EVICTIONS.inc(cache=self.name)
+
+    def delete(self, key: str):
+        with self._lock:
+            self.backend.delete(key)
+
+    def clear(self):
+        with self._lock:
+            self.backend.clear()
+
+    def close(self):
+        with self._lock:
+            self.backend.close()
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            entry = self.backend.get(key)
+            return entry is not None and entry[1] - self.stale_ttl > time.time()
+
+    def __len__(self):
+        with self._lock:
+            return len(self.backend)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.stale_hits + self.misses
+        return {
+            "size": len(self),
+            "max_size": self.max_size,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "stale_hits": self.stale_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+_caches: Dict[str, TTLCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache(name: str, ttl: Optional[float] = None, max_size: Optional[int] = None,
+              stale_ttl: float = 0) -> TTLCache:
+    """Return the process-wide cache registered under name, creating it on first use"""
+    with _caches_lock:
+        cache = _caches.get(name)
+        if cache is None:
+            settings = config.CACHE_SETTINGS
+            if settings['backend'] == 'sqlite':
+                backend = SQLiteBackend(settings['path'], table=name)
+            else:
+                backend = MemoryBackend()
+            cache = TTLCache(
+                name,
+                ttl=settings['ttl'] if ttl is None else ttl,
+                max_size=settings['max_size'] if max_size is None else max_size,
+                backend=backend,
+                stale_ttl=stale_ttl
+            )
+            _caches[name] = cache
+            logger.info(f"Created {settings['backend']} cache '{name}' (ttl={cache.ttl}s, max_size={cache.max_size})")
+        return cache
+
+
+def close_caches():
+    with _caches_lock:
+        for cache in _caches.values():
+            try:
+                cache.close()
+            except Exception as e:
+                logger.error(f"Error closing cache {cache.name}: {str(e)}")
+        _caches.clear()
+
+
+def _collect_cache_stats():
+    for cache in list(_caches.values()):
+        stats = cache.stats()
+        CACHE_ENTRIES.set(stats['size'], cache=cache.name)
+        CACHE_HIT_RATIO.set(stats['hit_ratio'], cache=cache.name)
+
+
+def cache_stats() -> Dict[str, Dict[str, Any]]:
+    """Per-cache statistics, one entry per pipeline stage cache"""
+    return {name: cache.stats() for name, cache in list(_caches.items())}
+
+
+registry.register_collector(_collect_cache_stats)
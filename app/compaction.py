@@ -0,0 +1,186 @@
+import json
+import logging
+from typing import Any, Dict, List, Optional
+from app.config import config
+from app.features import canonical_metric, extract_features, TEXT_FEATURES
+from app.metrics import registry
+from app.numeric import parse_number
+from app.rate_limit import estimate_tokens
+from app import tracing
+
+logger = logging.getLogger(__name__)
+
+PROMPT_TOKENS = registry.counter(
+    "prompt_compaction_tokens_total", "Prompt payload tokens before and after compaction", ["agent", "stage"]
+)
+
+_encoding = None
+_encoding_failed = False
+
+
+def _get_encoding():
+    """Load the tiktoken encoding once; None when tiktoken or its data is unavailable"""
+    global _encoding, _encoding_failed
+    if _encoding is None and not _encoding_failed:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding(config.COMPACTION['encoding'])
+        except Exception as e:
+            # The encoding file is downloaded on first use, which fails offline
+            logger.warning(f"tiktoken unavailable, estimating token counts: {str(e)}")
+            _encoding_failed = True
+    return _encoding
+
+
+def count_tokens(text: str) -> int:
+    encoding = _get_encoding()
+    if encoding is None:
+        return estimate_tokens(text)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def truncate_tokens(text: str, limit: int) -> str:
+    """Cut text to at most limit tokens, marking the cut with an ellipsis"""
+    encoding = _get_encoding()
+    if encoding is None:
+        return text if len(text) <= limit * 4 else text[:max(limit * 4 - 3, 0)].rstrip() + "..."
+    tokens = encoding.encode(text, disallowed_special=())
+    if len(tokens) <= limit:
+        return text
+    return encoding.decode(tokens[:max(limit - 1, 0)]).rstrip() + "..."
+
+
+def dumps(payload: Any) -> str:
+    """JSON without the whitespace json.dumps adds by default"""
+    return json.dumps(payload, separators=(",", ":"), default=str)
+
+
+def _round(value: float) -> float:
+    return float(f"{value:.4g}")
+
+
+def _headline(item: Any) -> Optional[str]:
+    if isinstance(item, dict):
+        return item.get('title') or item.get('headline')
+    return item if isinstance(item, str) else None
+
+
+def _sentiment(news: List[Any]) -> Optional[dict]:
+    scores = [
+        item['sentiment'] for item in news
+        if isinstance(item, dict) and isinstance(item.get('sentiment'), dict)
+    ]
+    if not scores:
+        return None
+    polarities = [score.get('polarity', 0.0) for score in scores]
+    return {
+        "polarity": _round(sum(polarities) / len(polarities)),
+        "subjectivity": _round(sum(score.get('subjectivity', 0.0) for score in scores) / len(scores)),
+        "positive": sum(1 for polarity in polarities if polarity > 0.05),
+        "negative": sum(1 for polarity in polarities if polarity < -0.05),
+    }
+
+
+def _named_features(data: dict, features: Dict[str, Any], depth: int = 2):
+    """Fill features still missing from keys resolved through the metric alias index.
+
+    Covers LLM-shaped data such as {"fundamentals": {"P/E Ratio": 30}}, whose
+    keys are not the provider names extract_features looks up.
+    """
+    for key, value in data.items():
+        if isinstance(value, dict):
+            if depth > 1:
+                _named_features(value, features, depth - 1)
+            continue
+        name = str(key).strip().lower()
+        if name in TEXT_FEATURES:
+            if features.get(name) is None and isinstance(value, str) and value.strip():
+                features[name] = value.strip()
+            continue
+        feature = canonical_metric(str(key))
+        if feature is not None and features.get(feature) is None:
+            features[feature] = parse_number(value)
+
+
+def compact_company_data(company_data: dict, budget: int) -> dict:
+    """Project company data onto the canonical features, sentiment and a few headlines.
+
+    Headlines are truncated to COMPACTION['headline_tokens'] each and dropped
+    from the end until the payload fits within budget tokens.
+    """
+    settings = config.COMPACTION
+    features = extract_features(company_data)
+    _named_features(company_data, features)
+    features = {
+        name: (value if name in TEXT_FEATURES else _round(value))
+        for name, value in features.items() if value is not None
+    }
+    payload = {"ticker": company_data.get('ticker'), "features": features}
+
+    analyst = company_data.get('analyst_recommendations')
+    if isinstance(analyst, dict) and analyst.get('recommendationKey'):
+        payload["analyst_consensus"] = analyst['recommendationKey']
+
+    news = company_data.get('news') if isinstance(company_data.get('news'), list) else []
+    sentiment = _sentiment(news)
+    if sentiment:
+        payload["sentiment"] = sentiment
+
+    headlines = [
+        truncate_tokens(title, settings['headline_tokens'])
+        for title in (_headline(item) for item in news[:settings['headline_limit']]) if title
+    ]
+    while headlines:
+        payload["headlines"] = headlines
+        if count_tokens(dumps(payload)) <= budget:
+            break
+        headlines = headlines[:-1]
+    else:
+        payload.pop("headlines", None)
+    return payload
+
+
+def compact_prompt_data(agent: str, company_data: dict, budget: int) -> str:
+    """Serialized compact payload for an agent prompt, recording the tokens saved.
+
+    Data with no recognisable features, such as an unparsed data agent reply,
+    is sent as truncated JSON instead, so the agent never gets an empty payload.
+    """
+    original = json.dumps(company_data, default=str)
+    payload = compact_company_data(company_data, budget)
+    compacted = dumps(payload) if payload["features"] else truncate_tokens(original, budget)
+    record_savings(agent, original, compacted)
+    return compacted
+
+
+def compact_analysis(agent: str, analysis: str, budget: int) -> str:
+    """Cap the analysis handed to the recommendation agent at budget tokens"""
+    try:
+        payload = json.loads(analysis)
+    except (TypeError, ValueError):
+        payload = None
+    if not isinstance(payload, dict):
+        compacted = truncate_tokens(str(analysis), budget)
+        record_savings(agent, str(analysis), compacted)
+        return compacted
+
+    narrative = payload.get('analysis')
+    if not isinstance(narrative, str):
+        narrative = dumps(narrative)
+    rest = dumps({key: value for key, value in payload.items() if key != 'analysis'})
+    payload['analysis'] = truncate_tokens(narrative, max(budget - count_tokens(rest), 0))
+    compacted = dumps(payload)
+    record_savings(agent, analysis, compacted)
+    return compacted
+
+
+def record_savings(agent: str, original: str, compacted: str) -> Dict[str, int]:
+    original_tokens = count_tokens(original)
+    compacted_tokens = count_tokens(compacted)
+    PROMPT_TOKENS.inc(original_tokens, agent=agent, stage="original")
+    PROMPT_TOKENS.inc(compacted_tokens, agent=agent, stage="compacted")
+    tracing.current_span().set_attributes(
+        payload_tokens_original=original_tokens, payload_tokens_compacted=compacted_tokens
+    )
+    logger.debug(f"{agent} prompt payload compacted from {original_tokens} to {compacted_tokens} tokens")
+    return {"original": original_tokens, "compacted": compacted_tokens}
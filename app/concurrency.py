@@ -0,0 +1,75 @@
+import asyncio
+import contextvars
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict
+from app.config import config
+from app.metrics import registry
+from app.tracing import current_span
+
+SINGLEFLIGHT_COALESCED = registry.counter(
+    "singleflight_coalesced_total", "Calls that joined an identical in-flight call", ["stage"]
+)
+SINGLEFLIGHT_ABANDONED = registry.counter(
+    "singleflight_abandoned_total", "In-flight calls cancelled because every caller went away", ["stage"]
+)
+
+_executor = ThreadPoolExecutor(
+    max_workers=config.EXECUTOR_SETTINGS['max_workers'],
+    thread_name_prefix="agent-worker"
+)
+
+
+async def run_blocking(func, *args, **kwargs):
+    """Run a blocking call on the bounded worker pool without stalling the event loop"""
+    loop = asyncio.get_running_loop()
+    # Carry context variables (such as the current trace span) into the worker thread
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(_executor, functools.partial(context.run, func, *args, **kwargs))
+
+
+class SingleFlight:
+    """Coalesces concurrent calls for the same key onto one in-flight task.
+
+    The task is shielded from any one caller's cancellation, and cancelled
+    once every caller waiting on it has been cancelled.
+    """
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._waiters: Dict[asyncio.Task, int] = {}
+
+    async def do(self, key: str, func: Callable[[], Awaitable[Any]]) -> Any:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func())
+            self._inflight[key] = task
+            task.add_done_callback(functools.partial(self._forget, key))
+        else:
+            SINGLEFLIGHT_COALESCED.inc(stage=self.name)
+            current_span().set_attribute("coalesced", True)
+        self._waiters[task] = self._waiters.get(task, 0) + 1
+        try:
+            # Shield so one caller's cancellation does not cancel the shared work
+            return await asyncio.shield(task)
+        except asyncio.CancelledError:
+            if not task.done() and self._waiters[task] == 1:
+                # Nobody is left waiting, so stop spending on the call
+                SINGLEFLIGHT_ABANDONED.inc(stage=self.name)
+                if self._inflight.get(key) is task:
+                    del self._inflight[key]
+                task.cancel()
+            raise
+        finally:
+            self._waiters[task] -= 1
+            if not self._waiters[task]:
+                del self._waiters[task]
+
+    def _forget(self, key: str, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()
+
+    def __len__(self):
+        return len(self._inflight)
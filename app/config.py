@@ -6,10 +6,114 @@ load_dotenv()
 
 class Config:
     GROQ_API_KEY = os.getenv("GROQ_API_KEY")
-    AGENT_CONFIG = {
-        "data_agent": Groq(id="llama-3.1-8b-instant"),
-        "analysis_agent": Groq(id="llama-3.1-8b-instant"),
-        "recommendation_agent": Groq(id="deepseek-r1-distill-llama-70b")
+
+    # "mock" swaps every model for a local replay of recorded responses and
+    # the data agent's YFinanceTools for the market data fixture, so the full
+    # pipeline can be load tested offline without spending Groq quota
+    MODEL_PROVIDER = os.getenv("MODEL_PROVIDER", "groq")  # "groq" or "mock"
+    MOCK_LLM = {
+        'recordings': os.getenv(
+            "MOCK_RECORDINGS_PATH", os.path.join(os.path.dirname(__file__), "fixtures", "llm_recordings.json")
+        ),
+        'latency': os.getenv("MOCK_LATENCY", "lognormal"),  # "fixed", "uniform" or "lognormal"
+        'latency_ms': float(os.getenv("MOCK_LATENCY_MS", "800")),  # median
+        'latency_spread': float(os.getenv("MOCK_LATENCY_SPREAD", "0.5")),  # sigma, or +/- share for uniform
+        'ms_per_output_token': 2.0,
+        'error_rate': float(os.getenv("MOCK_ERROR_RATE", "0")),  # share of calls failing with a 429
+        'rpm': int(os.getenv("MOCK_RPM", "0")),  # provider-side quota per model; 0 disables it
+        'seed': int(os.getenv("MOCK_SEED", "7")),
+    }
+
+    if MODEL_PROVIDER == "mock":
+        # Imported only here, so mock code and its fixtures stay out of production imports
+        from app.mock_llm import MockModel
+        AGENT_CONFIG = {
+            "data_agent": MockModel(id="llama-3.1-8b-instant", agent="data_agent", settings=MOCK_LLM),
+            "analysis_agent": MockModel(id="llama-3.1-8b-instant", agent="analysis_agent", settings=MOCK_LLM),
+            "recommendation_agent": MockModel(
+                id="deepseek-r1-distill-llama-70b", agent="recommendation_agent", settings=MOCK_LLM
+            ),
+            "fused_agent": MockModel(id="llama-3.1-8b-instant", agent="fused_agent", settings=MOCK_LLM),
+        }
+        del MockModel
+    else:
+        AGENT_CONFIG = {
+            "data_agent": Groq(id="llama-3.1-8b-instant"),
+            "analysis_agent": Groq(id="llama-3.1-8b-instant"),
+            "recommendation_agent": Groq(id="deepseek-r1-distill-llama-70b")
+        }
+        # The fused mode needs JSON mode, which reasoning models handle poorly
+        AGENT_CONFIG["fused_agent"] = AGENT_CONFIG["analysis_agent"]
+
+    # "llm" lets DataAgent drive YFinanceTools; "direct" fills CompanyData
+    # from a MarketDataProvider without an LLM round trip
+    DATA_SOURCE = {
+        'mode': os.getenv("DATA_MODE", "llm"),
+        'provider': os.getenv("DATA_PROVIDER", "yfinance"),  # "yfinance" or "fixture"
+        'fixture_path': os.getenv(
+            "DATA_FIXTURE_PATH", os.path.join(os.path.dirname(__file__), "fixtures", "market_data.json")
+        ),
+        'news_limit': 3,
+    }
+
+    # Local SQLite copy of market data. Fresh records are served from disk
+    # before any provider or LLM call, and the refresher re-fetches each part
+    # of a tracked ticker once it is older than max_age (seconds), writing
+    # only the fields and headlines that changed
+    MARKET_STORE = {
+        'enabled': os.getenv("MARKET_STORE_ENABLED", "false").lower() == "true",
+        'path': os.getenv("MARKET_STORE_PATH", ".cache/market_data.db"),
+        'max_age': {
+            'news': int(os.getenv("MARKET_STORE_NEWS_MAX_AGE", "900")),
+            'price_history': 3600,
+            'fundamentals': 6 * 3600,
+            'analyst_recommendations': 24 * 3600,
+        },
+        'refresh_interval': int(os.getenv("MARKET_STORE_REFRESH_INTERVAL", "60")),
+        'refresh_batch': 20,
+        'news_retention': 20,
+        # Tickers leave the refresh schedule after max_errors failed refreshes
+        # in a row, or once nothing has asked for them for idle_after seconds
+        'max_errors': 3,
+        'idle_after': int(os.getenv("MARKET_STORE_IDLE_AFTER", str(7 * 24 * 3600))),
+    }
+
+    SCREENING = {
+        'universe_path': os.getenv(
+            "SCREEN_UNIVERSE_PATH", os.path.join(os.path.dirname(__file__), "fixtures", "universe.json")
+        ),
+        'default_rank_by': 'pe_ratio',
+        'default_top_n': 10,
+        'max_recommendations': 10,
+    }
+
+    JOBS = {
+        'workers': int(os.getenv("JOB_WORKERS", "2")),
+        'backend': os.getenv("JOB_BACKEND", "memory"),  # "memory" or "sqlite" for multiple uvicorn workers
+        'path': os.getenv("JOB_DB_PATH", ".cache/jobs.db"),
+        'retention': 3600,
+        'poll_interval': 1.0,
+        # Running jobs refresh their heartbeat this often; a job whose worker
+        # stopped beating for heartbeat_timeout is re-queued, up to max_attempts runs
+        'heartbeat_interval': 5.0,
+        'heartbeat_timeout': 60.0,
+        'max_attempts': 2,
+    }
+
+    # "per_ticker" makes one analysis and one recommendation call per ticker;
+    # "batched" packs several tickers into each call within the token budget;
+    # "fused" asks for the final recommendation schema in a single call
+    PIPELINE = {
+        'mode': os.getenv("PIPELINE_MODE", "per_ticker"),
+        'batch_max_tickers': int(os.getenv("BATCH_MAX_TICKERS", "8")),
+        'batch_token_budget': 6000,
+        'batch_output_tokens': {'analysis': 250, 'recommendation': 300},
+        # Outputs of finished stages are kept this long after a failed run,
+        # so the next run for the same ticker and criteria resumes at the stage that failed
+        'checkpoint_ttl': 900,
+        # Symbols looked up concurrently with the ticker in the LLM data stage;
+        # the first usable record wins and the other lookups are cancelled
+        'symbol_fallbacks': {'GOOGL': ['GOOG', 'Alphabet']},
     }
 
     TOKEN_LIMITS = {
@@ -18,15 +122,121 @@ class Config:
         "recommendation_agent": 1500
     }
 
+    # Prompts carry a compact projection of the data instead of the raw JSON;
+    # TOKEN_LIMITS caps each agent's payload, counted with tiktoken
+    COMPACTION = {
+        'enabled': os.getenv("PROMPT_COMPACTION", "true").lower() == "true",
+        'encoding': 'cl100k_base',
+        'headline_limit': 3,
+        'headline_tokens': 24,
+    }
+
+    # Pools grow on demand up to size; only warm agents per pool are created at startup
+    POOL_SETTINGS = {
+        'size': int(os.getenv("AGENT_POOL_SIZE", "20")),
+        'warm': int(os.getenv("AGENT_POOL_WARM", "2")),
+    }
+
+    EXECUTOR_SETTINGS = {
+        'max_workers': int(os.getenv("EXECUTOR_MAX_WORKERS", "8")),
+    }
+
+    # Proactive per-model budgets shared by every agent using the model
+    RATE_LIMITS = {
+        'default': {'rpm': 30, 'tpm': 6000, 'max_concurrency': 8},
+        'llama-3.1-8b-instant': {'rpm': 30, 'tpm': 6000, 'max_concurrency': 8},
+        'deepseek-r1-distill-llama-70b': {'rpm': 30, 'tpm': 6000, 'max_concurrency': 4},
+    }
+
     MAX_RETRIES = 2
     RETRY_DELAY = 3
+
+    # Rate-limit retries per pipeline stage, on top of 'default'. Retries wait
+    # for the provider's Retry-After, or base_delay doubled per attempt up to
+    # max_delay, plus up to jitter of that for callers retrying together
+    STAGE_RETRY_POLICIES = {
+        'default': {'max_attempts': MAX_RETRIES, 'base_delay': RETRY_DELAY * 2, 'max_delay': 30, 'jitter': 0.2},
+        'data': {'max_attempts': 3},
+        'recommendation': {'max_attempts': 3, 'max_delay': 60},
+        'fused': {'max_attempts': 3, 'max_delay': 60},
+    }
     MIN_CONFIDENCE = 0.7  
 
     CACHE_SETTINGS = {
         'enabled': True,
         'ttl': 3600,  
+        'max_size': int(os.getenv("CACHE_MAX_SIZE", "1024")),
+        'backend': os.getenv("CACHE_BACKEND", "memory"),  # "memory" or "sqlite"
+        'path': os.getenv("CACHE_PATH", ".cache/cache.db"),
+        # Expired recommendations are still served for this long while a
+        # background refresh replaces them (stale-while-revalidate)
+        'stale_ttl': int(os.getenv("CACHE_STALE_TTL", "1800")),
+        # Per-stage caches so a criteria change does not refetch market data
+        'stages': {
+            'company_data': {'ttl': 900},
+            'analysis': {'ttl': 3600},
+        },
     }
     
+    # Headline sentiment: "textblob" runs TextBlob's pattern analyzer, "lexicon"
+    # applies the same lexicon rules with a lighter tokenizer. Scores are cached
+    # by content hash, so repeated headlines are only scored once
+    SENTIMENT = {
+        'engine': os.getenv("SENTIMENT_ENGINE", "textblob"),
+        'cache': os.getenv("SENTIMENT_CACHE", "true").lower() == "true",
+        'cache_size': int(os.getenv("SENTIMENT_CACHE_SIZE", "20000")),
+        'ttl': 7 * 24 * 3600,
+    }
+
+    # Background refresh of recommendations for a watchlist, per criteria
+    # preset, refresh_ahead seconds before they go stale. A refresh only
+    # starts while no live request is in flight and every model keeps at
+    # least min_headroom of its request and token budget
+    PREWARM = {
+        'enabled': os.getenv("PREWARM_ENABLED", "false").lower() == "true",
+        'watchlist_path': os.getenv(
+            "PREWARM_WATCHLIST_PATH", os.path.join(os.path.dirname(__file__), "fixtures", "watchlist.json")
+        ),
+        'interval': int(os.getenv("PREWARM_INTERVAL", "60")),
+        'refresh_ahead': 300,
+        'concurrency': int(os.getenv("PREWARM_CONCURRENCY", "2")),
+        'min_headroom': 0.5,
+        'poll_interval': 1.0,
+    }
+
+    # Spans are exported to the console or a JSON lines file; sample_rate is
+    # the share of requests traced, so tracing can stay on in production
+    TRACING = {
+        'enabled': os.getenv("TRACING_ENABLED", "false").lower() == "true",
+        'exporter': os.getenv("TRACE_EXPORTER", "console"),  # "console", "file" or "none"
+        'path': os.getenv("TRACE_PATH", ".cache/traces.jsonl"),
+        'sample_rate': float(os.getenv("TRACE_SAMPLE_RATE", "1.0")),
+    }
+
+    # Recommended key_metrics are checked against the source features within a
+    # relative tolerance per metric; abs_tolerance absorbs rounding near zero
+    VERIFICATION = {
+        'default_tolerance': 0.05,
+        'tolerances': {
+            'current_price': 0.02,
+            'forward_pe': 0.1,
+            'debt_to_equity': 0.1,
+            'revenue_growth': 0.1,
+            'earnings_growth': 0.15,
+            'profit_margin': 0.1,
+            'beta': 0.1,
+            'price_change_3m': 0.2,
+        },
+        'abs_tolerance': {
+            'revenue_growth': 0.005,
+            'earnings_growth': 0.01,
+            'profit_margin': 0.005,
+            'return_on_equity': 0.01,
+            'dividend_yield': 0.001,
+            'price_change_3m': 0.01,
+        },
+    }
+
     MONITORING = {
         'prometheus': True,
         'hallucination_metrics': ['confidence_score', 'metric_discrepancies']
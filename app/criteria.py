@@ -0,0 +1,167 @@
+import operator
+import logging
+from typing import Any, Dict, List, NamedTuple
+import numpy as np
+import pandas as pd
+from app.features import extract_features, TEXT_FEATURES
+
+logger = logging.getLogger(__name__)
+
+
+class CriteriaError(ValueError):
+    """Criteria a client sent that the rule engine cannot evaluate"""
+
+
+class Rule(NamedTuple):
+    feature: str
+    op: str
+
+
+# Supported criteria keys. Several spellings are accepted because clients
+# (test.py, the web UI and older prompts) disagree on the names.
+CRITERIA_SCHEMA: Dict[str, Rule] = {
+    'min_price': Rule('current_price', '>='),
+    'max_price': Rule('current_price', '<='),
+    'max_pe': Rule('pe_ratio', '<='),
+    'max_pe_ratio': Rule('pe_ratio', '<='),
+    'min_pe_ratio': Rule('pe_ratio', '>='),
+    'min_eps': Rule('eps', '>='),
+    'min_revenue_growth': Rule('revenue_growth', '>='),
+    'min_earnings_growth': Rule('earnings_growth', '>='),
+    'max_debt_equity': Rule('debt_to_equity', '<='),
+    'max_debt_ratio': Rule('debt_to_equity', '<='),
+    'max_debt_to_equity': Rule('debt_to_equity', '<='),
+    'min_profit_margin': Rule('profit_margin', '>='),
+    'min_market_cap': Rule('market_cap', '>='),
+    'max_beta': Rule('beta', '<='),
+    'sectors': Rule('sector', 'contains_any'),
+}
+
+NUMERIC_OPERATORS = {
+    '>=': operator.ge,
+    '<=': operator.le,
+    '>': operator.gt,
+    '<': operator.lt,
+    '==': operator.eq,
+    '!=': operator.ne,
+}
+TEXT_OPERATORS = {'in', 'contains_any'}
+OPERATOR_WORDS = {
+    '>=': 'below minimum', '<=': 'exceeds maximum', '>': 'not above', '<': 'not below',
+    '==': 'not equal to', '!=': 'equal to', 'in': 'not in', 'contains_any': 'not matching',
+}
+
+
+def _check_threshold(name: str, op: str, value: Any):
+    if op in TEXT_OPERATORS:
+        values = value if isinstance(value, (list, tuple)) else [value]
+        if not all(isinstance(v, (str, int, float)) and not isinstance(v, bool) for v in values):
+            raise CriteriaError(f"Criterion '{name}' needs a string or a list of strings, got {value!r}")
+        return
+    try:
+        if isinstance(value, bool):
+            raise TypeError
+        float(value)
+    except (TypeError, ValueError):
+        raise CriteriaError(f"Criterion '{name}' needs a numeric value, got {value!r}") from None
+
+
+def parse_rules(criteria: Dict[str, Any]) -> List[tuple]:
+    """Turn a criteria dict into (name, feature, op, value) rules.
+
+    Named keys come from CRITERIA_SCHEMA; explicit rules can be passed as
+    criteria["rules"] = [{"field": "pe_ratio", "op": "<=", "value": 30}].
+    Unknown keys are left to the LLM narrative. Raises CriteriaError for
+    rules the engine cannot evaluate.
+    """
+    if not isinstance(criteria, dict):
+        raise CriteriaError("Criteria must be an object")
+    rules = []
+    for name, value in criteria.items():
+        if value is None or name == 'rules':
+            continue
+        rule = CRITERIA_SCHEMA.get(name)
+        if rule is not None:
+            _check_threshold(name, rule.op, value)
+            rules.append((name, rule.feature, rule.op, value))
+    specs = criteria.get('rules') or []
+    if not isinstance(specs, list):
+        raise CriteriaError("'rules' must be a list of {field, op, value} objects")
+    for spec in specs:
+        if not isinstance(spec, dict) or not isinstance(spec.get('field'), str) or 'value' not in spec:
+            raise CriteriaError(f"Rule {spec!r} needs a 'field' name and a 'value'")
+        op = spec.get('op')
+        if op not in NUMERIC_OPERATORS and op not in TEXT_OPERATORS:
+            raise CriteriaError(f"Unsupported criteria operator: {op}")
+        name = str(spec.get('name', spec['field']))
+        _check_threshold(name, op, spec['value'])
+        rules.append((name, spec['field'], op, spec['value']))
+    return rules
+
+
+def validate_criteria(criteria: Dict[str, Any]):
+    """Reject criteria the rule engine cannot evaluate before any work starts"""
+    parse_rules(criteria)
+
+
+def build_frame(records: List[dict]) -> pd.DataFrame:
+    """Columnar frame of canonical features, one row per company"""
+    return pd.DataFrame([extract_features(record) for record in records])
+
+
+def evaluate_frame(frame: pd.DataFrame, criteria: Dict[str, Any]) -> Dict[str, np.ndarray]:
+    """Evaluate every rule over the whole frame at once.
+
+    Returns boolean arrays: 'passed' (all known rules hold), plus per-rule
+    'violation:<name>' and 'unknown:<name>' masks.
+    """
+    masks = {}
+    passed = np.ones(len(frame), dtype=bool)
+    for name, feature, op, threshold in parse_rules(criteria):
+        column = frame[feature] if feature in frame else pd.Series([None] * len(frame), dtype=object)
+        if op in TEXT_OPERATORS:
+            values = column.fillna("").astype(str).str.lower()
+            if feature == 'sector' and 'industry' in frame:
+                values = values + " " + frame['industry'].fillna("").astype(str).str.lower()
+            targets = [str(t).lower() for t in (threshold if isinstance(threshold, (list, tuple)) else [threshold])]
+            known = (values.str.strip() != "").to_numpy()
+            if op == 'in':
+                ok = column.fillna("").astype(str).str.lower().isin(targets).to_numpy()
+            else:
+                ok = np.zeros(len(frame), dtype=bool)
+                for target in targets:
+                    ok |= values.str.contains(target, regex=False).to_numpy()
+        else:
+            values = pd.to_numeric(column, errors='coerce').to_numpy(dtype=float)
+            known = ~np.isnan(values)
+            with np.errstate(invalid='ignore'):
+                ok = NUMERIC_OPERATORS[op](values, float(threshold))
+        violation = known & ~ok
+        masks[f"violation:{name}"] = violation
+        masks[f"unknown:{name}"] = ~known
+        passed &= ~violation
+    masks['passed'] = passed
+    return masks
+
+
+def evaluate_criteria(records: List[dict], criteria: Dict[str, Any]) -> List[Dict[str, List[str]]]:
+    """Check a batch of company data dicts against criteria in one pass.
+
+    Returns, per record, the list of violated criteria and the criteria that
+    could not be checked because the data was missing.
+    """
+    results = [{"criteria_violations": [], "criteria_unknown": []} for _ in records]
+    if not records:
+        return results
+    frame = build_frame(records)
+    masks = evaluate_frame(frame, criteria)
+    for name, feature, op, threshold in parse_rules(criteria):
+        for row in np.flatnonzero(masks[f"violation:{name}"]):
+            value = frame.at[row, feature]
+            shown = value if feature in TEXT_FEATURES else round(float(value), 4)
+            results[row]["criteria_violations"].append(
+                f"{name}: {feature} {shown} {OPERATOR_WORDS[op]} {threshold}"
+            )
+        for row in np.flatnonzero(masks[f"unknown:{name}"]):
+            results[row]["criteria_unknown"].append(name)
+    return results
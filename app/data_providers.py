@@ -0,0 +1,228 @@
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional
+from app.config import config
+from app.market_store import SECTIONS, STORE_READS, MarketDataStore, get_store
+from app.schemas import CompanyData
+
+logger = logging.getLogger(__name__)
+
+FUNDAMENTAL_FIELDS = [
+    "longName", "sector", "industry", "currency", "marketCap", "currentPrice",
+    "trailingPE", "forwardPE", "trailingEps", "forwardEps", "priceToBook",
+    "debtToEquity", "revenueGrowth", "earningsGrowth", "profitMargins",
+    "operatingMargins", "returnOnEquity", "totalRevenue", "freeCashflow",
+    "dividendYield", "beta", "fiftyTwoWeekHigh", "fiftyTwoWeekLow",
+]
+
+ANALYST_FIELDS = [
+    "recommendationKey", "recommendationMean", "numberOfAnalystOpinions",
+    "targetMeanPrice", "targetHighPrice", "targetLowPrice",
+]
+
+
+class MarketDataProvider:
+    """Source of CompanyData records for a batch of tickers"""
+    name = "base"
+
+    def fetch(self, tickers: List[str], sections: Optional[Iterable[str]] = None) -> Dict[str, dict]:
+        """Return a CompanyData-shaped dict per ticker, or {"error": ...} for failures.
+
+        sections limits a refresh to some parts of the record; providers that
+        cannot fetch parts separately return whole records.
+        """
+        raise NotImplementedError
+
+
+class YFinanceProvider(MarketDataProvider):
+    """Fetches fundamentals, prices, analyst views and news straight from yfinance"""
+    name = "yfinance"
+
+    def __init__(self, news_limit: int = 3, max_workers: int = 8):
+        self.news_limit = news_limit
+        self.max_workers = max_workers
+
+    def fetch(self, tickers: List[str], sections: Optional[Iterable[str]] = None) -> Dict[str, dict]:
+        if not tickers:
+            return {}
+        import yfinance as yf
+
+        sections = set(sections or SECTIONS)
+        # yfinance keys its frames and handles by the upper-case symbol, as the
+        # market store does; results stay keyed by the tickers as requested
+        symbols = [ticker.upper() for ticker in tickers]
+        # Prices for the whole batch come back from a single download call
+        history = yf.download(
+            symbols, period="3mo", interval="1d", group_by="ticker",
+            progress=False, threads=True, auto_adjust=True
+        ) if "price_history" in sections else None
+        batch = yf.Tickers(" ".join(symbols))
+
+        # yfinance has no multi-ticker endpoint for fundamentals or news, so
+        # those lookups are fanned out across threads within the same batch
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(tickers))) as executor:
+            records = executor.map(
+                lambda symbol: self._fetch_one(symbol, batch.tickers.get(symbol), history, sections), symbols
+            )
+            return dict(zip(tickers, records))
+
+    def _fetch_one(self, ticker: str, handle, history, sections: set) -> dict:
+        try:
+            if handle is None:
+                return {"error": f"No data for {ticker}"}
+            record = {"ticker": ticker}
+            # A news-only refresh skips the info and recommendation lookups
+            if sections & {"fundamentals", "analyst_recommendations"}:
+                info = handle.info or {}
+                if not info.get("currentPrice") and not info.get("regularMarketPrice"):
+                    return {"error": f"No fundamentals for {ticker}"}
+                fundamentals = {field: info.get(field) for field in FUNDAMENTAL_FIELDS}
+                if fundamentals["currentPrice"] is None:
+                    fundamentals["currentPrice"] = info.get("regularMarketPrice")
+                record["fundamentals"] = fundamentals
+                record["analyst_recommendations"] = self._analyst_recommendations(handle, info)
+            if "news" in sections:
+                record["news"] = self._news(handle)
+            if "price_history" in sections:
+                record["price_history"] = self._price_summary(ticker, history)
+
+            if len(sections) < len(SECTIONS):
+                return record
+            return CompanyData(**record).model_dump()
+        except Exception as e:
+            logger.error(f"yfinance fetch failed for {ticker}: {str(e)}")
+            return {"error": str(e)}
+
+    def _analyst_recommendations(self, handle, info: dict) -> dict:
+        recommendations = {field: info.get(field) for field in ANALYST_FIELDS}
+        try:
+            summary = handle.recommendations
+            if summary is not None and not summary.empty:
+                latest = summary.iloc[0].to_dict()
+                for key in ["strongBuy", "buy", "hold", "sell", "strongSell"]:
+                    if key in latest:
+                        recommendations[key] = int(latest[key])
+        except Exception as e:
+            logger.debug(f"No recommendation summary: {str(e)}")
+        return recommendations
+
+    def _news(self, handle) -> List[dict]:
+        items = []
+        for item in (handle.news or [])[:self.news_limit]:
+            # Newer yfinance releases nest the article under "content"
+            content = item.get("content", item)
+            provider = content.get("provider") or {}
+            items.append({
+                "title": content.get("title"),
+                "summary": content.get("summary"),
+                "publisher": provider.get("displayName") if isinstance(provider, dict) else content.get("publisher"),
+                "published": content.get("pubDate") or item.get("providerPublishTime"),
+            })
+        return [item for item in items if item["title"]]
+
+    def _price_summary(self, ticker: str, history) -> dict:
+        try:
+            frame = history[ticker] if ticker in history.columns.get_level_values(0) else history
+            closes = frame["Close"].dropna()
+            if closes.empty:
+                return {}
+            return {
+                "last_close": round(float(closes.iloc[-1]), 4),
+                "high_3m": round(float(closes.max()), 4),
+                "low_3m": round(float(closes.min()), 4),
+                "change_3m": round(float(closes.iloc[-1] / closes.iloc[0] - 1), 4),
+            }
+        except Exception:
+            return {}
+
+
+class FixtureProvider(MarketDataProvider):
+    """Serves recorded CompanyData from a local JSON file for offline runs and benchmarks"""
+    name = "fixture"
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path) as f:
+            self._records = {ticker.upper(): record for ticker, record in json.load(f).items()}
+
+    def fetch(self, tickers: List[str], sections: Optional[Iterable[str]] = None) -> Dict[str, dict]:
+        results = {}
+        for ticker in tickers:
+            record = self._records.get(ticker.upper())
+            if record is None:
+                results[ticker] = {"error": f"No fixture data for {ticker}"}
+            else:
+                results[ticker] = CompanyData(**{**record, "ticker": ticker}).model_dump()
+        return results
+
+
+class StoreProvider(MarketDataProvider):
+    """Serves fresh records from the local market data store before going upstream.
+
+    Stale or missing tickers are fetched from the upstream provider in one
+    batch and written back, changed fields only. If the upstream fetch fails,
+    the stored record is served rather than an error.
+    """
+    def __init__(self, store: MarketDataStore, upstream: MarketDataProvider, max_age: Dict[str, float]):
+        self.store = store
+        self.upstream = upstream
+        self.max_age = max_age
+        self.name = f"store+{upstream.name}"
+
+    def fetch(self, tickers: List[str], sections: Optional[Iterable[str]] = None) -> Dict[str, dict]:
+        results, missing = {}, []
+        for ticker in tickers:
+            record = self.store.get(ticker) if self.store.is_fresh(ticker, self.max_age) else None
+            if record is None:
+                missing.append(ticker)
+            else:
+                STORE_READS.inc(outcome="fresh")
+                results[ticker] = {**record, "ticker": ticker}
+        if results:
+            self.store.touch(results)
+        if not missing:
+            return results
+
+        STORE_READS.inc(len(missing), outcome="miss")
+        try:
+            fetched = self.upstream.fetch(missing)
+        except Exception as e:
+            logger.error(f"Upstream fetch failed for {missing}: {str(e)}")
+            fetched = {ticker: {"error": str(e)} for ticker in missing}
+        for ticker in missing:
+            record = fetched.get(ticker) or {"error": f"No data for {ticker}"}
+            if "error" not in record:
+                self.store.upsert(ticker, record)
+                self.store.track([ticker])
+                results[ticker] = {**self.store.get(ticker), "ticker": ticker}
+                continue
+            stale = self.store.get(ticker)
+            if stale is not None:
+                logger.warning(f"Serving stored data for {ticker} after upstream error: {record['error']}")
+                STORE_READS.inc(outcome="stale")
+                record = {**stale, "ticker": ticker}
+            results[ticker] = record
+        return results
+
+
+def upstream_provider() -> MarketDataProvider:
+    """The remote or fixture provider selected by Config.DATA_SOURCE"""
+    settings = config.DATA_SOURCE
+    if settings['provider'] == 'fixture':
+        return FixtureProvider(settings['fixture_path'])
+    return YFinanceProvider(news_limit=settings['news_limit'])
+
+
+_provider = None
+
+
+def get_provider() -> MarketDataProvider:
+    """Return the process-wide provider, backed by the market data store when enabled"""
+    global _provider
+    if _provider is None:
+        _provider = upstream_provider()
+        if config.MARKET_STORE['enabled']:
+            _provider = StoreProvider(get_store(), _provider, config.MARKET_STORE['max_age'])
+        logger.info(f"Using {_provider.name} market data provider")
+    return _provider
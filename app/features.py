@@ -0,0 +1,103 @@
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+# Canonical feature name -> ordered (section, source key, scale) lookups.
+# A section of None means the top level of the company data dict. yfinance
+# reports debtToEquity as a percentage, hence the 0.01 scale.
+FEATURE_ALIASES: Dict[str, List[Tuple[Optional[str], str, float]]] = {
+    'current_price': [
+        ('fundamentals', 'currentPrice', 1.0), ('fundamentals', 'regularMarketPrice', 1.0),
+        ('fundamentals', 'current_price', 1.0), (None, 'current_price', 1.0),
+        ('price_history', 'last_close', 1.0),
+    ],
+    'pe_ratio': [
+        ('fundamentals', 'trailingPE', 1.0), ('fundamentals', 'pe_ratio', 1.0), (None, 'pe_ratio', 1.0),
+    ],
+    'forward_pe': [('fundamentals', 'forwardPE', 1.0), ('fundamentals', 'forward_pe', 1.0)],
+    'eps': [('fundamentals', 'trailingEps', 1.0), ('fundamentals', 'eps', 1.0), (None, 'eps', 1.0)],
+    'debt_to_equity': [
+        ('fundamentals', 'debtToEquity', 0.01), ('fundamentals', 'debt_to_equity', 1.0),
+        (None, 'debt_to_equity', 1.0),
+    ],
+    'revenue_growth': [
+        ('fundamentals', 'revenueGrowth', 1.0), ('fundamentals', 'revenue_growth', 1.0),
+        (None, 'revenue_growth', 1.0),
+    ],
+    'earnings_growth': [('fundamentals', 'earningsGrowth', 1.0), ('fundamentals', 'earnings_growth', 1.0)],
+    'profit_margin': [('fundamentals', 'profitMargins', 1.0), ('fundamentals', 'profit_margin', 1.0)],
+    'return_on_equity': [('fundamentals', 'returnOnEquity', 1.0), ('fundamentals', 'return_on_equity', 1.0)],
+    'market_cap': [('fundamentals', 'marketCap', 1.0), ('fundamentals', 'market_cap', 1.0), (None, 'market_cap', 1.0)],
+    'beta': [('fundamentals', 'beta', 1.0)],
+    'dividend_yield': [('fundamentals', 'dividendYield', 1.0), ('fundamentals', 'dividend_yield', 1.0)],
+    'target_price': [('analyst_recommendations', 'targetMeanPrice', 1.0)],
+    'analyst_rating': [('analyst_recommendations', 'recommendationMean', 1.0)],
+    'price_change_3m': [('price_history', 'change_3m', 1.0)],
+    'sector': [('fundamentals', 'sector', 1.0), (None, 'sector', 1.0)],
+    'industry': [('fundamentals', 'industry', 1.0), (None, 'industry', 1.0)],
+}
+
+TEXT_FEATURES = {'sector', 'industry'}
+
+# Names LLMs use for the canonical features, besides the canonical names and
+# the provider keys above, which canonical_metric() also recognises
+METRIC_NAME_ALIASES: Dict[str, List[str]] = {
+    'current_price': ['price', 'stock_price', 'share_price', 'last_price'],
+    'pe_ratio': ['pe', 'p/e', 'p/e ratio', 'price_to_earnings', 'trailing_pe', 'pe_ttm'],
+    'forward_pe': ['forward_p/e', 'fwd_pe'],
+    'eps': ['eps_ttm', 'earnings_per_share', 'trailing_eps'],
+    'debt_to_equity': ['debt_ratio', 'debt_equity', 'debt/equity', 'de_ratio', 'd/e'],
+    'revenue_growth': ['revenue_growth_rate', 'revenue_growth_yoy', 'rev_growth', 'sales_growth'],
+    'earnings_growth': ['earnings_growth_rate', 'eps_growth'],
+    'profit_margin': ['profit_margins', 'net_margin', 'net_profit_margin'],
+    'return_on_equity': ['roe'],
+    'market_cap': ['market_capitalization', 'mkt_cap'],
+    'dividend_yield': ['yield'],
+    'target_price': ['price_target', 'analyst_target', 'target_mean_price'],
+    'analyst_rating': ['recommendation_mean'],
+}
+
+
+def _metric_key(name: str) -> str:
+    return re.sub(r'[^a-z0-9]', '', name.lower())
+
+
+# Normalized metric name -> canonical feature, precomputed once
+METRIC_INDEX: Dict[str, str] = {}
+for _name, _aliases in FEATURE_ALIASES.items():
+    if _name in TEXT_FEATURES:
+        continue
+    for _alias in [_name, *(key for _, key, _ in _aliases), *METRIC_NAME_ALIASES.get(_name, [])]:
+        METRIC_INDEX.setdefault(_metric_key(_alias), _name)
+
+
+def canonical_metric(name: str) -> Optional[str]:
+    """Canonical numeric feature for a metric name such as 'P/E Ratio' or 'trailingPE'"""
+    return METRIC_INDEX.get(_metric_key(name))
+
+
+def _lookup(company_data: dict, section: Optional[str], key: str) -> Any:
+    source = company_data if section is None else company_data.get(section)
+    if isinstance(source, dict):
+        return source.get(key)
+    return None
+
+
+def extract_features(company_data: dict) -> Dict[str, Any]:
+    """Project company data from any source onto the canonical feature names"""
+    features = {}
+    for name, aliases in FEATURE_ALIASES.items():
+        value = None
+        for section, key, scale in aliases:
+            raw = _lookup(company_data, section, key)
+            if raw is None:
+                continue
+            if name in TEXT_FEATURES:
+                value = str(raw)
+                break
+            try:
+                value = float(raw) * scale
+                break
+            except (TypeError, ValueError):
+                continue
+        features[name] = value
+    return features
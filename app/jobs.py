@@ -0,0 +1,530 @@
+import asyncio
+import heapq
+import itertools
+import os
+import sqlite3
+import threading
+import time
+import uuid
+import logging
+from collections import defaultdict
+from typing import Dict, List, Optional
+from app.concurrency import run_blocking
+from app.config import config
+from app.criteria import validate_criteria
+from app.metrics import registry
+from app.schemas import InvestmentRecommendation, Job
+from app import tracing
+
+logger = logging.getLogger(__name__)
+
+JOBS_SUBMITTED = registry.counter("jobs_submitted_total", "Jobs accepted by the job API")
+JOBS_FINISHED = registry.counter("jobs_finished_total", "Jobs that reached a final state", ["status"])
+JOBS_RUNNING = registry.gauge("jobs_running", "Jobs currently being processed by this worker")
+
+FINAL_STATES = {"completed", "failed", "cancelled"}
+
+
+class JobStore:
+    """Persists jobs and hands out the next queued job by priority.
+
+    Results are stored one row per ticker with add_result, keyed by the
+    ticker's position in the job, so recording progress does not rewrite
+    the job and results keep the submitted order. Calls block, so the job
+    queue runs them on the worker pool.
+    """
+    def add(self, job: Job):
+        raise NotImplementedError
+
+    def save(self, job: Job):
+        """Write the job's status and metadata; results are kept as stored"""
+        raise NotImplementedError
+
+    def get(self, job_id: str) -> Optional[Job]:
+        raise NotImplementedError
+
+    def add_result(self, job_id: str, position: int, result: InvestmentRecommendation):
+        raise NotImplementedError
+
+    def completed_positions(self, job_id: str) -> List[int]:
+        """Positions in job.tickers that already have a stored result"""
+        raise NotImplementedError
+
+    def cancel_requested(self, job_id: str) -> bool:
+        raise NotImplementedError
+
+    def heartbeat(self, job_id: str):
+        raise NotImplementedError
+
+    def claim_next(self) -> Optional[Job]:
+        """Atomically mark the most urgent queued job as running and return it"""
+        raise NotImplementedError
+
+    def reclaim_stale(self, timeout: float, max_attempts: int) -> int:
+        """Re-queue running jobs whose heartbeat is older than timeout, failing those out of attempts"""
+        raise NotImplementedError
+
+    def purge_expired(self) -> int:
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+def _reclaim(job: Job, max_attempts: int, now: float) -> Job:
+    if job.attempts >= max_attempts:
+        job.status = "failed"
+        job.error = f"Worker stopped responding after {job.attempts} attempts"
+        job.finished_at = now
+        job.expires_at = now + config.JOBS['retention']
+        JOBS_FINISHED.inc(status="failed")
+    else:
+        job.status = "queued"
+    logger.warning(f"Reclaimed job {job.id} from an unresponsive worker: {job.status}")
+    return job
+
+
+class InMemoryJobStore(JobStore):
+    """Single-process store; jobs are lost on restart"""
+    def __init__(self):
+        self._jobs: Dict[str, Job] = {}
+        self._results: Dict[str, Dict[int, InvestmentRecommendation]] = {}
+        self._heap: List[tuple] = []
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+
+    def _push(self, job: Job):
+        heapq.heappush(self._heap, (-job.priority, next(self._sequence), job.id))
+
+    def _copy(self, job: Job) -> Job:
+        copy = job.model_copy(deep=True)
+        results = self._results.get(job.id, {})
+        copy.results = [results[position].model_copy(deep=True) for position in sorted(results)]
+        copy.progress.completed = len(results)
+        return copy
+
+    def add(self, job: Job):
+        with self._lock:
+            self._jobs[job.id] = job.model_copy(deep=True, update={"results": []})
+            self._push(job)
+
+    def save(self, job: Job):
+        with self._lock:
+            stored = self._jobs.get(job.id)
+            saved = job.model_copy(deep=True, update={"results": []})
+            if stored is not None:
+                saved.cancel_requested = job.cancel_requested or stored.cancel_requested
+            self._jobs[job.id] = saved
+            if saved.status == "queued" and (stored is None or stored.status != "queued"):
+                self._push(saved)
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return self._copy(job) if job else None
+
+    def add_result(self, job_id: str, position: int, result: InvestmentRecommendation):
+        with self._lock:
+            if job_id in self._jobs:
+                self._results.setdefault(job_id, {})[position] = result.model_copy(deep=True)
+
+    def completed_positions(self, job_id: str) -> List[int]:
+        with self._lock:
+            return sorted(self._results.get(job_id, {}))
+
+    def cancel_requested(self, job_id: str) -> bool:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return job is not None and job.cancel_requested
+
+    def heartbeat(self, job_id: str):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                job.heartbeat_at = time.time()
+
+    def claim_next(self) -> Optional[Job]:
+        with self._lock:
+            while self._heap:
+                _, _, job_id = heapq.heappop(self._heap)
+                job = self._jobs.get(job_id)
+                if job is not None and job.status == "queued":
+                    job.status = "running"
+                    job.started_at = job.heartbeat_at = time.time()
+                    job.attempts += 1
+                    return self._copy(job)
+            return None
+
+    def reclaim_stale(self, timeout: float, max_attempts: int) -> int:
+        now = time.time()
+        with self._lock:
+            stale = [job for job in self._jobs.values()
+                     if job.status == "running" and (job.heartbeat_at or 0) < now - timeout]
+            for job in stale:
+                if _reclaim(job, max_attempts, now).status == "queued":
+                    self._push(job)
+            return len(stale)
+
+    def purge_expired(self) -> int:
+        now = time.time()
+        with self._lock:
+            expired = [job_id for job_id, job in self._jobs.items() if job.expires_at and job.expires_at <= now]
+            for job_id in expired:
+                del self._jobs[job_id]
+                self._results.pop(job_id, None)
+            return len(expired)
+
+
+class SQLiteJobStore(JobStore):
+    """Store shared by every uvicorn worker on the host through one SQLite file"""
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id TEXT PRIMARY KEY, status TEXT, priority INTEGER, created_at REAL, expires_at REAL, data TEXT)"
+        )
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(jobs)")}
+        if "heartbeat_at" not in columns:
+            self._conn.execute("ALTER TABLE jobs ADD COLUMN heartbeat_at REAL")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (status, priority, created_at)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS job_results ("
+            "job_id TEXT, position INTEGER, data TEXT, PRIMARY KEY (job_id, position))"
+        )
+        self._lock = threading.Lock()
+
+    def _write(self, job: Job):
+        self._conn.execute(
+            "INSERT OR REPLACE INTO jobs (id, status, priority, created_at, expires_at, heartbeat_at, data) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (job.id, job.status, job.priority, job.created_at, job.expires_at, job.heartbeat_at,
+             job.model_dump_json(exclude={"results"}))
+        )
+
+    def _read(self, job_id: str) -> Optional[Job]:
+        row = self._conn.execute("SELECT data, heartbeat_at FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        if row is None:
+            return None
+        job = Job.model_validate_json(row[0])
+        job.heartbeat_at = row[1]
+        return job
+
+    def add(self, job: Job):
+        with self._lock:
+            self._write(job)
+
+    def save(self, job: Job):
+        with self._lock:
+            # Keep a cancellation requested by another worker
+            stored = self._read(job.id)
+            if stored is not None and stored.cancel_requested:
+                job.cancel_requested = True
+            self._write(job)
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            job = self._read(job_id)
+            if job is None:
+                return None
+            rows = self._conn.execute(
+                "SELECT data FROM job_results WHERE job_id = ? ORDER BY position", (job_id,)
+            ).fetchall()
+        if rows:
+            job.results = [InvestmentRecommendation.model_validate_json(data) for data, in rows]
+        job.progress.completed = len(job.results)
+        return job
+
+    def add_result(self, job_id: str, position: int, result: InvestmentRecommendation):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO job_results (job_id, position, data) VALUES (?, ?, ?)",
+                (job_id, position, result.model_dump_json())
+            )
+
+    def completed_positions(self, job_id: str) -> List[int]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT position FROM job_results WHERE job_id = ? ORDER BY position", (job_id,)
+            ).fetchall()
+        return [position for position, in rows]
+
+    def cancel_requested(self, job_id: str) -> bool:
+        with self._lock:
+            job = self._read(job_id)
+        return job is not None and job.cancel_requested
+
+    def heartbeat(self, job_id: str):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE jobs SET heartbeat_at = ? WHERE id = ? AND status = 'running'", (time.time(), job_id)
+            )
+
+    def claim_next(self) -> Optional[Job]:
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT id FROM jobs WHERE status = 'queued' ORDER BY priority DESC, created_at LIMIT 1"
+                ).fetchone()
+                if row is None:
+                    self._conn.execute("COMMIT")
+                    return None
+                job = self._read(row[0])
+                job.status = "running"
+                job.started_at = job.heartbeat_at = time.time()
+                job.attempts += 1
+                self._write(job)
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        # Results of an earlier attempt, so a reclaimed job resumes where it stopped
+        return self.get(job.id)
+
+    def reclaim_stale(self, timeout: float, max_attempts: int) -> int:
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                rows = self._conn.execute(
+                    "SELECT id FROM jobs WHERE status = 'running' AND COALESCE(heartbeat_at, 0) < ?",
+                    (now - timeout,)
+                ).fetchall()
+                for job_id, in rows:
+                    self._write(_reclaim(self._read(job_id), max_attempts, now))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return len(rows)
+
+    def purge_expired(self) -> int:
+        with self._lock:
+            now = time.time()
+            self._conn.execute(
+                "DELETE FROM job_results WHERE job_id IN "
+                "(SELECT id FROM jobs WHERE expires_at IS NOT NULL AND expires_at <= ?)", (now,)
+            )
+            cursor = self._conn.execute(
+                "DELETE FROM jobs WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,)
+            )
+            return cursor.rowcount
+
+    def close(self):
+        self._conn.close()
+
+
+def create_job_store() -> JobStore:
+    settings = config.JOBS
+    if settings['backend'] == 'sqlite':
+        return SQLiteJobStore(settings['path'])
+    return InMemoryJobStore()
+
+
+class JobQueue:
+    """Worker pool that drains the job store through the orchestrator"""
+    def __init__(self, orchestrator, store: Optional[JobStore] = None, workers: int = None):
+        self.orchestrator = orchestrator
+        self.store = store or create_job_store()
+        self.workers = workers or config.JOBS['workers']
+        self._wakeup = asyncio.Event()
+        self._worker_tasks: List[asyncio.Task] = []
+        self._running: Dict[str, asyncio.Task] = {}
+        self._stopping = False
+
+    async def start(self):
+        self._stopping = False
+        # Jobs left running by a worker process that died
+        await self._reclaim()
+        self._worker_tasks = [asyncio.create_task(self._worker(i)) for i in range(self.workers)]
+        logger.info(f"Started {self.workers} job workers")
+
+    async def stop(self):
+        """Stop the workers; jobs they were running go back to the queue"""
+        self._stopping = True
+        for task in self._worker_tasks:
+            task.cancel()
+        await asyncio.gather(*self._worker_tasks, return_exceptions=True)
+        self._worker_tasks.clear()
+        await run_blocking(self.store.close)
+
+    async def submit(self, tickers: List[str], criteria: dict, priority: int = 0) -> Job:
+        """Queue a job; raises CriteriaError for criteria that could never be evaluated"""
+        validate_criteria(criteria)
+        job = Job(
+            id=uuid.uuid4().hex,
+            priority=priority,
+            tickers=tickers,
+            criteria=criteria,
+            created_at=time.time()
+        )
+        job.progress.total = len(tickers)
+        await run_blocking(self.store.add, job)
+        JOBS_SUBMITTED.inc()
+        self._wakeup.set()
+        return job
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        job = await run_blocking(self.store.get, job_id)
+        if job is not None and job.expires_at and job.expires_at <= time.time():
+            return None
+        return job
+
+    async def cancel(self, job_id: str) -> Optional[Job]:
+        job = await self.get(job_id)
+        if job is None or job.status in FINAL_STATES:
+            return job
+        job.cancel_requested = True
+        if job.status == "queued":
+            await self._finish(job, "cancelled")
+        else:
+            await run_blocking(self.store.save, job)
+            task = self._running.get(job_id)
+            if task is not None:
+                task.cancel()
+        return job
+
+    async def _reclaim(self):
+        settings = config.JOBS
+        if await run_blocking(self.store.reclaim_stale, settings['heartbeat_timeout'], settings['max_attempts']):
+            self._wakeup.set()
+
+    async def _worker(self, index: int):
+        while True:
+            try:
+                job = await run_blocking(self.store.claim_next)
+                if job is None:
+                    await run_blocking(self.store.purge_expired)
+                    await self._reclaim()
+                    self._wakeup.clear()
+                    try:
+                        # Poll as well, so jobs queued by other processes are picked up
+                        await asyncio.wait_for(self._wakeup.wait(), timeout=config.JOBS['poll_interval'])
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+
+                task = asyncio.create_task(self._run(job))
+                self._running[job.id] = task
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    if self._stopping or not task.cancelled():
+                        raise
+                    # Cancelled before the job started running
+                    job.finished_at = time.time()
+                    await self._finish(job, "cancelled")
+                finally:
+                    self._running.pop(job.id, None)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Job worker {index} error: {str(e)}", exc_info=True)
+                await asyncio.sleep(config.JOBS['poll_interval'])
+
+    async def _run(self, job: Job):
+        # A reclaimed job keeps the results of its earlier attempt
+        done = set(await run_blocking(self.store.completed_positions, job.id))
+        remaining = [(position, ticker) for position, ticker in enumerate(job.tickers) if position not in done]
+        tickers = [ticker for _, ticker in remaining]
+        logger.info(f"Running job {job.id} for {len(tickers)} of {len(job.tickers)} tickers")
+        JOBS_RUNNING.inc()
+        pending: List[asyncio.Future] = []
+        writes: List[asyncio.Future] = []
+        heartbeat = asyncio.create_task(self._heartbeat(job, pending))
+        span = tracing.start_span("job", job_id=job.id, tickers=len(job.tickers), priority=job.priority)
+        try:
+            with tracing.use_span(span):
+                criteria_results = await self.orchestrator.prepare_batch(tickers, job.criteria)
+                batched = config.PIPELINE['mode'] == 'batched'
+                if batched:
+                    positions = defaultdict(list)
+                    for position, ticker in remaining:
+                        positions[ticker].append(position)
+                    pending.append(asyncio.ensure_future(self.orchestrator.process_batch(
+                        tickers, job.criteria, criteria_results,
+                        on_result=lambda result: writes.append(asyncio.ensure_future(
+                            self._record(job, positions[result.ticker].pop(0), result)
+                        ))
+                    )))
+                else:
+                    pending.extend(
+                        asyncio.ensure_future(self._process(job, position, ticker, criteria_results.get(ticker)))
+                        for position, ticker in remaining
+                    )
+            try:
+                if batched:
+                    await pending[0]
+                else:
+                    for next_result in asyncio.as_completed(pending):
+                        await self._record(job, *await next_result)
+            finally:
+                for future in pending:
+                    future.cancel()
+                # Keep every result that finished, even when the job is being stopped
+                await asyncio.gather(*writes, return_exceptions=True)
+            await self._finish(job, "completed")
+        except asyncio.CancelledError:
+            if self._stopping and not job.cancel_requested:
+                # Shutting down: hand the job back so a worker resumes it from its stored results
+                await self._release(job)
+                raise
+            await self._finish(job, "cancelled")
+        except Exception as e:
+            logger.error(f"Job {job.id} failed: {str(e)}", exc_info=True)
+            job.error = str(e)
+            await self._finish(job, "failed")
+        finally:
+            heartbeat.cancel()
+            span.set_attribute("status", job.status)
+            span.end()
+            JOBS_RUNNING.dec()
+
+    async def _process(self, job: Job, position: int, ticker: str, criteria_result: Optional[dict]):
+        return position, await self.orchestrator.process_ticker(ticker, job.criteria, criteria_result)
+
+    async def _heartbeat(self, job: Job, pending: List[asyncio.Future]):
+        """Keep the job claimed while it runs, and pick up cancellations from other processes"""
+        settings = config.JOBS
+        last_beat = time.monotonic()
+        while True:
+            await asyncio.sleep(settings['poll_interval'])
+            try:
+                if time.monotonic() - last_beat >= settings['heartbeat_interval']:
+                    await run_blocking(self.store.heartbeat, job.id)
+                    last_beat = time.monotonic()
+                await self._poll_cancel(job, pending)
+            except Exception as e:
+                logger.warning(f"Heartbeat failed for job {job.id}: {str(e)}")
+
+    async def _poll_cancel(self, job: Job, pending: List[asyncio.Future]):
+        """Stop the job's remaining tickers once a cancellation has been stored"""
+        if not job.cancel_requested and await run_blocking(self.store.cancel_requested, job.id):
+            job.cancel_requested = True
+        if job.cancel_requested:
+            for future in pending:
+                future.cancel()
+
+    async def _record(self, job: Job, position: int, result: InvestmentRecommendation):
+        """Save one finished ticker as its own row, at the ticker's position in the job"""
+        await run_blocking(self.store.add_result, job.id, position, result)
+        job.results.append(result)
+        job.progress.completed = len(job.results)
+
+    async def _release(self, job: Job):
+        job.status = "queued"
+        job.attempts -= 1
+        await run_blocking(self.store.save, job)
+
+    async def _finish(self, job: Job, status: str):
+        if job.status in FINAL_STATES:
+            return
+        job.status = status
+        job.finished_at = job.finished_at or time.time()
+        job.expires_at = job.finished_at + config.JOBS['retention']
+        await run_blocking(self.store.save, job)
+        JOBS_FINISHED.inc(status=status)
@@ -0,0 +1,276 @@
+import json
+import logging
+import re
+from typing import Any, List, NamedTuple, Optional, Type
+from pydantic import BaseModel, ValidationError
+from app.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+JSON_EXTRACTIONS = registry.counter(
+    "json_extractions_total", "LLM outputs parsed as JSON, by outcome", ["outcome"]
+)
+
+THINK_OPEN = "<think>"
+THINK_CLOSE = "</think>"
+CLOSERS = {"{": "}", "[": "]"}
+LITERALS = {
+    "true": "true", "false": "false", "null": "null",
+    "True": "true", "False": "false", "None": "null",
+    "NaN": "null", "Infinity": "null", "undefined": "null",
+}
+_STRUCTURAL = re.compile(r"[{}\[\]\"'<]")
+_STRING_SPECIAL = {'"': re.compile(r'["\\]'), "'": re.compile(r"['\\]")}
+_REASONING = re.compile(r"<think>.*?(?:</think>|$)", re.DOTALL)
+_DANGLING_KEY = re.compile(r'([{,])\s*"(?:[^"\\]|\\.)*"\s*:?\s*$')
+_PARTIAL_NUMBER = re.compile(r"(?<=\d)[.eE+\-]+$|(?<=[:\[,\s])-$")
+
+
+class Extraction(NamedTuple):
+    value: Any
+    status: str  # "parsed", "repaired" or "failed"
+    error: Optional[str] = None
+    truncated: bool = False  # the value was closed by repair after the output was cut off
+
+
+class JSONStreamExtractor:
+    """Scans LLM output chunk by chunk and returns each outermost JSON value as soon as it closes.
+
+    Text inside <think> blocks and prose around the JSON are skipped. Brackets
+    inside single or double quoted strings are ignored.
+    """
+    def __init__(self, root: str = "{", skip_reasoning: bool = True):
+        self.root = root
+        self.skip_reasoning = skip_reasoning
+        self._pending = ""
+        self._in_think = False
+        self._candidate: List[str] = []
+        self._stack: List[str] = []
+        self._quote: Optional[str] = None
+        self._escape = False
+
+    def feed(self, chunk: str) -> List[str]:
+        """Consume a chunk and return the JSON candidates it completed"""
+        text = self._pending + chunk
+        self._pending = ""
+        completed = []
+        i, n = 0, len(text)
+        start = 0  # where the unflushed part of the current candidate begins
+        while i < n:
+            if self._in_think:
+                end = text.find(THINK_CLOSE, i)
+                if end == -1:
+                    # Keep what could be the start of a closing tag split across chunks
+                    self._pending = text[max(i, n - len(THINK_CLOSE) + 1):]
+                    return completed
+                self._in_think = False
+                i = start = end + len(THINK_CLOSE)
+                continue
+            if self._escape:
+                self._escape = False
+                i += 1
+                continue
+            if self._quote is not None:
+                match = _STRING_SPECIAL[self._quote].search(text, i)
+                if match is None:
+                    break
+                i = match.end()
+                if match.group() == "\\":
+                    self._escape = True
+                else:
+                    self._quote = None
+                continue
+            match = _STRUCTURAL.search(text, i)
+            if match is None:
+                break
+            j, ch = match.start(), match.group()
+            i = j + 1
+            if ch == "<":
+                if not self.skip_reasoning:
+                    continue
+                tag = text[j:j + len(THINK_OPEN)]
+                if tag == THINK_OPEN:
+                    if self._stack:
+                        self._candidate.append(text[start:j])
+                    self._in_think = True
+                    i = j + len(THINK_OPEN)
+                elif THINK_OPEN.startswith(tag) and j + len(tag) == n:
+                    if self._stack:
+                        self._candidate.append(text[start:j])
+                    self._pending = text[j:]
+                    return completed
+                continue
+            if not self._stack:
+                if ch == self.root:
+                    self._stack.append(CLOSERS[ch])
+                    self._candidate = []
+                    start = j
+                continue
+            if ch in "\"'":
+                self._quote = ch
+            elif ch in CLOSERS:
+                self._stack.append(CLOSERS[ch])
+            elif ch == self._stack[-1]:
+                self._stack.pop()
+                if not self._stack:
+                    completed.append("".join(self._candidate) + text[start:i])
+                    self._candidate = []
+        if self._stack:
+            self._candidate.append(text[start:])
+        return completed
+
+    @property
+    def in_reasoning(self) -> bool:
+        return self._in_think
+
+    @property
+    def depth(self) -> int:
+        """Brackets still open at the end of the text fed so far"""
+        return len(self._stack)
+
+    def finish(self) -> Optional[str]:
+        """The unterminated candidate left when the output was cut off, if any"""
+        return "".join(self._candidate) if self._stack else None
+
+
+def strip_reasoning(text: str) -> str:
+    """Remove <think> blocks, including one left open by a truncated response"""
+    return _REASONING.sub("", text).strip()
+
+
+def _drop_trailing_comma(out: List[str]):
+    while out and out[-1] in " \t\r\n":
+        out.pop()
+    if out and out[-1] == ",":
+        out.pop()
+
+
+def repair_json(text: str) -> str:
+    """Fix the defects LLMs commonly produce in otherwise valid JSON.
+
+    Handles single-quoted strings, unquoted keys and words, Python literals,
+    trailing commas, // comments, raw newlines in strings and truncation
+    (open strings and brackets are closed, dangling keys dropped).
+    """
+    out: List[str] = []
+    stack: List[str] = []
+    quote = None
+    escape = False
+    i, n = 0, len(text)
+    while i < n:
+        ch = text[i]
+        if quote is not None:
+            if escape:
+                if ch == "'":
+                    out[-1] = ch  # \' is not a JSON escape
+                else:
+                    out.append(ch)
+                escape = False
+            elif ch == "\\":
+                out.append(ch)
+                escape = True
+            elif ch == quote:
+                out.append('"')
+                quote = None
+            elif ch == '"':
+                out.append('\\"')
+            elif ch == "\n":
+                out.append("\\n")
+            else:
+                out.append(ch)
+            i += 1
+            continue
+        if ch in "\"'":
+            quote = ch
+            out.append('"')
+        elif ch in CLOSERS:
+            stack.append(CLOSERS[ch])
+            out.append(ch)
+        elif ch in "}]":
+            _drop_trailing_comma(out)
+            if stack and stack[-1] == ch:
+                stack.pop()
+                out.append(ch)
+        elif ch == "/" and text.startswith("//", i):
+            newline = text.find("\n", i)
+            i = n if newline == -1 else newline
+            continue
+        elif ch.isalpha() or ch == "_":
+            j = i
+            while j < n and (text[j].isalnum() or text[j] in "_-."):
+                j += 1
+            word = text[i:j]
+            out.append(LITERALS.get(word) or json.dumps(word))
+            i = j
+            continue
+        else:
+            out.append(ch)
+        i += 1
+
+    if quote is not None:
+        if escape:
+            out.pop()
+        out.append('"')
+    repaired = "".join(out).rstrip()
+    if stack:
+        # Cut off mid-value: drop what cannot be completed before closing
+        repaired = _PARTIAL_NUMBER.sub("", repaired).rstrip().rstrip(",")
+        if repaired.endswith(":"):
+            repaired = _DANGLING_KEY.sub(r"\1", repaired).rstrip().rstrip(",")
+        elif stack[-1] == "}":
+            repaired = _DANGLING_KEY.sub(r"\1", repaired).rstrip().rstrip(",")
+        repaired += "".join(reversed(stack))
+    return repaired
+
+
+def _validate(value: Any, root: str, schema: Optional[Type[BaseModel]]) -> Any:
+    if not isinstance(value, dict if root == "{" else list):
+        raise ValueError(f"Expected a JSON {'object' if root == '{' else 'array'}")
+    if schema is not None:
+        return schema.model_validate(value).model_dump()
+    return value
+
+
+def extract(text: str, schema: Optional[Type[BaseModel]] = None, root: str = "{") -> Extraction:
+    """Find, repair and validate the outermost JSON object (or array) in LLM output"""
+    if not isinstance(text, str):
+        return Extraction(None, "failed", f"Unexpected content type: {type(text).__name__}")
+    stripped = text.strip()
+    if stripped.startswith(root):
+        # Well-formed replies cost no more than json.loads
+        try:
+            value = _validate(json.loads(stripped), root, schema)
+            JSON_EXTRACTIONS.inc(outcome="parsed")
+            return Extraction(value, "parsed")
+        except (ValueError, ValidationError):
+            pass
+    scanner = JSONStreamExtractor(root)
+    candidates = scanner.feed(text)
+    if not candidates and scanner.in_reasoning:
+        # An unclosed <think> block may hold the answer when the model never closed it
+        scanner = JSONStreamExtractor(root, skip_reasoning=False)
+        candidates = scanner.feed(text)
+    candidates = sorted(candidates, key=len, reverse=True)
+    partial = scanner.finish()
+    if partial:
+        candidates.append(partial)
+
+    error = "No JSON found"
+    for candidate in candidates:
+        for status, source in (("parsed", candidate), ("repaired", None)):
+            try:
+                if source is None:
+                    source = repair_json(candidate)
+                value = _validate(json.loads(source), root, schema)
+            except (ValueError, ValidationError) as e:
+                error = str(e).splitlines()[0]
+                continue
+            JSON_EXTRACTIONS.inc(outcome=status)
+            return Extraction(value, status, truncated=candidate is partial)
+    JSON_EXTRACTIONS.inc(outcome="failed")
+    return Extraction(None, "failed", error)
+
+
+def extract_json(text: str, schema: Optional[Type[BaseModel]] = None, root: str = "{") -> Any:
+    """Parsed JSON from LLM output, or None when nothing usable was found"""
+    return extract(text, schema, root).value
@@ -0,0 +1,369 @@
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import logging
+from typing import Dict, Iterable, List, Optional
+from app.config import config
+from app.concurrency import run_blocking
+from app.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# Parts of a CompanyData record, each stamped and refreshed on its own cadence
+SECTIONS = ("fundamentals", "analyst_recommendations", "price_history", "news")
+FACT_SECTIONS = ("fundamentals", "analyst_recommendations", "price_history")
+NEWS_FIELDS = ("title", "summary", "publisher", "published")
+
+STORE_READS = registry.counter("market_store_reads_total", "Market data store lookups", ["outcome"])
+STORE_CHANGES = registry.counter(
+    "market_store_changes_total", "Fields and headlines written because they changed", ["section"]
+)
+STORE_REFRESHES = registry.counter("market_store_refreshes_total", "Refresher fetches by outcome", ["outcome"])
+STORE_UNTRACKED = registry.counter(
+    "market_store_untracked_total", "Tickers dropped from the refresh schedule", ["reason"]
+)
+
+
+def _news_id(item: dict) -> str:
+    return hashlib.sha1(str(item.get("title", "")).strip().lower().encode("utf-8")).hexdigest()[:16]
+
+
+class MarketDataStore:
+    """Per-ticker market data in SQLite, one row per field or headline.
+
+    Every row carries the time its value last changed (as_of), and every
+    ticker section the time it was last checked upstream, so refreshes can
+    write only what changed and readers can tell how fresh a record is.
+    """
+    def __init__(self, path: str, news_limit: int = 3, news_retention: int = 20):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.news_limit = news_limit
+        self.news_retention = news_retention
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS facts ("
+            "ticker TEXT, section TEXT, field TEXT, value TEXT, as_of REAL, PRIMARY KEY (ticker, section, field))"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS news ("
+            "ticker TEXT, id TEXT, title TEXT, summary TEXT, publisher TEXT, published TEXT, as_of REAL, "
+            "PRIMARY KEY (ticker, id))"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS checks ("
+            "ticker TEXT, section TEXT, checked_at REAL, PRIMARY KEY (ticker, section))"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS tracked (ticker TEXT PRIMARY KEY, requested_at REAL, errors INTEGER DEFAULT 0)"
+        )
+        self._lock = threading.Lock()
+
+    def get(self, ticker: str) -> Optional[dict]:
+        """The stored CompanyData record with an as_of stamp per section, or None"""
+        ticker = ticker.upper()
+        with self._lock:
+            facts = self._conn.execute(
+                "SELECT section, field, value, as_of FROM facts WHERE ticker = ?", (ticker,)
+            ).fetchall()
+            news = self._conn.execute(
+                "SELECT title, summary, publisher, published, as_of FROM news WHERE ticker = ? "
+                "ORDER BY as_of DESC, published DESC LIMIT ?", (ticker, self.news_limit)
+            ).fetchall()
+        if not facts and not news:
+            return None
+        record = {"ticker": ticker, **{section: {} for section in FACT_SECTIONS}, "news": []}
+        as_of = {}
+        for section, field, value, changed_at in facts:
+            record[section][field] = json.loads(value)
+            as_of[section] = max(as_of.get(section, 0), changed_at)
+        for *values, changed_at in news:
+            record["news"].append(dict(zip(NEWS_FIELDS, values)))
+            as_of["news"] = max(as_of.get("news", 0), changed_at)
+        record["as_of"] = as_of
+        return record
+
+    def checked(self, ticker: str) -> Dict[str, float]:
+        """When each section of ticker was last checked upstream"""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT section, checked_at FROM checks WHERE ticker = ?", (ticker.upper(),)
+            ).fetchall()
+        return dict(rows)
+
+    def is_fresh(self, ticker: str, max_age: Dict[str, float], now: Optional[float] = None) -> bool:
+        now = now or time.time()
+        checked = self.checked(ticker)
+        return all(now - checked.get(section, 0) < max_age[section] for section in SECTIONS)
+
+    def track(self, tickers: Iterable[str], now: Optional[float] = None):
+        """Add tickers to the refresh schedule, or mark them requested again.
+
+        New tickers are due immediately. Call this only for tickers whose data
+        was fetched successfully, so unknown symbols are never scheduled.
+        """
+        now = now or time.time()
+        tickers = [ticker.upper() for ticker in tickers]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO checks (ticker, section, checked_at) VALUES (?, ?, 0)",
+                [(ticker, section) for ticker in tickers for section in SECTIONS]
+            )
+            self._conn.executemany(
+                "INSERT INTO tracked (ticker, requested_at, errors) VALUES (?, ?, 0) "
+                "ON CONFLICT (ticker) DO UPDATE SET requested_at = excluded.requested_at, errors = 0",
+                [(ticker, now) for ticker in tickers]
+            )
+
+    def touch(self, tickers: Iterable[str], now: Optional[float] = None):
+        """Record a read of tracked tickers, so they are not dropped as idle"""
+        now = now or time.time()
+        with self._lock:
+            self._conn.executemany(
+                "UPDATE tracked SET requested_at = ? WHERE ticker = ?", [(now, ticker.upper()) for ticker in tickers]
+            )
+
+    def untrack(self, tickers: Iterable[str]):
+        """Take tickers off the refresh schedule; their stored rows stay but are no longer fresh"""
+        tickers = [(ticker.upper(),) for ticker in tickers]
+        with self._lock:
+            self._conn.executemany("DELETE FROM tracked WHERE ticker = ?", tickers)
+            self._conn.executemany("DELETE FROM checks WHERE ticker = ?", tickers)
+
+    def record_error(self, ticker: str, sections: Iterable[str], max_errors: int,
+                     now: Optional[float] = None) -> bool:
+        """Count a failed refresh; untracks the ticker and returns True once max_errors are reached in a row"""
+        self.mark_checked(ticker, sections, now)
+        ticker = ticker.upper()
+        with self._lock:
+            self._conn.execute("UPDATE tracked SET errors = errors + 1 WHERE ticker = ?", (ticker,))
+            row = self._conn.execute("SELECT errors FROM tracked WHERE ticker = ?", (ticker,)).fetchone()
+        if row is not None and row[0] < max_errors:
+            return False
+        self.untrack([ticker])
+        return True
+
+    def expire_idle(self, idle_after: float, now: Optional[float] = None) -> List[str]:
+        """Untrack tickers nobody has asked for in idle_after seconds and return them"""
+        now = now or time.time()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT ticker FROM tracked WHERE requested_at < ?", (now - idle_after,)
+            ).fetchall()
+        idle = [ticker for ticker, in rows]
+        if idle:
+            self.untrack(idle)
+        return idle
+
+    def mark_checked(self, ticker: str, sections: Iterable[str], now: Optional[float] = None):
+        """Record a check without a write, e.g. after a failed fetch, so it waits a full max age"""
+        now = now or time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO checks (ticker, section, checked_at) VALUES (?, ?, ?)",
+                [(ticker.upper(), section, now) for section in sections]
+            )
+
+    def due(self, max_age: Dict[str, float], now: Optional[float] = None) -> Dict[str, List[str]]:
+        """Sections past their max age, per tracked ticker"""
+        now = now or time.time()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT checks.ticker, section, checked_at FROM checks JOIN tracked ON tracked.ticker = checks.ticker"
+            ).fetchall()
+        due: Dict[str, List[str]] = {}
+        for ticker, section, checked_at in rows:
+            if section in max_age and now - checked_at >= max_age[section]:
+                due.setdefault(ticker, []).append(section)
+        return due
+
+    def upsert(self, ticker: str, record: dict, sections: Iterable[str] = SECTIONS,
+               now: Optional[float] = None) -> Dict[str, int]:
+        """Write the given sections of a fetched record, touching only changed rows.
+
+        Returns the number of changed fields or new headlines per section.
+        """
+        ticker = ticker.upper()
+        now = now or time.time()
+        sections = [section for section in sections if section in record]
+        changes = {}
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                for section in sections:
+                    if section == "news":
+                        changes[section] = self._upsert_news(ticker, record["news"] or [], now)
+                    else:
+                        changes[section] = self._upsert_facts(ticker, section, record[section] or {}, now)
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO checks (ticker, section, checked_at) VALUES (?, ?, ?)",
+                    [(ticker, section, now) for section in sections]
+                )
+                self._conn.execute("UPDATE tracked SET errors = 0 WHERE ticker = ?", (ticker,))
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        for section, count in changes.items():
+            if count:
+                STORE_CHANGES.inc(count, section=section)
+        return changes
+
+    def _upsert_facts(self, ticker: str, section: str, values: dict, now: float) -> int:
+        stored = dict(self._conn.execute(
+            "SELECT field, value FROM facts WHERE ticker = ? AND section = ?", (ticker, section)
+        ).fetchall())
+        encoded = {field: json.dumps(value, sort_keys=True, default=str) for field, value in values.items()}
+        changed = [(ticker, section, field, value, now)
+                   for field, value in encoded.items() if stored.get(field) != value]
+        removed = [(ticker, section, field) for field in stored if field not in encoded]
+        self._conn.executemany(
+            "INSERT OR REPLACE INTO facts (ticker, section, field, value, as_of) VALUES (?, ?, ?, ?, ?)", changed
+        )
+        self._conn.executemany("DELETE FROM facts WHERE ticker = ? AND section = ? AND field = ?", removed)
+        return len(changed) + len(removed)
+
+    def _upsert_news(self, ticker: str, items: List[dict], now: float) -> int:
+        rows = [
+            (ticker, _news_id(item), *(None if item.get(field) is None else str(item[field]) for field in NEWS_FIELDS), now)
+            for item in items if item.get("title")
+        ]
+        cursor = self._conn.executemany(
+            "INSERT OR IGNORE INTO news (ticker, id, title, summary, publisher, published, as_of) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)", rows
+        )
+        self._conn.execute(
+            "DELETE FROM news WHERE ticker = ? AND id NOT IN ("
+            "SELECT id FROM news WHERE ticker = ? ORDER BY as_of DESC, published DESC LIMIT ?)",
+            (ticker, ticker, self.news_retention)
+        )
+        return cursor.rowcount
+
+    def close(self):
+        self._conn.close()
+
+
+_store: Optional[MarketDataStore] = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> MarketDataStore:
+    """Return the process-wide store configured by Config.MARKET_STORE"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            settings = config.MARKET_STORE
+            _store = MarketDataStore(
+                settings['path'], news_limit=config.DATA_SOURCE['news_limit'],
+                news_retention=settings['news_retention']
+            )
+            logger.info(f"Opened market data store at {settings['path']}")
+        return _store
+
+
+def close_store():
+    global _store
+    with _store_lock:
+        if _store is not None:
+            _store.close()
+            _store = None
+
+
+def read_fresh(ticker: str) -> Optional[dict]:
+    """Fresh stored record for ticker, or None when the store is off or stale.
+
+    A hit keeps the ticker on the refresh schedule. Misses are not tracked
+    here; track_fetched adds the ticker once its data was fetched.
+    """
+    if not config.MARKET_STORE['enabled']:
+        return None
+    store = get_store()
+    if store.is_fresh(ticker, config.MARKET_STORE['max_age']):
+        record = store.get(ticker)
+        if record is not None:
+            STORE_READS.inc(outcome="fresh")
+            store.touch([ticker])
+            return {**record, "ticker": ticker}
+    STORE_READS.inc(outcome="miss")
+    return None
+
+
+def track_fetched(ticker: str):
+    """Put a ticker on the refresh schedule after its data was fetched successfully"""
+    if config.MARKET_STORE['enabled']:
+        get_store().track([ticker])
+
+
+class MarketDataRefresher:
+    """Background task that keeps tracked tickers current in the store.
+
+    Each tick fetches only the sections past their max age, batching tickers
+    that are due for the same sections into one provider call. Tickers that
+    keep failing or that nobody asks for any more are dropped.
+    """
+    def __init__(self, provider, store: Optional[MarketDataStore] = None):
+        self.provider = provider
+        self.store = store
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """Start refreshing; a no-op unless MARKET_STORE is enabled"""
+        if not config.MARKET_STORE['enabled']:
+            return
+        self.store = self.store or get_store()
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"Started market data refresher every {config.MARKET_STORE['refresh_interval']}s")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.refresh_due()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Market data refresh failed: {str(e)}")
+            await asyncio.sleep(config.MARKET_STORE['refresh_interval'])
+
+    async def refresh_due(self) -> Dict[str, Dict[str, int]]:
+        """Fetch every due section once and return the changes written per ticker"""
+        settings = config.MARKET_STORE
+        idle = await run_blocking(self.store.expire_idle, settings['idle_after'])
+        if idle:
+            STORE_UNTRACKED.inc(len(idle), reason="idle")
+            logger.info(f"Stopped refreshing {len(idle)} tickers nobody asked for: {idle}")
+        due = await run_blocking(self.store.due, settings['max_age'])
+        groups: Dict[tuple, List[str]] = {}
+        for ticker, sections in due.items():
+            groups.setdefault(tuple(sorted(sections)), []).append(ticker)
+
+        changes = {}
+        for sections, tickers in groups.items():
+            for start in range(0, len(tickers), settings['refresh_batch']):
+                batch = tickers[start:start + settings['refresh_batch']]
+                records = await run_blocking(self.provider.fetch, batch, list(sections))
+                for ticker in batch:
+                    record = records.get(ticker) or {"error": f"No data for {ticker}"}
+                    if "error" in record:
+                        STORE_REFRESHES.inc(outcome="error")
+                        logger.warning(f"Could not refresh {ticker}: {record['error']}")
+                        if await run_blocking(self.store.record_error, ticker, sections, settings['max_errors']):
+                            STORE_UNTRACKED.inc(reason="errors")
+                            logger.warning(f"Stopped refreshing {ticker} after {settings['max_errors']} failed refreshes")
+                        continue
+                    STORE_REFRESHES.inc(outcome="ok")
+                    changes[ticker] = await run_blocking(self.store.upsert, ticker, record, sections)
+        if changes:
+            logger.info(f"Refreshed {len(changes)} tickers in the market data store")
+        return changes
@@ -0,0 +1,250 @@
+import asyncio
+import hashlib
+import json
+import logging
+import math
+import random
+import re
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from string import Template
+from typing import Any, AsyncIterator, Deque, Dict, Iterator, List, Optional, Tuple
+
+from agno.exceptions import ModelRateLimitError
+from agno.models.base import Model
+from agno.models.message import Message
+from agno.models.response import ModelResponse
+from agno.tools import Toolkit
+from app.features import FEATURE_ALIASES, TEXT_FEATURES
+from app.json_extract import extract
+
+logger = logging.getLogger(__name__)
+
+TOOL_NAME = "get_company_data"
+
+# Prompts may carry JSON nested inside JSON strings, so quotes can be escaped
+_TICKER_FIELD = re.compile(r'\\?"ticker\\?"\s*:\s*\\?"([^"\\]+)')
+_TICKER_REQUEST = re.compile(r"\bfor ([A-Z][A-Z0-9.\-]*)\b|\(([A-Z][A-Z0-9.\-]*)\)")
+_BATCH_ITEM = re.compile(r"^([A-Z][A-Z0-9.\-]{0,9}): ", re.MULTILINE)
+_NUMBER_FIELD = re.compile(r'\\?"(\w+)\\?"\s*:\s*(-?\d+(?:\.\d+)?(?:[eE][-+]?\d+)?)')
+
+# Raw provider keys (e.g. trailingPE) -> canonical feature name and scale
+_FACT_ALIASES: Dict[str, Tuple[str, float]] = {
+    key: (name, scale)
+    for name, aliases in FEATURE_ALIASES.items() if name not in TEXT_FEATURES
+    for _, key, scale in aliases
+}
+
+# Requests per model id in the last minute, shared by every MockModel instance
+_windows: Dict[str, Deque[float]] = {}
+_windows_lock = threading.Lock()
+
+
+class _Facts(dict):
+    """Template values; metrics missing from the prompt render as null"""
+    def __missing__(self, key):
+        return "null"
+
+
+def _facts(text: str) -> _Facts:
+    """First value of each numeric metric mentioned in a prompt, by canonical name"""
+    facts = _Facts()
+    for key, value in _NUMBER_FIELD.findall(text):
+        name, scale = _FACT_ALIASES.get(key, (key, 1.0))
+        facts.setdefault(name, f"{float(value) * scale:.4g}")
+    return facts
+
+
+def _stable_index(*parts: str) -> int:
+    return int(hashlib.md5("|".join(parts).encode()).hexdigest()[:8], 16)
+
+
+def load_recordings(path: str) -> Dict[str, List[str]]:
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Could not load mock LLM recordings from {path}: {str(e)}")
+        return {}
+
+
+@dataclass
+class MockModel(Model):
+    """Deterministic offline stand-in for a provider model.
+
+    Replays the recorded responses for its agent with the prompt's ticker and
+    metrics filled in, after a simulated latency drawn from settings. It can
+    also raise rate-limit errors at random (error_rate) or when a per-minute
+    request quota (rpm) is exceeded. The data agent's first turn calls the
+    fixture finance tool, like the real model calls YFinanceTools.
+    """
+    id: str = "mock"
+    name: str = "MockModel"
+    provider: str = "Mock"
+    agent: str = "analysis_agent"
+    settings: Dict[str, Any] = field(default_factory=dict)
+
+    def __post_init__(self):
+        super().__post_init__()
+        self._rng = random.Random(self.settings.get('seed', 0))
+        self._recordings = None
+
+    # -*- Simulated provider behaviour
+
+    def _latency(self, output_tokens: int) -> float:
+        settings = self.settings
+        median = settings.get('latency_ms', 0) / 1000
+        spread = settings.get('latency_spread', 0)
+        distribution = settings.get('latency', 'fixed')
+        if distribution == 'lognormal' and median > 0:
+            delay = self._rng.lognormvariate(math.log(median), spread)
+        elif distribution == 'uniform':
+            delay = self._rng.uniform(median * (1 - spread), median * (1 + spread))
+        else:
+            delay = median
+        return max(delay, 0) + output_tokens * settings.get('ms_per_output_token', 0) / 1000
+
+    def _check_rate_limit(self):
+        """Raise the 429 a provider would for a random failure or an exhausted quota"""
+        error_rate = self.settings.get('error_rate', 0)
+        if error_rate and self._rng.random() < error_rate:
+            raise ModelRateLimitError(
+                f"Rate limit reached for model {self.id}. Please try again in 1.5s.", model_id=self.id
+            )
+        rpm = self.settings.get('rpm', 0)
+        if not rpm:
+            return
+        now = time.monotonic()
+        with _windows_lock:
+            window = _windows.setdefault(self.id, deque())
+            while window and now - window[0] >= 60:
+                window.popleft()
+            if len(window) >= rpm:
+                retry_after = 60 - (now - window[0])
+                raise ModelRateLimitError(
+                    f"Rate limit reached for model {self.id} on requests per minute (RPM): "
+                    f"Limit {rpm}. Please try again in {retry_after:.2f}s.", model_id=self.id
+                )
+            window.append(now)
+
+    # -*- Responses
+
+    def _recorded(self, key: str) -> List[str]:
+        if self._recordings is None:
+            self._recordings = load_recordings(self.settings.get('recordings', ''))
+        return self._recordings.get(key) or ['{"ticker": "${ticker}"}']
+
+    def _render(self, ticker: str, text: str, **extra) -> str:
+        templates = self._recorded(self.agent)
+        template = templates[_stable_index(self.agent, ticker) % len(templates)]
+        values = _facts(text)
+        values.update(ticker=ticker, **extra)
+        return Template(template).safe_substitute(values)
+
+    def _batch(self, prompt: str) -> str:
+        """Answer a batched prompt with one recorded element per ticker section"""
+        matches = list(_BATCH_ITEM.finditer(prompt))
+        elements = []
+        for match, following in zip(matches, matches[1:] + [None]):
+            ticker = match.group(1)
+            section = prompt[match.end():following.start() if following else len(prompt)]
+            element = extract(self._render(ticker, section)).value
+            if isinstance(element, dict):
+                elements.append({"ticker": ticker, **element})
+        return json.dumps(elements)
+
+    def _respond(self, messages: List[Message], tools: Optional[List[Dict[str, Any]]]) -> Dict[str, Any]:
+        last = messages[-1]
+        if last.role == "tool":
+            # Data agent's second turn: answer from the tool result
+            tool_result = last.get_content_string()
+            ticker = next(iter(_TICKER_FIELD.findall(tool_result)), "UNKNOWN")
+            return {"content": self._render(ticker, tool_result, tool_result=tool_result)}
+
+        prompt = next((m.get_content_string() for m in reversed(messages) if m.role == "user"), "")
+        request = _TICKER_REQUEST.search(prompt)
+        tool_names = {tool.get('function', {}).get('name') for tool in tools or []}
+        if TOOL_NAME in tool_names and request:
+            ticker = request.group(1) or request.group(2)
+            return {"tool_calls": [{
+                "id": f"call_{_stable_index(ticker, str(len(messages))):08x}",
+                "type": "function",
+                "function": {"name": TOOL_NAME, "arguments": json.dumps({"symbol": ticker})},
+            }]}
+        if "JSON array" in prompt:
+            return {"content": self._batch(prompt)}
+        ticker = next(iter(_TICKER_FIELD.findall(prompt)), None)
+        if ticker is None:
+            ticker = (request.group(1) or request.group(2)) if request else "UNKNOWN"
+        return {"content": self._render(ticker, prompt)}
+
+    def _complete(self, messages: List[Message], tools) -> Tuple[Dict[str, Any], float]:
+        self._check_rate_limit()
+        response = self._respond(messages, tools)
+        output = response.get("content") or json.dumps(response.get("tool_calls"))
+        input_tokens = sum(len(m.get_content_string() or "") for m in messages) // 4
+        output_tokens = len(output) // 4
+        response["usage"] = {
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens,
+        }
+        return response, self._latency(output_tokens)
+
+    # -*- agno Model interface
+
+    def invoke(self, messages: List[Message], response_format=None, tools=None, tool_choice=None, **kwargs):
+        response, delay = self._complete(messages, tools)
+        time.sleep(delay)
+        return response
+
+    async def ainvoke(self, messages: List[Message], response_format=None, tools=None, tool_choice=None, **kwargs):
+        response, delay = self._complete(messages, tools)
+        await asyncio.sleep(delay)
+        return response
+
+    def invoke_stream(self, *args, **kwargs) -> Iterator[Dict[str, Any]]:
+        yield self.invoke(*args, **kwargs)
+
+    async def ainvoke_stream(self, *args, **kwargs) -> AsyncIterator[Dict[str, Any]]:
+        yield await self.ainvoke(*args, **kwargs)
+
+    def parse_provider_response(self, response: Dict[str, Any], **kwargs) -> ModelResponse:
+        return ModelResponse(
+            role="assistant",
+            content=response.get("content"),
+            tool_calls=response.get("tool_calls") or [],
+            response_usage=response.get("usage"),
+        )
+
+    def parse_provider_response_delta(self, response: Dict[str, Any]) -> ModelResponse:
+        return self.parse_provider_response(response)
+
+
+# Share classes the fixture records under another symbol
+SHARE_CLASSES = {"GOOG": "GOOGL"}
+
+
+class FixtureFinanceTools(Toolkit):
+    """Offline replacement for YFinanceTools serving the recorded market data fixture"""
+    def __init__(self, path: str):
+        with open(path) as f:
+            self._records = {ticker.upper(): record for ticker, record in json.load(f).items()}
+        super().__init__(name="fixture_finance_tools", tools=[self.get_company_data])
+
+    def get_company_data(self, symbol: str) -> str:
+        """Get the current price, fundamentals, analyst recommendations and recent news for a stock.
+
+        Args:
+            symbol (str): The stock ticker symbol.
+
+        Returns:
+            str: JSON with the company's financial data.
+        """
+        symbol = symbol.upper()
+        record = self._records.get(symbol) or self._records.get(SHARE_CLASSES.get(symbol, symbol))
+        if record is None:
+            return json.dumps({"ticker": symbol, "error": f"No data found for {symbol}"})
+        return json.dumps({**record, "ticker": symbol})
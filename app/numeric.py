@@ -0,0 +1,125 @@
+import math
+import re
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional
+
+NULL_TOKENS = {"", "n/a", "na", "nan", "null", "none", "-", "--", "—", "unknown", "not available"}
+
+SUFFIXES = {
+    "k": 1e3, "thousand": 1e3,
+    "m": 1e6, "mm": 1e6, "mn": 1e6, "million": 1e6,
+    "b": 1e9, "bn": 1e9, "billion": 1e9,
+    "t": 1e12, "tn": 1e12, "trillion": 1e12,
+}
+
+# Words that wrap a number without changing it, e.g. "above 30" or "~25x"
+_QUALIFIER = (
+    r"(?:(?:above|below|over|under|around|about|approx(?:imately|\.)?|roughly|nearly|almost"
+    r"|at least|at most|up to|less than|more than|greater than)\s+|[~≈<>]=?\s*)?"
+)
+_UNIT = r"(?:\s*(?:x|times|usd|dollars|per share|pts|points))?"
+
+
+def _token(name: str) -> str:
+    return (
+        rf"(?P<{name}_paren>\()?\s*(?P<{name}_sign>[-+−])?\s*[$€£¥]?\s*(?P<{name}_sign2>[-+−])?"
+        rf"(?P<{name}_digits>\d{{1,3}}(?:,\d{{3}})+(?:\.\d+)?|\d+(?:\.\d+)?|\.\d+)"
+        rf"(?:e(?P<{name}_exp>[-+]?\d+))?"
+        rf"(?:\s*(?P<{name}_suffix>{'|'.join(sorted(SUFFIXES, key=len, reverse=True))})(?![a-z]))?"
+        rf"\s*(?P<{name}_pct>%)?\s*(?({name}_paren)\))"
+    )
+
+
+_SINGLE = re.compile(rf"{_QUALIFIER}{_token('a')}{_UNIT}", re.IGNORECASE)
+_RANGE = re.compile(rf"{_token('a')}{_UNIT}\s*(?:-|–|—|to)\s*{_token('b')}{_UNIT}", re.IGNORECASE)
+_HAS_QUALIFIER = re.compile(r"\b(?:above|below|over|under|around|about|approx|roughly)\b", re.IGNORECASE)
+_EMBEDDED = re.compile(_token('a'), re.IGNORECASE)
+
+
+def _value(match: "re.Match", name: str, percent: bool = False) -> float:
+    group = match.groupdict()
+    value = float(group[f"{name}_digits"].replace(",", ""))
+    if group[f"{name}_exp"]:
+        value *= 10 ** int(group[f"{name}_exp"])
+    suffix = group[f"{name}_suffix"]
+    if suffix:
+        value *= SUFFIXES[suffix.lower()]
+    if group[f"{name}_pct"] or percent:
+        value /= 100
+    negative = (group[f"{name}_sign"] in ("-", "−")) != (group[f"{name}_sign2"] in ("-", "−"))
+    if group[f"{name}_paren"]:
+        negative = not negative
+    return -value if negative else value
+
+
+@lru_cache(maxsize=4096)
+def _parse_text(text: str) -> Optional[float]:
+    text = text.strip()
+    if text.lower() in NULL_TOKENS:
+        return None
+    match = _SINGLE.fullmatch(text)
+    if match:
+        return _value(match, "a")
+    match = _RANGE.fullmatch(text)
+    if match:
+        # "10-20%" applies the percent sign to both ends
+        percent = bool(match.group("a_pct") or match.group("b_pct"))
+        return (_value(match, "a", percent) + _value(match, "b", percent)) / 2
+    if _HAS_QUALIFIER.search(text):
+        # e.g. "P/E above 30": take the first number after the words
+        match = _EMBEDDED.search(text)
+        if match:
+            return _value(match, "a")
+    return None
+
+
+def parse_number(value: Any) -> Optional[float]:
+    """Parse a numeric-ish metric value from an LLM or data provider.
+
+    Handles thousands separators, K/M/B/T suffixes, percentages (returned as
+    fractions), currency symbols, negatives (including accounting-style
+    parentheses), ranges (returned as the midpoint) and qualifiers such as
+    "above 30". Anything else, NaN and infinities become None.
+    """
+    if isinstance(value, bool) or value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value) if math.isfinite(value) else None
+    if isinstance(value, str):
+        return _parse_text(value)
+    return None
+
+
+def normalize_column(values: Iterable[Any]) -> List[Optional[float]]:
+    """Parse a column of metric values, parsing each distinct string only once"""
+    parsed = {}
+    column = []
+    for value in values:
+        if type(value) is float and math.isfinite(value):
+            column.append(value)
+        elif isinstance(value, str):
+            if value not in parsed:
+                parsed[value] = _parse_text(value)
+            column.append(parsed[value])
+        else:
+            column.append(parse_number(value))
+    return column
+
+
+def normalize_metrics(metrics: Any) -> Dict[str, Optional[float]]:
+    """Numeric key_metrics from whatever the model produced; non-dicts give {}"""
+    if not isinstance(metrics, dict):
+        return {}
+    return dict(zip(metrics.keys(), normalize_column(metrics.values())))
+
+
+def normalize_metrics_batch(rows: List[Any]) -> List[Dict[str, Optional[float]]]:
+    """Normalize the key_metrics of many recommendations column by column"""
+    rows = [row if isinstance(row, dict) else {} for row in rows]
+    keys = [list(row) for row in rows]
+    column = normalize_column(value for row in rows for value in row.values())
+    normalized, position = [], 0
+    for row_keys in keys:
+        normalized.append(dict(zip(row_keys, column[position:position + len(row_keys)])))
+        position += len(row_keys)
+    return normalized
@@ -104,188 +104,751 @@
 #         return await asyncio.gather(*tasks)
 
 import asyncio
+import contextvars
+import random
 import time
 import logging
 import json
-from contextlib import asynccontextmanager
-from typing import List, Dict, Any
+import hashlib
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Callable, List, Dict, Any, Optional
 from app.config import config
-from app.agents.data_agent import DataAgent
-from app.agents.analysis_agent import AnalysisAgent
-from app.agents.recommendation_agent import RecommendationAgent
+from app.cache import get_cache
+from app.concurrency import SingleFlight, run_blocking
+from app.data_providers import get_provider
+from app.sentiment import add_news_sentiment_batch
+from app.agents.analysis_agent import analysis_batch_item
+from app.agents.recommendation_agent import recommendation_batch_item
+from app.agents.verification_agent import VerificationAgent
+from app.compaction import count_tokens
+from app.criteria import evaluate_criteria
+from app.metrics import registry
+from app.rate_limit import RateLimitError
+from app.pool import AgentPools
+from app import tracing
 from app.schemas import InvestmentRecommendation
 
 logger = logging.getLogger(__name__)
 
-class VerificationAgent:
-    """Verifies recommendations against source data"""
-    def verify(self, recommendation: Dict[str, Any], source_data: Dict[str, Any]) -> Dict[str, Any]:
-        """Validates recommendation metrics against source data"""
-        warnings = recommendation.get('warnings', [])
-        sources = recommendation.get('sources', [])
-        
-        # Metric verification
-        metric_discrepancies = []
-        for metric, rec_value in recommendation.get('key_metrics', {}).items():
-            src_value = None
-            for data_section in ['fundamentals', 'analyst_recommendations', 'key_metrics']:
-                if data_section in source_data and metric in source_data[data_section]:
-                    src_value = source_data[data_section][metric]
-                    break
-            
-            if src_value and rec_value:
-                try:
-                    # Normalize values
-                    rec_num = float(str(rec_value).replace('%', ''))
-                    src_num = float(str(src_value).replace('%', ''))
-                    
-                    # Check for significant discrepancies (>5%)
-                    if abs(rec_num - src_num) > 0.05 * src_num:
-                        metric_discrepancies.append(metric)
-                        sources.append(f"Discrepancy in {metric}: {rec_num} vs {src_num}")
-                except ValueError:
-                    if str(rec_value).lower() != str(src_value).lower():
-                        metric_discrepancies.append(metric)
-        
-        if metric_discrepancies:
-            warnings.append(f"Metric discrepancies: {', '.join(metric_discrepancies)}")
-        
-        # Confidence check
-        if recommendation.get('confidence_score', 0) < config.MIN_CONFIDENCE:
-            warnings.append(f"Low confidence ({recommendation['confidence_score']})")
-        
-        return {
-            **recommendation,
-            "warnings": warnings,
-            "sources": sources
-        }
+STAGE_RETRIES = registry.counter("pipeline_stage_retries_total", "Stage retries after rate limiting", ["stage"])
+STAGE_SECONDS = registry.histogram("pipeline_stage_seconds", "Wall time per pipeline stage, cache hits included", ["stage", "model"])
+PIPELINE_SECONDS = registry.histogram("pipeline_seconds", "Wall time of the full pipeline for one ticker", ["outcome"])
+METRIC_DISCREPANCIES = registry.counter(
+    "verification_metric_discrepancies_total", "Recommended key metrics that disagree with source data", ["feature"]
+)
+VERIFIED_RECOMMENDATIONS = registry.counter(
+    "verification_recommendations_total", "Verified recommendations, by whether any discrepancy was found", ["discrepancies"]
+)
+FUSED_FALLBACKS = registry.counter(
+    "fused_fallbacks_total", "Fused calls whose structured output was unusable, re-run as two calls"
+)
+BATCH_SIZE = registry.histogram(
+    "llm_batch_size", "Tickers packed into one batched LLM call", ["stage"], buckets=(1, 2, 4, 8, 16, 32)
+)
+BATCH_FALLBACKS = registry.counter(
+    "llm_batch_fallbacks_total", "Tickers re-run per ticker after a batched call left them out", ["stage"]
+)
+PIPELINE_RESUMES = registry.counter(
+    "pipeline_resumes_total", "Pipeline runs resumed from a checkpoint, by the first stage re-run", ["stage"]
+)
+SYMBOL_FALLBACKS = registry.counter(
+    "data_symbol_fallbacks_total", "Data lookups won by a fallback symbol", ["symbol"]
+)
+CONFIDENCE_SCORE = registry.histogram(
+    "recommendation_confidence_score", "Confidence score of verified recommendations",
+    buckets=(0.1, 0.2, 0.3, 0.4, 0.5, 0.6, 0.7, 0.8, 0.9, 1.0)
+)
+
+# Set inside background refreshes, so they are not counted as live traffic
+_background = contextvars.ContextVar("background_refresh", default=False)
+
+# Warnings that mark a placeholder result for a failed pipeline
+ERROR_WARNINGS = {"Processing error", "Max retries reached"}
+
+def is_error_result(result: InvestmentRecommendation) -> bool:
+    """Whether result stands in for a failed pipeline rather than being a recommendation"""
+    return bool(ERROR_WARNINGS.intersection(result.warnings))
+
+def _pack_batches(items: Dict[str, str], model_id: str, output_tokens: int) -> List[Dict[str, str]]:
+    """Greedily group prompt items so each call stays within the model's token budget"""
+    settings = config.PIPELINE
+    limits = config.RATE_LIMITS.get(model_id, config.RATE_LIMITS['default'])
+    budget = min(settings['batch_token_budget'], limits['tpm'])
+    batches, current, used = [], {}, 0
+    for ticker, item in items.items():
+        cost = count_tokens(item) + output_tokens
+        if current and (used + cost > budget or len(current) >= settings['batch_max_tickers']):
+            batches.append(current)
+            current, used = {}, 0
+        current[ticker] = item
+        used += cost
+    if current:
+        batches.append(current)
+    return batches
 
 class Orchestrator:
-    def __init__(self):
-        """Initialize with proper client tracking"""
-        self._clients = []
-        self.data_agent = self._init_agent(DataAgent)
-        self.analysis_agent = self._init_agent(AnalysisAgent)
-        self.recommendation_agent = self._init_agent(RecommendationAgent)
+    def __init__(self, pools: Optional[AgentPools] = None):
+        """Initialize with an app-scoped agent pool"""
+        self.pools = pools or AgentPools()
         self.verification_agent = VerificationAgent()
-        self.cache = {}
+        self.cache = get_cache("recommendations", stale_ttl=config.CACHE_SETTINGS['stale_ttl'])
+        stages = config.CACHE_SETTINGS['stages']
+        self.data_cache = get_cache("company_data", ttl=stages['company_data']['ttl'])
+        self.analysis_cache = get_cache("analysis", ttl=stages['analysis']['ttl'])
+        self.checkpoints = get_cache("pipeline_checkpoints", ttl=config.PIPELINE['checkpoint_ttl'])
+        self._data_flight = SingleFlight("company_data")
+        self._analysis_flight = SingleFlight("analysis")
+        self._recommendation_flight = SingleFlight("recommendation")
+        self._refresh_tasks = set()
+        self.live_requests = 0
+        self._stage_models = {
+            "data": get_provider().name if config.DATA_SOURCE['mode'] == 'direct'
+            else config.AGENT_CONFIG['data_agent'].id,
+            "analysis": config.AGENT_CONFIG['analysis_agent'].id,
+            "recommendation": config.AGENT_CONFIG['recommendation_agent'].id,
+            "fused": config.AGENT_CONFIG['fused_agent'].id,
+            "verification": "rules",
+        }
 
-    def _init_agent(self, agent_class):
-        """Initialize agent and track its client"""
-        agent = agent_class()
-        if hasattr(agent, 'agent') and hasattr(agent.agent, 'client'):
-            self._clients.append(agent.agent.client)
-        return agent
+    async def start(self):
+        """Warm agents and model clients before serving traffic"""
+        self.pools.warm()
 
     async def cleanup(self):
         """Explicitly clean up all resources"""
-        for client in self._clients:
+        for task in list(self._refresh_tasks):
+            task.cancel()
+        await asyncio.gather(*self._refresh_tasks, return_exceptions=True)
+        await self.pools.close()
+
+    @contextmanager
+    def _live(self):
+        """Count a user-facing request while it runs, so background refreshes can yield to it"""
+        if _background.get():
+            yield
+            return
+        self.live_requests += 1
+        try:
+            yield
+        finally:
+            self.live_requests -= 1
+
+    async def refresh(self, ticker: str, criteria: Dict[str, Any]) -> InvestmentRecommendation:
+        """Recompute and cache a recommendation as background work, ignoring any cached one"""
+        token = _background.set(True)
+        try:
+            cache_key = self._cache_key(ticker, criteria)
+            with tracing.span("refresh", ticker=ticker):
+                return await self._recommendation_flight.do(
+                    cache_key, lambda: self._run_pipeline(ticker, criteria, cache_key)
+                )
+        finally:
+            _background.reset(token)
+
+    def _revalidate(self, ticker: str, criteria: Dict[str, Any]):
+        """Refresh a stale result in the background while the caller is served the stale one"""
+        task = asyncio.create_task(self.refresh(ticker, criteria))
+        self._refresh_tasks.add(task)
+        task.add_done_callback(self._refresh_tasks.discard)
+
+    def _cached_result(self, ticker: str, criteria: Dict[str, Any], cache_key: str) -> Optional[InvestmentRecommendation]:
+        """A fresh cached result, or a stale one whose refresh has just been started"""
+        entry = self.cache.get_stale(cache_key)
+        if entry is None:
+            return None
+        cached, fresh = entry
+        if fresh:
+            logger.info(f"Using cached result for {ticker}")
+        else:
+            logger.info(f"Serving stale result for {ticker} while it refreshes")
+            self._revalidate(ticker, criteria)
+        return cached
+
+    async def _retry_stage(self, stage: str, func):
+        """Retry only the given stage when it is rate limited, following its retry policy"""
+        policies = config.STAGE_RETRY_POLICIES
+        policy = {**policies['default'], **policies.get(stage, {})}
+        attempts = 0
+        while True:
+            try:
+                return await func()
+            except RateLimitError as e:
+                attempts += 1
+                if attempts >= policy['max_attempts']:
+                    raise
+                STAGE_RETRIES.inc(stage=stage)
+                delay = e.retry_after or min(policy['max_delay'], policy['base_delay'] * 2 ** (attempts - 1))
+                delay = round(delay * (1 + random.uniform(0, policy['jitter'])), 2)
+                tracing.current_span().set_attributes(retry_attempts=attempts, retry_delay=delay)
+                logger.warning(f"Rate limit hit in {stage} stage. Retry {attempts}/{policy['max_attempts']} in {delay}s")
+                await asyncio.sleep(delay)
+
+    async def _generate(self, analysis) -> dict:
+        async with self.pools.recommendation.checkout() as recommendation_agent:
+            return await recommendation_agent.agenerate(analysis)
+
+    async def _recommend_fused(self, company_data: dict, criteria: Dict[str, Any], criteria_result: dict) -> dict:
+        async with self.pools.fused.checkout() as fused_agent:
+            return await fused_agent.arecommend(company_data, criteria, criteria_result)
+
+    async def _collect_data(self, ticker: str) -> dict:
+        """Collect company data, reusing market data cached for the ticker"""
+        if config.CACHE_SETTINGS['enabled']:
+            cached = self.data_cache.get(ticker)
+            tracing.current_span().set_attribute("cache_hit", cached is not None)
+            if cached is not None:
+                logger.info(f"Using cached company data for {ticker}")
+                return cached
+        return await self._data_flight.do(
+            ticker, lambda: self._retry_stage("data", lambda: self._fetch_data(ticker))
+        )
+
+    async def _fetch_data(self, ticker: str) -> dict:
+        if config.DATA_SOURCE['mode'] == 'direct':
+            return (await self._fetch_direct([ticker]))[ticker]
+
+        company_data = await self._race_symbols([ticker] + config.PIPELINE['symbol_fallbacks'].get(ticker, []))
+        if company_data and "error" not in company_data and config.CACHE_SETTINGS['enabled']:
+            self.data_cache.set(ticker, company_data)
+        return company_data
+
+    async def _lookup_symbol(self, symbol: str) -> dict:
+        async with self.pools.data.checkout() as data_agent:
+            return await data_agent.acollect_data(symbol)
+
+    async def _race_symbols(self, symbols: List[str]) -> dict:
+        """Look up a ticker and its fallback symbols at once; the first usable record wins.
+
+        The other lookups are cancelled. If none succeeds, a rate limit error
+        is raised so the stage retries, otherwise the first symbol's error is returned.
+        """
+        if len(symbols) == 1:
+            return await self._lookup_symbol(symbols[0])
+        pending = {asyncio.create_task(self._lookup_symbol(symbol)): symbol for symbol in symbols}
+        failures = {}
+        try:
+            while pending:
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    symbol = pending.pop(task)
+                    record = None if task.exception() else task.result()
+                    if record and "error" not in record:
+                        if symbol != symbols[0]:
+                            logger.info(f"Using {symbol} data for {symbols[0]}")
+                            SYMBOL_FALLBACKS.inc(symbol=symbol)
+                        return record
+                    failures[symbol] = task.exception() or record
+        finally:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+
+        rate_limited = [f for f in failures.values() if isinstance(f, RateLimitError)]
+        if rate_limited:
+            raise rate_limited[0]
+        primary = failures[symbols[0]]
+        if isinstance(primary, BaseException):
+            raise primary
+        return primary
+
+    async def _fetch_direct(self, tickers: List[str]) -> Dict[str, dict]:
+        """Fetch company data from the market data provider without an LLM"""
+        provider = get_provider()
+        with tracing.span("provider.fetch", provider=provider.name, tickers=",".join(tickers)):
+            records = await run_blocking(provider.fetch, tickers)
+        valid = [record for record in records.values() if "error" not in record]
+        await run_blocking(add_news_sentiment_batch, valid)
+        if config.CACHE_SETTINGS['enabled']:
+            for ticker, record in records.items():
+                if "error" not in record:
+                    self.data_cache.set(ticker, record)
+        return records
+
+    async def _prefetch_data(self, tickers: List[str]) -> Dict[str, dict]:
+        """Fill the company data cache for a whole request in one batched provider call"""
+        if config.DATA_SOURCE['mode'] != 'direct' or not config.CACHE_SETTINGS['enabled']:
+            return {}
+        records = {ticker: self.data_cache.peek(ticker) for ticker in dict.fromkeys(tickers)}
+        missing = [ticker for ticker, record in records.items() if record is None]
+        if len(missing) > 1:
             try:
-                if hasattr(client, 'close'):
-                    client.close()
+                records.update(await self._fetch_direct(missing))
             except Exception as e:
-                logger.error(f"Error closing client: {str(e)}")
-        self._clients.clear()
-        self.cache.clear()
+                logger.error(f"Batched data fetch failed for {missing}: {str(e)}")
+        return {ticker: record for ticker, record in records.items() if record and "error" not in record}
+
+    def _cache_key(self, ticker: str, criteria: Dict[str, Any]) -> str:
+        return f"{ticker}-{json.dumps(criteria, sort_keys=True)}"
+
+    def _analysis_key(self, company_data: dict, criteria: Dict[str, Any]) -> str:
+        return hashlib.sha256(
+            json.dumps({"data": company_data, "criteria": criteria}, sort_keys=True, default=str).encode()
+        ).hexdigest()
+
+    async def _analyze(self, company_data: dict, criteria: Dict[str, Any], criteria_result: dict):
+        """Analyze company data, reusing analyses of identical data and criteria"""
+        analysis_key = self._analysis_key(company_data, criteria)
+        if config.CACHE_SETTINGS['enabled']:
+            cached = self.analysis_cache.get(analysis_key)
+            tracing.current_span().set_attribute("cache_hit", cached is not None)
+            if cached is not None:
+                return cached
+        return await self._analysis_flight.do(
+            analysis_key,
+            lambda: self._retry_stage(
+                "analysis", lambda: self._run_analysis(analysis_key, company_data, criteria, criteria_result)
+            )
+        )
 
-    async def process_ticker(self, ticker: str, criteria: Dict[str, Any]) -> InvestmentRecommendation:
+    async def _run_analysis(self, analysis_key: str, company_data: dict, criteria: Dict[str, Any],
+                            criteria_result: dict):
+        async with self.pools.analysis.checkout() as analysis_agent:
+            analysis = await analysis_agent.aanalyze(company_data, criteria, criteria_result)
+
+        if analysis and "error" not in analysis and config.CACHE_SETTINGS['enabled']:
+            self.analysis_cache.set(analysis_key, analysis)
+        return analysis
+
+    async def process_ticker(self, ticker: str, criteria: Dict[str, Any],
+                             criteria_result: Optional[dict] = None,
+                             on_event: Optional[Callable[[dict], None]] = None) -> InvestmentRecommendation:
         """Process a single ticker with proper error handling"""
         logger.info(f"Processing {ticker} with criteria: {criteria}")
-        
-        # Create cache key
-        cache_key = f"{ticker}-{json.dumps(criteria, sort_keys=True)}"
-        if cache_key in self.cache:
-            logger.info(f"Using cached result for {ticker}")
-            return self.cache[cache_key]
-        
-        attempts = 0
-        while attempts < config.MAX_RETRIES:
-            try:
-                # Step 1: Collect data
-                company_data = self.data_agent.collect_data(ticker)
-                if not company_data or "error" in company_data:
-                    if ticker == "GOOGL":
-                        company_data = self.data_agent.collect_data("GOOG") or \
-                                      self.data_agent.collect_data("Alphabet")
-                    if not company_data or "error" in company_data:
-                        raise ValueError(f"Data collection failed for {ticker}")
-                
-                # Step 2: Analyze data
-                analysis = self.analysis_agent.analyze(company_data, criteria)
+
+        with self._live(), tracing.span("ticker", ticker=ticker) as span:
+            # Create cache key
+            cache_key = self._cache_key(ticker, criteria)
+            if config.CACHE_SETTINGS['enabled']:
+                cached = self._cached_result(ticker, criteria, cache_key)
+                span.set_attribute("cache_hit", cached is not None)
+                if cached is not None:
+                    return cached
+
+            # Progress events come from whichever caller started the shared pipeline
+            return await self._recommendation_flight.do(
+                cache_key, lambda: self._run_pipeline(ticker, criteria, cache_key, criteria_result, on_event)
+            )
+
+    @contextmanager
+    def _stage(self, stage: str):
+        """Time one pipeline stage in both the stage histogram and a trace span"""
+        model = self._stage_models[stage]
+        with tracing.span(f"stage.{stage}", stage=stage, model=model), STAGE_SECONDS.time(stage=stage, model=model):
+            yield
+
+    async def _run_pipeline(self, ticker: str, criteria: Dict[str, Any], cache_key: str,
+                            criteria_result: Optional[dict] = None,
+                            on_event: Optional[Callable[[dict], None]] = None) -> InvestmentRecommendation:
+        """Run data collection, analysis, recommendation and verification for one ticker.
+
+        Each stage's output is recorded in a checkpoint. When a run fails, the
+        checkpoint is kept, and the next run for the same ticker and criteria
+        starts at the stage that failed instead of re-running earlier LLM calls.
+        """
+        def emit(stage: str):
+            if on_event is not None:
+                on_event({"event": "stage", "ticker": ticker, "stage": stage})
+
+        checkpoint = self.checkpoints.get(cache_key) or {}
+        pipeline_start = time.perf_counter()
+        outcome = "error"
+        finalizing = False
+        try:
+            if checkpoint:
+                stages = ("data", "fused") if config.PIPELINE['mode'] == 'fused' and "analysis" not in checkpoint \
+                    else ("data", "analysis", "recommendation")
+                # Every stage checkpointed: only verification is left to run
+                resume_at = next((stage for stage in stages if stage not in checkpoint), "verification")
+                PIPELINE_RESUMES.inc(stage=resume_at)
+                logger.info(f"Resuming {ticker} at the {resume_at} stage")
+
+            # Step 1: Collect data
+            emit("data")
+            company_data = await self._run_stage(checkpoint, "data", lambda: self._collect_data(ticker))
+            if not company_data or "error" in company_data:
+                raise ValueError(f"Data collection failed for {ticker}")
+
+            # Step 2: Check criteria with the rule engine
+            criteria_result = criteria_result or evaluate_criteria([company_data], criteria)[0]
+
+            recommendation = None
+            if config.PIPELINE['mode'] == 'fused':
+                # Steps 3-4 in one schema-constrained call
+                emit("recommendation")
+                recommendation = await self._run_stage(checkpoint, "fused", lambda: self._retry_stage(
+                    "fused", lambda: self._recommend_fused(company_data, criteria, criteria_result)
+                ), valid=lambda output: self._valid_recommendation(ticker, output))
+                if "error" in recommendation:
+                    logger.warning(f"Fused call failed for {ticker}, using two calls: {recommendation['error']}")
+                    FUSED_FALLBACKS.inc()
+                    recommendation = None
+
+            if recommendation is None:
+                # Step 3: Analyze data
+                emit("analysis")
+                analysis = await self._run_stage(
+                    checkpoint, "analysis", lambda: self._analyze(company_data, criteria, criteria_result)
+                )
                 if not analysis or "error" in analysis:
                     raise ValueError(f"Analysis failed: {analysis.get('error', 'Unknown error')}")
-                
-                # Step 3: Generate recommendation
-                recommendation = self.recommendation_agent.generate(analysis)
-                if "error" in recommendation:
-                    raise ValueError(f"Recommendation failed: {recommendation['error']}")
-                
-                # Step 4: Verify recommendation
-                verified_rec = self.verification_agent.verify(recommendation, company_data)
-                
-                # Normalize risk assessment
-                risk_assessment = verified_rec.get('risk_assessment', 'medium')
-                if isinstance(risk_assessment, dict):
-                    risk_assessment = risk_assessment.get('overall', 'medium')
-                verified_rec['risk_assessment'] = str(risk_assessment).lower()
-                if verified_rec['risk_assessment'] not in ['low', 'medium', 'high']:
-                    verified_rec['risk_assessment'] = 'medium'
-                
-                # Add sources to thesis
-                if verified_rec.get('sources'):
-                    sources_str = "\nSources: " + "; ".join(verified_rec['sources'])[:250]
-                    verified_rec['investment_thesis'] += sources_str
-                
-                # Create final result
-                result = InvestmentRecommendation(
-                    ticker=ticker,
-                    confidence_score=verified_rec.get('confidence_score', 0.0),
-                    investment_thesis=verified_rec.get('investment_thesis', 'Analysis complete'),
-                    risk_assessment=verified_rec['risk_assessment'],
-                    key_metrics=verified_rec.get('key_metrics', {}),
-                    warnings=verified_rec.get('warnings', []),
-                    sources=verified_rec.get('sources', [])
+
+                # Step 4: Generate recommendation
+                emit("recommendation")
+                recommendation = await self._run_stage(
+                    checkpoint, "recommendation", lambda: self._retry_stage("recommendation", lambda: self._generate(analysis)),
+                    valid=lambda output: self._valid_recommendation(ticker, output)
                 )
-                
-                # Cache result
-                self.cache[cache_key] = result
-                return result
-                
-            except Exception as e:
-                if "rate_limit" in str(e).lower():
-                    attempts += 1
-                    delay = config.RETRY_DELAY * (2 ** attempts)
-                    logger.warning(f"Rate limit hit. Retry {attempts}/{config.MAX_RETRIES} in {delay}s")
-                    time.sleep(delay)
-                else:
-                    logger.error(f"Error processing {ticker}: {str(e)}")
-                    return InvestmentRecommendation(
-                        ticker=ticker,
-                        confidence_score=0.0,
-                        investment_thesis=f"Error: {str(e)}",
-                        risk_assessment="high",
-                        key_metrics={},
-                        warnings=["Processing error"],
-                        sources=[]
-                    )
-        
+            if "error" in recommendation:
+                raise ValueError(f"Recommendation failed: {recommendation['error']}")
+
+            # Step 5: Verify recommendation
+            emit("verification")
+            finalizing = True
+            result = self._finalize(ticker, recommendation, company_data, criteria_result, cache_key)
+            outcome = "ok"
+            self.checkpoints.delete(cache_key)
+            return result
+
+        except RateLimitError as e:
+            outcome = "rate_limited"
+            logger.error(f"Rate limit retries exhausted for {ticker}: {str(e)}")
+            return InvestmentRecommendation(
+                ticker=ticker,
+                confidence_score=0.0,
+                investment_thesis="Rate limit exceeded",
+                risk_assessment="high",
+                key_metrics={},
+                warnings=["Max retries reached"],
+                sources=[]
+            )
+        except Exception as e:
+            logger.error(f"Error processing {ticker}: {str(e)}")
+            return self._error_result(ticker, e)
+        finally:
+            if finalizing and outcome != "ok":
+                # Re-running the same stages would fail verification the same way
+                self.checkpoints.delete(cache_key)
+            elif outcome != "ok" and checkpoint:
+                self.checkpoints.set(cache_key, checkpoint)
+            PIPELINE_SECONDS.observe(time.perf_counter() - pipeline_start, outcome=outcome)
+
+    @staticmethod
+    def _error_result(ticker: str, error: Exception) -> InvestmentRecommendation:
         return InvestmentRecommendation(
             ticker=ticker,
             confidence_score=0.0,
-            investment_thesis="Rate limit exceeded",
+            investment_thesis=f"Error: {str(error)}",
             risk_assessment="high",
             key_metrics={},
-            warnings=["Max retries reached"],
+            warnings=["Processing error"],
             sources=[]
         )
 
-    async def process_tickers(self, tickers: List[str], criteria: Dict[str, Any]) -> List[InvestmentRecommendation]:
-        """Process multiple tickers concurrently with cleanup"""
+    async def _run_stage(self, checkpoint: Dict[str, Any], stage: str, func,
+                         valid: Optional[Callable[[Any], bool]] = None) -> Any:
+        """Run one pipeline stage, or reuse its output from the checkpoint of an earlier run"""
+        if stage in checkpoint:
+            return checkpoint[stage]
+        with self._stage(stage):
+            output = await func()
+        if output and "error" not in output and (valid is None or valid(output)):
+            checkpoint[stage] = output
+        return output
+
+    @staticmethod
+    def _valid_recommendation(ticker: str, recommendation: dict) -> bool:
+        """Whether a recommendation passes the InvestmentRecommendation schema"""
+        try:
+            InvestmentRecommendation(
+                ticker=ticker,
+                confidence_score=recommendation.get('confidence_score', 0.0),
+                investment_thesis=recommendation.get('investment_thesis', 'Analysis complete'),
+                risk_assessment=recommendation.get('risk_assessment', 'medium'),
+                key_metrics=recommendation.get('key_metrics', {}),
+                warnings=recommendation.get('warnings', []),
+                sources=recommendation.get('sources', [])
+            )
+        except Exception:
+            return False
+        return True
+
+    def _finalize(self, ticker: str, recommendation: dict, company_data: dict, criteria_result: dict,
+                  cache_key: str) -> InvestmentRecommendation:
+        """Verify a recommendation against the source data and cache the final result"""
+        with self._stage("verification"):
+            verified_rec = self.verification_agent.verify(recommendation, company_data)
+        return self._build_result(ticker, verified_rec, criteria_result, cache_key)
+
+    def _build_result(self, ticker: str, verified_rec: dict, criteria_result: dict,
+                      cache_key: str) -> InvestmentRecommendation:
+        self._record_verification(verified_rec)
+
+        # Normalize risk assessment
+        risk_assessment = verified_rec.get('risk_assessment', 'medium')
+        if isinstance(risk_assessment, dict):
+            risk_assessment = risk_assessment.get('overall', 'medium')
+        verified_rec['risk_assessment'] = str(risk_assessment).lower()
+        if verified_rec['risk_assessment'] not in ['low', 'medium', 'high']:
+            verified_rec['risk_assessment'] = 'medium'
+
+        # Add sources to thesis
+        if verified_rec.get('sources'):
+            sources_str = "\nSources: " + "; ".join(verified_rec['sources'])[:250]
+            verified_rec['investment_thesis'] += sources_str
+
+        # Create final result
+        result = InvestmentRecommendation(
+            ticker=ticker,
+            confidence_score=verified_rec.get('confidence_score', 0.0),
+            investment_thesis=verified_rec.get('investment_thesis', 'Analysis complete'),
+            risk_assessment=verified_rec['risk_assessment'],
+            key_metrics=verified_rec.get('key_metrics', {}),
+            warnings=verified_rec.get('warnings', []),
+            sources=verified_rec.get('sources', []),
+            criteria_violations=criteria_result['criteria_violations'],
+            discrepancies=verified_rec.get('discrepancies', [])
+        )
+
+        # Cache result, unless it only reports a failure
+        if config.CACHE_SETTINGS['enabled'] and "error" not in verified_rec and not is_error_result(result):
+            self.cache.set(cache_key, result)
+        return result
+
+    def _record_verification(self, verified_rec: dict):
+        """Export the hallucination metrics listed in Config.MONITORING"""
+        tracked = config.MONITORING['hallucination_metrics']
+        if 'metric_discrepancies' in tracked:
+            discrepancies = verified_rec.get('discrepancies', [])
+            for discrepancy in discrepancies:
+                METRIC_DISCREPANCIES.inc(feature=discrepancy['feature'])
+            VERIFIED_RECOMMENDATIONS.inc(discrepancies="yes" if discrepancies else "no")
+        if 'confidence_score' in tracked:
+            try:
+                CONFIDENCE_SCORE.observe(float(verified_rec.get('confidence_score', 0.0)))
+            except (TypeError, ValueError):
+                pass
+
+    async def prepare_batch(self, tickers: List[str], criteria: Dict[str, Any]) -> Dict[str, dict]:
+        """Prefetch data for the request and evaluate criteria for it in a single vectorized pass"""
+        records = await self._prefetch_data(tickers)
+        return dict(zip(records, evaluate_criteria(list(records.values()), criteria)))
+
+    async def _analyze_batch(self, items: Dict[str, str], criteria: Dict[str, Any],
+                             criteria_results: Dict[str, dict]) -> Dict[str, dict]:
+        BATCH_SIZE.observe(len(items), stage="analysis")
+        output_tokens = config.PIPELINE['batch_output_tokens']['analysis'] * len(items)
+
+        async def call():
+            async with self.pools.analysis.checkout() as analysis_agent:
+                return await analysis_agent.aanalyze_batch(
+                    items, criteria, {ticker: criteria_results[ticker] for ticker in items}, output_tokens
+                )
+        try:
+            return await self._retry_stage("analysis", call)
+        except Exception as e:
+            logger.error(f"Batched analysis failed for {list(items)}: {str(e)}")
+            return {}
+
+    async def _generate_batch(self, items: Dict[str, str]) -> Dict[str, dict]:
+        BATCH_SIZE.observe(len(items), stage="recommendation")
+        output_tokens = config.PIPELINE['batch_output_tokens']['recommendation'] * len(items)
+
+        async def call():
+            async with self.pools.recommendation.checkout() as recommendation_agent:
+                return await recommendation_agent.agenerate_batch(items, output_tokens)
         try:
-            tasks = [self.process_ticker(ticker, criteria) for ticker in tickers]
+            return await self._retry_stage("recommendation", call)
+        except Exception as e:
+            logger.error(f"Batched recommendation failed for {list(items)}: {str(e)}")
+            return {}
+
+    async def process_batch(self, tickers: List[str], criteria: Dict[str, Any],
+                            criteria_results: Optional[Dict[str, dict]] = None,
+                            on_event: Optional[Callable[[dict], None]] = None,
+                            on_result: Optional[Callable[[InvestmentRecommendation], None]] = None
+                            ) -> List[InvestmentRecommendation]:
+        """Process tickers with several tickers packed into each analysis and recommendation call.
+
+        Any ticker left out of a batched reply falls back to the per-ticker
+        pipeline, which reuses the company data and analyses cached here.
+        """
+        with self._live():
+            return await self._process_batch(tickers, criteria, criteria_results, on_event, on_result)
+
+    async def _process_batch(self, tickers: List[str], criteria: Dict[str, Any],
+                             criteria_results: Optional[Dict[str, dict]],
+                             on_event: Optional[Callable[[dict], None]],
+                             on_result: Optional[Callable[[InvestmentRecommendation], None]]
+                             ) -> List[InvestmentRecommendation]:
+        criteria_results = dict(criteria_results or {})
+        results: Dict[str, InvestmentRecommendation] = {}
+
+        def finish(ticker: str, result: InvestmentRecommendation):
+            results[ticker] = result
+            if on_result is not None:
+                on_result(result)
+
+        def emit(ticker: str, stage: str):
+            if on_event is not None:
+                on_event({"event": "stage", "ticker": ticker, "stage": stage})
+
+        cache_keys = {ticker: self._cache_key(ticker, criteria) for ticker in dict.fromkeys(tickers)}
+        pending = []
+        for ticker, cache_key in cache_keys.items():
+            cached = self._cached_result(ticker, criteria, cache_key) if config.CACHE_SETTINGS['enabled'] else None
+            if cached is not None:
+                finish(ticker, cached)
+            else:
+                pending.append(ticker)
+
+        # Step 1: Collect data (batched by the provider in direct mode)
+        for ticker in pending:
+            emit(ticker, "data")
+        with self._stage("data"):
+            records = await asyncio.gather(*[self._collect_data(ticker) for ticker in pending], return_exceptions=True)
+        company_data = {
+            ticker: record for ticker, record in zip(pending, records)
+            if isinstance(record, dict) and record and "error" not in record
+        }
+        unchecked = [ticker for ticker in company_data if ticker not in criteria_results]
+        criteria_results.update(zip(unchecked, evaluate_criteria([company_data[t] for t in unchecked], criteria)))
+
+        # Step 2: Analyze uncached tickers in token-budgeted batches
+        analyses, items, analysis_keys = {}, {}, {}
+        for ticker, record in company_data.items():
+            emit(ticker, "analysis")
+            analysis_keys[ticker] = self._analysis_key(record, criteria)
+            cached = self.analysis_cache.get(analysis_keys[ticker]) if config.CACHE_SETTINGS['enabled'] else None
+            if cached is not None:
+                analyses[ticker] = cached
+            else:
+                items[ticker] = analysis_batch_item(ticker, record, criteria_results[ticker])
+        with self._stage("analysis"):
+            batches = _pack_batches(
+                items, self._stage_models["analysis"], config.PIPELINE['batch_output_tokens']['analysis']
+            )
+            for batch_analyses in await asyncio.gather(
+                *[self._analyze_batch(batch, criteria, criteria_results) for batch in batches]
+            ):
+                for ticker, analysis in batch_analyses.items():
+                    analyses[ticker] = analysis
+                    if config.CACHE_SETTINGS['enabled']:
+                        self.analysis_cache.set(analysis_keys[ticker], analysis)
+
+        # Step 3: Generate recommendations in batches
+        items = {}
+        for ticker, analysis in analyses.items():
+            emit(ticker, "recommendation")
+            items[ticker] = recommendation_batch_item(ticker, analysis)
+        recommendations = {}
+        with self._stage("recommendation"):
+            batches = _pack_batches(
+                items, self._stage_models["recommendation"], config.PIPELINE['batch_output_tokens']['recommendation']
+            )
+            for batch_recommendations in await asyncio.gather(*[self._generate_batch(batch) for batch in batches]):
+                recommendations.update(batch_recommendations)
+
+        # Step 4: Verify every recommendation in one pass
+        for ticker in recommendations:
+            emit(ticker, "verification")
+        with self._stage("verification"):
+            verified = self.verification_agent.verify_batch(
+                list(recommendations.values()), [company_data[ticker] for ticker in recommendations]
+            )
+        for ticker, verified_rec in zip(recommendations, verified):
+            try:
+                finish(ticker, self._build_result(ticker, verified_rec, criteria_results[ticker], cache_keys[ticker]))
+            except Exception as e:
+                logger.warning(f"Batched result for {ticker} failed verification: {str(e)}")
+
+        # Everything else goes through the per-ticker pipeline
+        fallback = [ticker for ticker in cache_keys if ticker not in results]
+        if fallback:
+            for ticker in fallback:
+                stage = "data" if ticker not in company_data else "analysis" if ticker not in analyses else "recommendation"
+                BATCH_FALLBACKS.inc(stage=stage)
+            logger.info(f"Falling back to per-ticker calls for {fallback}")
+
+            async def run(ticker: str):
+                finish(ticker, await self.process_ticker(ticker, criteria, criteria_results.get(ticker), on_event))
+            await asyncio.gather(*[run(ticker) for ticker in fallback])
+
+        return [results[ticker] for ticker in tickers]
+
+    async def process_tickers(self, tickers: List[str], criteria: Dict[str, Any]) -> List[InvestmentRecommendation]:
+        """Process multiple tickers concurrently"""
+        with tracing.span("recommendations", tickers=len(tickers)):
+            criteria_results = await self.prepare_batch(tickers, criteria)
+            if config.PIPELINE['mode'] == 'batched':
+                return await self.process_batch(tickers, criteria, criteria_results)
+            tasks = [self.process_ticker(ticker, criteria, criteria_results.get(ticker)) for ticker in tickers]
             return await asyncio.gather(*tasks)
+
+    async def stream_tickers(self, tickers: List[str], criteria: Dict[str, Any]) -> AsyncIterator[dict]:
+        """Yield stage progress events and each recommendation as soon as its ticker finishes"""
+        start_time = time.time()
+        queue: asyncio.Queue = asyncio.Queue()
+
+        def publish(event: dict):
+            queue.put_nowait({**event, "elapsed": round(time.time() - start_time, 3)})
+
+        # The generator is resumed step by step by the response, so the root
+        # span is handed to each task explicitly instead of via the context
+        root = tracing.start_span("recommendations.stream", tickers=len(tickers))
+        with tracing.use_span(root):
+            criteria_results = await self.prepare_batch(tickers, criteria)
+
+        finished = set()
+
+        def publish_result(ticker: str, result: InvestmentRecommendation):
+            finished.add(ticker)
+            publish({"event": "result", "ticker": ticker, "recommendation": result.model_dump()})
+
+        def publish_failures(pending: List[str], error: Exception):
+            # Every ticker gets its result event, or the stream would wait for it forever
+            logger.error(f"Streaming failed for {pending}: {str(error)}", exc_info=True)
+            for ticker in pending:
+                if ticker not in finished:
+                    publish_result(ticker, self._error_result(ticker, error))
+
+        async def run(ticker: str):
+            try:
+                with tracing.use_span(root):
+                    result = await self.process_ticker(ticker, criteria, criteria_results.get(ticker), on_event=publish)
+            except Exception as e:
+                logger.error(f"Streaming failed for {ticker}: {str(e)}", exc_info=True)
+                result = self._error_result(ticker, e)
+            publish_result(ticker, result)
+
+        async def run_batch():
+            try:
+                with tracing.use_span(root):
+                    await self.process_batch(
+                        tickers, criteria, criteria_results, on_event=publish,
+                        on_result=lambda result: publish_result(result.ticker, result)
+                    )
+            except Exception as e:
+                publish_failures(list(dict.fromkeys(tickers)), e)
+
+        if config.PIPELINE['mode'] == 'batched':
+            tasks = [asyncio.create_task(run_batch())]
+            remaining = len(dict.fromkeys(tickers))
+        else:
+            tasks = [asyncio.create_task(run(ticker)) for ticker in tickers]
+            remaining = len(tasks)
+        try:
+            while remaining:
+                event = await queue.get()
+                if event["event"] == "result":
+                    remaining -= 1
+                yield event
+            yield {"event": "done", "elapsed": round(time.time() - start_time, 3)}
         finally:
-            await self.cleanup()
+            # Stop waiting on pipelines if the client goes away mid-stream;
+            # shared pipelines are cancelled once no other request waits on them
+            for task in tasks:
+                task.cancel()
+            root.end()
 
     async def __aenter__(self):
         return self
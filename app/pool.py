@@ -0,0 +1,144 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Callable, List
+from app.config import config
+from app.metrics import registry
+from app.agents.data_agent import DataAgent
+from app.agents.analysis_agent import AnalysisAgent
+from app.agents.recommendation_agent import RecommendationAgent
+from app.agents.fused_agent import FusedAgent
+
+logger = logging.getLogger(__name__)
+
+# Put in a closed pool's queue to wake checkouts waiting on it
+_CLOSED = object()
+
+POOL_SIZE = registry.gauge("agent_pool_size", "Number of agents created in each pool", ["pool"])
+POOL_IN_USE = registry.gauge("agent_pool_in_use", "Number of agents currently checked out", ["pool"])
+POOL_CHECKOUTS = registry.counter("agent_pool_checkouts_total", "Total agent checkouts", ["pool"])
+POOL_WAITS = registry.counter("agent_pool_waits_total", "Checkouts that had to wait for a free agent", ["pool"])
+
+
+class AgentPool:
+    """Bounded pool of warm agents of a single type with checkout/checkin semantics"""
+    def __init__(self, name: str, factory: Callable, size: int, warm: int = None):
+        self.name = name
+        self.factory = factory
+        self.size = max(1, size)
+        self.warm_size = self.size if warm is None else min(max(0, warm), self.size)
+        self._agents: List = []
+        self._idle: asyncio.Queue = asyncio.Queue()
+        self._closed = False
+        POOL_SIZE.set(0, pool=name)
+        POOL_IN_USE.set(0, pool=name)
+
+    def _create(self):
+        agent = self.factory()
+        self._agents.append(agent)
+        POOL_SIZE.set(len(self._agents), pool=self.name)
+        return agent
+
+    def warm(self):
+        """Create the warm agents up front; the rest are created on first demand"""
+        if self._closed:
+            # Reopening: waiters on the old queue have already been woken
+            self._idle = asyncio.Queue()
+            self._closed = False
+        while len(self._agents) < self.warm_size:
+            self._idle.put_nowait(self._create())
+        logger.info(f"Warmed {self.name} pool with {len(self._agents)} of up to {self.size} agents")
+
+    @asynccontextmanager
+    async def checkout(self):
+        """Borrow an agent for the duration of the block"""
+        if self._closed:
+            raise RuntimeError(f"{self.name} pool is closed")
+        if not self._idle.empty():
+            agent = self._idle.get_nowait()
+        elif len(self._agents) < self.size:
+            agent = self._create()
+        else:
+            POOL_WAITS.inc(pool=self.name)
+            agent = await self._idle.get()
+            if agent is _CLOSED:
+                # Pass the wake-up on to the next waiter
+                self._idle.put_nowait(_CLOSED)
+                raise RuntimeError(f"{self.name} pool is closed")
+
+        POOL_CHECKOUTS.inc(pool=self.name)
+        POOL_IN_USE.inc(pool=self.name)
+        try:
+            yield agent
+        finally:
+            POOL_IN_USE.dec(pool=self.name)
+            if not self._closed:
+                self._idle.put_nowait(agent)
+
+    def close(self):
+        """Close every agent and fail checkouts still waiting for one"""
+        self._closed = True
+        for agent in self._agents:
+            try:
+                agent.close()
+            except Exception as e:
+                logger.error(f"Error closing {self.name} agent: {str(e)}")
+        self._agents.clear()
+        while not self._idle.empty():
+            self._idle.get_nowait()
+        self._idle.put_nowait(_CLOSED)
+        POOL_SIZE.set(0, pool=self.name)
+
+
+class AgentPools:
+    """App-scoped set of agent pools sharing long-lived model clients"""
+    def __init__(self, size: int = None, warm: int = None):
+        size = size or config.POOL_SETTINGS['size']
+        warm = config.POOL_SETTINGS['warm'] if warm is None else warm
+        self.data = AgentPool("data_agent", DataAgent, size, warm)
+        self.analysis = AgentPool("analysis_agent", AnalysisAgent, size, warm)
+        self.recommendation = AgentPool("recommendation_agent", RecommendationAgent, size, warm)
+        self.fused = AgentPool("fused_agent", FusedAgent, size, warm)
+
+    @property
+    def pools(self) -> List[AgentPool]:
+        return [self.data, self.analysis, self.recommendation, self.fused]
+
+    def _models(self) -> list:
+        models = []
+        for model in config.AGENT_CONFIG.values():
+            if not any(model is seen for seen in models):
+                models.append(model)
+        return models
+
+    def warm(self):
+        """Open one HTTP client per model and pre-create the warm agents"""
+        for model in self._models():
+            try:
+                if hasattr(model, 'get_client'):
+                    model.client = model.get_client()
+                if hasattr(model, 'get_async_client'):
+                    model.async_client = model.get_async_client()
+            except Exception as e:
+                logger.error(f"Error opening client for {getattr(model, 'id', model)}: {str(e)}")
+        for pool in self.pools:
+            pool.warm()
+
+    async def close(self):
+        for pool in self.pools:
+            pool.close()
+        for model in self._models():
+            client = getattr(model, 'client', None)
+            if client is not None and hasattr(client, 'close'):
+                try:
+                    client.close()
+                except Exception as e:
+                    logger.error(f"Error closing client: {str(e)}")
+                model.client = None
+            async_client = getattr(model, 'async_client', None)
+            if async_client is not None and hasattr(async_client, 'close'):
+                try:
+                    await async_client.close()
+                except Exception as e:
+                    logger.error(f"Error closing async client: {str(e)}")
+                model.async_client = None
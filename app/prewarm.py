@@ -0,0 +1,142 @@
+import asyncio
+import json
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+from app.config import config
+from app.market_store import get_store
+from app.metrics import registry
+from app.orchestrator import is_error_result
+from app.rate_limit import get_limiter
+
+logger = logging.getLogger(__name__)
+
+PREWARM_REFRESHES = registry.counter("prewarm_refreshes_total", "Watchlist recommendations refreshed", ["outcome"])
+PREWARM_DEFERRALS = registry.counter(
+    "prewarm_deferrals_total", "Times a refresh waited for live traffic or rate budget", ["reason"]
+)
+PREWARM_DUE = registry.gauge("prewarm_due", "Watchlist entries missing or about to go stale")
+
+
+def load_watchlist(path: str) -> Tuple[List[str], List[Dict[str, Any]]]:
+    """Tickers and criteria presets to keep warm"""
+    try:
+        with open(path) as f:
+            watchlist = json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning(f"Could not load watchlist from {path}: {str(e)}")
+        return [], []
+    return [ticker.upper() for ticker in watchlist.get("tickers", [])], watchlist.get("criteria_presets", [])
+
+
+class Prewarmer:
+    """Refreshes watchlist recommendations before they go stale.
+
+    Every ticker and criteria preset pair is refreshed through the
+    orchestrator once its cached recommendation is missing or within
+    refresh_ahead seconds of going stale, most urgent first. Refreshes wait
+    while live requests are in flight or any model is short of budget.
+    """
+    def __init__(self, orchestrator, tickers: Optional[List[str]] = None,
+                 presets: Optional[List[Dict[str, Any]]] = None):
+        self.orchestrator = orchestrator
+        if tickers is None or presets is None:
+            watchlist_tickers, watchlist_presets = load_watchlist(config.PREWARM['watchlist_path'])
+            tickers = watchlist_tickers if tickers is None else tickers
+            presets = watchlist_presets if presets is None else presets
+        self.tickers = tickers
+        self.presets = presets
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """Start the refresh loop; a no-op unless PREWARM is enabled"""
+        if not config.PREWARM['enabled'] or not config.CACHE_SETTINGS['enabled']:
+            return
+        if not self.tickers or not self.presets:
+            logger.warning("Prewarming enabled but the watchlist is empty")
+            return
+        if config.MARKET_STORE['enabled']:
+            # Let the market data refresher keep the watchlist's data current too
+            get_store().track(self.tickers)
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"Prewarming {len(self.tickers)} tickers x {len(self.presets)} criteria presets")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.run_once()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Prewarm pass failed: {str(e)}")
+            await asyncio.sleep(config.PREWARM['interval'])
+
+    def due(self) -> List[Tuple[str, Dict[str, Any]]]:
+        """Entries that are missing or go stale within refresh_ahead, most urgent first"""
+        entries = []
+        for criteria in self.presets:
+            for ticker in self.tickers:
+                time_left = self.orchestrator.cache.time_left(self.orchestrator._cache_key(ticker, criteria))
+                if time_left is None or time_left < config.PREWARM['refresh_ahead']:
+                    entries.append((float("-inf") if time_left is None else time_left, ticker, criteria))
+        entries.sort(key=lambda entry: entry[0])
+        return [(ticker, criteria) for _, ticker, criteria in entries]
+
+    def _headroom(self) -> float:
+        return min(get_limiter(model.id).headroom() for model in config.AGENT_CONFIG.values())
+
+    async def _wait_for_capacity(self):
+        """Wait until no live request is in flight and every model has spare budget"""
+        while True:
+            if self.orchestrator.live_requests:
+                reason = "live_traffic"
+            elif self._headroom() < config.PREWARM['min_headroom']:
+                reason = "rate_budget"
+            else:
+                return
+            PREWARM_DEFERRALS.inc(reason=reason)
+            await asyncio.sleep(config.PREWARM['poll_interval'])
+
+    async def run_once(self) -> int:
+        """Refresh every due entry and return how many were refreshed"""
+        due = self.due()
+        PREWARM_DUE.set(len(due))
+        if not due:
+            return 0
+        slots = asyncio.Semaphore(config.PREWARM['concurrency'])
+        refreshed = 0
+
+        async def refresh(ticker: str, criteria: Dict[str, Any]):
+            nonlocal refreshed
+            try:
+                result = await self.orchestrator.refresh(ticker, criteria)
+                # Failed pipelines return an error result, which is never cached
+                if is_error_result(result):
+                    PREWARM_REFRESHES.inc(outcome="error")
+                    logger.warning(f"Prewarm refresh failed for {ticker}: {result.investment_thesis}")
+                else:
+                    refreshed += 1
+                    PREWARM_REFRESHES.inc(outcome="ok")
+            except Exception as e:
+                PREWARM_REFRESHES.inc(outcome="error")
+                logger.warning(f"Prewarm refresh failed for {ticker}: {str(e)}")
+            finally:
+                slots.release()
+
+        tasks = []
+        try:
+            for ticker, criteria in due:
+                await slots.acquire()
+                await self._wait_for_capacity()
+                tasks.append(asyncio.create_task(refresh(ticker, criteria)))
+            await asyncio.gather(*tasks)
+        finally:
+            for task in tasks:
+                task.cancel()
+        logger.info(f"Prewarmed {refreshed}/{len(due)} watchlist recommendations")
+        return refreshed
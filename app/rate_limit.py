@@ -0,0 +1,193 @@
+import asyncio
+import re
+import time
+import logging
+from contextlib import asynccontextmanager
+from typing import Dict, Optional
+from app.config import config
+from app.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_HITS = registry.counter("rate_limit_hits_total", "Rate limit errors returned by the provider", ["model"])
+LIMITER_WAIT = registry.counter("rate_limiter_wait_seconds_total", "Time spent waiting for request/token budget", ["model"])
+CONCURRENCY_LIMIT = registry.gauge("rate_limiter_concurrency_limit", "Current adaptive concurrency limit", ["model"])
+IN_FLIGHT = registry.gauge("rate_limiter_in_flight", "LLM calls currently in flight", ["model"])
+
+_RETRY_IN = re.compile(r"try again in\s+(?:(\d+)m)?\s*([\d.]+)\s*(ms|s)?", re.IGNORECASE)
+
+
+class RateLimitError(Exception):
+    """Raised when a provider rejects a call for exceeding its rate limit"""
+    def __init__(self, message: str, retry_after: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def is_rate_limit_error(error: BaseException) -> bool:
+    while error is not None:
+        if isinstance(error, RateLimitError):
+            return True
+        if getattr(error, 'status_code', None) == 429:
+            return True
+        if "rate_limit" in str(error).lower() or "rate limit" in str(error).lower():
+            return True
+        error = error.__cause__
+    return False
+
+
+def retry_after_from(error: BaseException) -> Optional[float]:
+    """Read the Retry-After header, or the 'try again in' hint, from an error chain"""
+    while error is not None:
+        if isinstance(error, RateLimitError) and error.retry_after is not None:
+            return error.retry_after
+        response = getattr(error, 'response', None)
+        headers = getattr(response, 'headers', None)
+        if headers:
+            value = headers.get('retry-after')
+            if value:
+                try:
+                    return float(value)
+                except ValueError:
+                    pass
+        match = _RETRY_IN.search(str(error))
+        if match:
+            minutes, amount, unit = match.groups()
+            seconds = float(amount) / 1000 if unit == "ms" else float(amount)
+            return seconds + 60 * int(minutes or 0)
+        error = error.__cause__
+    return None
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token estimate used to reserve budget before a call"""
+    return max(1, len(text) // 4)
+
+
+class TokenBucket:
+    """Refills continuously at a per-minute rate up to its capacity"""
+    def __init__(self, per_minute: float, capacity: Optional[float] = None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity or per_minute
+        self.available = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.available = min(self.capacity, self.available + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def delay_for(self, amount: float) -> float:
+        """Seconds until amount can be consumed"""
+        self._refill()
+        amount = min(amount, self.capacity)
+        if self.available >= amount:
+            return 0.0
+        return (amount - self.available) / self.rate
+
+    def consume(self, amount: float):
+        self._refill()
+        self.available -= min(amount, self.capacity)
+
+    def refund(self, amount: float):
+        self._refill()
+        self.available = min(self.capacity, self.available + amount)
+
+    def level(self) -> float:
+        """Share of the capacity currently available"""
+        self._refill()
+        return max(0.0, self.available / self.capacity)
+
+
+class ModelRateLimiter:
+    """Proactive requests/min and tokens/min budget with AIMD adaptive concurrency"""
+    def __init__(self, model_id: str, rpm: int, tpm: int, max_concurrency: int, min_concurrency: int = 1):
+        self.model_id = model_id
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.concurrency_limit = float(max_concurrency)
+        self.in_flight = 0
+        self._blocked_until = 0.0
+        self._condition = asyncio.Condition()
+        CONCURRENCY_LIMIT.set(self.concurrency_limit, model=model_id)
+
+    @asynccontextmanager
+    async def acquire(self, estimated_tokens: int):
+        """Hold a concurrency slot and reserve budget for one call"""
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < int(self.concurrency_limit))
+            self.in_flight += 1
+            IN_FLIGHT.set(self.in_flight, model=self.model_id)
+        try:
+            await self._reserve(estimated_tokens)
+            yield
+        finally:
+            async with self._condition:
+                self.in_flight -= 1
+                IN_FLIGHT.set(self.in_flight, model=self.model_id)
+                self._condition.notify_all()
+
+    async def _reserve(self, estimated_tokens: int):
+        waited = 0.0
+        while True:
+            delay = max(
+                self.requests.delay_for(1),
+                self.tokens.delay_for(estimated_tokens),
+                self._blocked_until - time.monotonic()
+            )
+            if delay <= 0:
+                self.requests.consume(1)
+                self.tokens.consume(estimated_tokens)
+                break
+            waited += delay
+            await asyncio.sleep(delay)
+        if waited:
+            LIMITER_WAIT.inc(waited, model=self.model_id)
+
+    def headroom(self) -> float:
+        """Share of the request and token budgets left, 0 while paused or at the concurrency limit"""
+        if self._blocked_until > time.monotonic() or self.in_flight >= int(self.concurrency_limit):
+            return 0.0
+        return min(self.requests.level(), self.tokens.level())
+
+    def on_success(self, estimated_tokens: int, actual_tokens: Optional[int] = None):
+        """Additive increase, and correct the token reservation with actual usage"""
+        self.concurrency_limit = min(self.max_concurrency, self.concurrency_limit + 1.0 / self.concurrency_limit)
+        CONCURRENCY_LIMIT.set(self.concurrency_limit, model=self.model_id)
+        if actual_tokens is not None:
+            if actual_tokens < estimated_tokens:
+                self.tokens.refund(estimated_tokens - actual_tokens)
+            else:
+                self.tokens.consume(actual_tokens - estimated_tokens)
+
+    def on_rate_limit(self, retry_after: Optional[float] = None):
+        """Multiplicative decrease, and pause all callers for Retry-After"""
+        RATE_LIMIT_HITS.inc(model=self.model_id)
+        self.concurrency_limit = max(self.min_concurrency, self.concurrency_limit / 2)
+        CONCURRENCY_LIMIT.set(self.concurrency_limit, model=self.model_id)
+        if retry_after:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + retry_after)
+        logger.warning(
+            f"Rate limited on {self.model_id}; concurrency limit now {self.concurrency_limit:.1f}"
+            + (f", pausing {retry_after:.1f}s" if retry_after else "")
+        )
+
+
+_limiters: Dict[str, ModelRateLimiter] = {}
+
+
+def get_limiter(model_id: str) -> ModelRateLimiter:
+    """Return the process-wide limiter shared by every agent using model_id"""
+    limiter = _limiters.get(model_id)
+    if limiter is None:
+        settings = config.RATE_LIMITS.get(model_id, config.RATE_LIMITS['default'])
+        limiter = ModelRateLimiter(model_id, settings['rpm'], settings['tpm'], settings['max_concurrency'])
+        _limiters[model_id] = limiter
+    return limiter
+
+
+def reset_limiters():
+    """Drop every limiter so the next calls start with full budgets, e.g. between benchmark runs"""
+    _limiters.clear()
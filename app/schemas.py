@@ -1,5 +1,6 @@
 from pydantic import BaseModel, validator, Field
-from typing import Dict, List, Optional, Union, Any
+from typing import Dict, List, Literal, Optional, Union, Any
+from app.numeric import normalize_metrics
 
 class CompanyData(BaseModel):
     ticker: str
@@ -8,6 +9,15 @@ class CompanyData(BaseModel):
     analyst_recommendations: Dict
     price_history: Dict
 
+class MetricDiscrepancy(BaseModel):
+    """A recommended metric that disagrees with the source data beyond tolerance"""
+    metric: str  # name as reported by the model
+    feature: str  # canonical feature it was checked against
+    reported: float
+    source: float
+    relative_error: Optional[float] = None  # None when the source value is zero
+    tolerance: float
+
 class InvestmentRecommendation(BaseModel):
     ticker: str
     confidence_score: float = Field(ge=0.0, le=1.0)
@@ -16,6 +26,8 @@ class InvestmentRecommendation(BaseModel):
     key_metrics: Dict[str, Optional[Union[float, int]]]
     warnings: List[str] = Field(default_factory=list)
     sources: List[str] = Field(default_factory=list)  # Added for citations
+    criteria_violations: List[str] = Field(default_factory=list)
+    discrepancies: List[MetricDiscrepancy] = Field(default_factory=list)
     
    
     
@@ -43,37 +55,39 @@ class InvestmentRecommendation(BaseModel):
 
     @validator('key_metrics', pre=True)
     def convert_metrics(cls, value):
-        """Convert string metrics to numbers where possible"""
-        if not isinstance(value, dict):
-            return {}
-            
-        converted = {}
-        for k, v in value.items():
-            if isinstance(v, (float, int)):
-                converted[k] = v
-            elif isinstance(v, str):
-                if v.replace('.', '', 1).isdigit():
-                    converted[k] = float(v)
-                elif v.lower() in ['n/a', 'na', 'null']:
-                    converted[k] = None
-                else:
-                    try:
-                        if '%' in v:
-                            converted[k] = float(v.strip('%')) / 100
-                        elif '-' in v:
-                            parts = v.split('-')
-                            converted[k] = (float(parts[0]) + float(parts[1])) / 2
-                        elif any(word in v.lower() for word in ['above', 'below', 'over', 'under']):
-                            for part in v.split():
-                                if part.replace('.', '', 1).isdigit():
-                                    converted[k] = float(part)
-                                    break
-                            else:
-                                converted[k] = None
-                        else:
-                            converted[k] = None
-                    except:
-                        converted[k] = None
-            else:
-                converted[k] = None
-        return converted
\ No newline at end of file
+        """Convert string metrics such as "1.2B", "15%" or "10-20" to numbers"""
+        return normalize_metrics(value)
+
+class JobProgress(BaseModel):
+    completed: int = 0
+    total: int = 0
+
+class Job(BaseModel):
+    id: str
+    status: str = "queued"  # queued, running, completed, failed, cancelled
+    priority: int = 0
+    tickers: List[str]
+    criteria: Dict[str, Any]
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    expires_at: Optional[float] = None
+    cancel_requested: bool = False
+    heartbeat_at: Optional[float] = None
+    attempts: int = 0
+    progress: JobProgress = Field(default_factory=JobProgress)
+    results: List[InvestmentRecommendation] = Field(default_factory=list)
+    error: Optional[str] = None
+
+class RecommendationOutput(BaseModel):
+    """Schema the fused pipeline asks the model to fill in one call"""
+    confidence_score: float = Field(ge=0.0, le=1.0, description="Confidence in the recommendation, 0-1")
+    investment_thesis: str = Field(description="Two or three sentence investment thesis")
+    risk_assessment: Literal['low', 'medium', 'high']
+    key_metrics: Dict[str, Optional[float]] = Field(
+        default_factory=dict, description="Numeric metrics the thesis relies on, e.g. pe_ratio"
+    )
+    warnings: List[str] = Field(default_factory=list)
+    criteria_violations: List[str] = Field(
+        default_factory=list, description="Investor criteria the company fails"
+    )
@@ -0,0 +1,63 @@
+import json
+import logging
+from typing import Any, Dict, List, Optional
+import pandas as pd
+from app.config import config
+from app.criteria import build_frame, evaluate_frame
+from app.data_providers import get_provider
+
+logger = logging.getLogger(__name__)
+
+
+def load_universe(path: Optional[str] = None) -> List[str]:
+    """Tickers screened when a request does not name its own universe"""
+    with open(path or config.SCREENING['universe_path']) as f:
+        return json.load(f)
+
+
+class Screener:
+    """Screens a ticker universe against criteria in a single vectorized pass"""
+    def __init__(self, provider=None, data_cache=None):
+        self.provider = provider or get_provider()
+        self.data_cache = data_cache
+
+    def load_frame(self, tickers: List[str]) -> pd.DataFrame:
+        """Columnar feature frame for the universe, reusing cached company data"""
+        records = {}
+        missing = []
+        for ticker in dict.fromkeys(tickers):
+            cached = self.data_cache.peek(ticker) if self.data_cache is not None else None
+            if cached is None:
+                missing.append(ticker)
+            else:
+                records[ticker] = cached
+
+        if missing:
+            for ticker, record in self.provider.fetch(missing).items():
+                if "error" in record:
+                    continue
+                records[ticker] = record
+                if self.data_cache is not None:
+                    self.data_cache.set(ticker, record)
+
+        frame = build_frame(list(records.values()))
+        frame.insert(0, 'ticker', list(records.keys()))
+        return frame
+
+    def screen(self, frame: pd.DataFrame, criteria: Dict[str, Any], rank_by: str = None,
+               ascending: bool = True) -> pd.DataFrame:
+        """Filter the frame by criteria and return all survivors ranked by rank_by"""
+        rank_by = rank_by or config.SCREENING['default_rank_by']
+        if frame.empty:
+            return frame
+        if rank_by not in frame:
+            raise ValueError(f"Unknown rank_by feature: {rank_by}")
+
+        masks = evaluate_frame(frame, criteria)
+        survivors = frame[masks['passed']]
+        return survivors.sort_values(rank_by, ascending=ascending, na_position='last')
+
+
+def frame_to_records(frame: pd.DataFrame) -> List[Dict[str, Any]]:
+    """JSON-safe rows with NaN turned into None"""
+    return frame.astype(object).where(frame.notna(), None).to_dict(orient='records')
@@ -0,0 +1,185 @@
+import hashlib
+import logging
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+from textblob.en import sentiment as pattern_lexicon
+from app.cache import get_cache
+from app.config import config
+from app.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+SENTIMENT_SCORED = registry.counter(
+    "sentiment_texts_total", "Headlines given a sentiment score", ["engine", "source"]
+)
+
+# (polarity, subjectivity)
+Score = Tuple[float, float]
+
+
+class SentimentEngine:
+    """Scores news text as (polarity, subjectivity) pairs"""
+    name = "base"
+
+    def score(self, text: str) -> Score:
+        raise NotImplementedError
+
+    def score_batch(self, texts: List[str]) -> List[Score]:
+        """Score many texts in one pass; engines with vectorized scoring override this"""
+        return [self.score(text) for text in texts]
+
+
+class TextBlobEngine(SentimentEngine):
+    """TextBlob's pattern sentiment, called directly.
+
+    Same scores as TextBlob(text).sentiment without building a TextBlob per
+    headline or the namedtuple class PatternAnalyzer creates on every call.
+    """
+    name = "textblob"
+
+    def score(self, text: str) -> Score:
+        polarity, subjectivity = pattern_lexicon(text)
+        return polarity, subjectivity
+
+
+class LexiconEngine(SentimentEngine):
+    """Pattern's lexicon scoring rules over a plain regex tokenizer.
+
+    Uses the same word list, modifiers ("very good"), negations ("not good")
+    and exclamation boost as TextBlob, but skips its tokenizer and emoticon
+    checks, which dominate the cost on short headlines.
+    """
+    name = "lexicon"
+    _TOKEN = re.compile(r"n't|[a-z0-9]+(?:[-'][a-z0-9]+)*(?=n't)|[a-z0-9]+(?:[-'][a-z0-9]+)*|!")
+
+    def __init__(self, lexicon=pattern_lexicon):
+        self._words: Dict[str, Tuple[float, float, float]] = {
+            word: tuple(tags[None]) for word, tags in lexicon.items() if None in tags and " " not in word
+        }
+        self._modifiers = {
+            word for word, tags in lexicon.items() if any(tag in tags for tag in lexicon.modifiers)
+        }
+        self._negations = set(lexicon.negations)
+
+    def score(self, text: str) -> Score:
+        words = self._words
+        assessed = []  # [polarity, subjectivity, intensity, negated]
+        modifier = negation = None
+        for token in self._TOKEN.findall(text.lower()):
+            entry = words.get(token)
+            if entry is not None:
+                p, s, i = entry
+                if modifier is None:
+                    assessed.append([p, s, i, False])
+                else:
+                    last = assessed[-1]
+                    last[0] = max(-1.0, min(p * last[2], 1.0))
+                    last[1] = max(-1.0, min(s * last[2], 1.0))
+                    last[2] = i
+                if negation is not None:
+                    assessed[-1][2] = 1.0 / assessed[-1][2]
+                    assessed[-1][3] = True
+                modifier = token if token in self._modifiers else None
+                negation = token if token in self._negations else None
+                continue
+            if token in self._negations:
+                negation = token
+            elif negation and len(token.strip("'")) > 1:
+                negation = None
+            if negation is not None and modifier is not None and modifier.endswith("ly"):
+                assessed[-1][3] = True
+                negation = None
+            elif modifier and len(token) > 2:
+                modifier = None
+            if token == "!" and assessed:
+                assessed[-1][0] = max(-1.0, min(assessed[-1][0] * 1.25, 1.0))
+        if not assessed:
+            return 0.0, 0.0
+        # "not good" is slightly bad, "not bad" slightly good
+        polarity = sum(p * -0.5 if negated else p for p, _, _, negated in assessed)
+        subjectivity = sum(s for _, s, _, _ in assessed)
+        return polarity / len(assessed), subjectivity / len(assessed)
+
+
+ENGINES = {
+    TextBlobEngine.name: TextBlobEngine,
+    LexiconEngine.name: LexiconEngine,
+}
+
+_engine: Optional[SentimentEngine] = None
+
+
+def get_engine() -> SentimentEngine:
+    """Return the process-wide engine selected by Config.SENTIMENT"""
+    global _engine
+    if _engine is None:
+        name = config.SENTIMENT['engine']
+        if name not in ENGINES:
+            logger.warning(f"Unknown sentiment engine '{name}', using textblob")
+            name = TextBlobEngine.name
+        _engine = ENGINES[name]()
+        logger.info(f"Using {_engine.name} sentiment engine")
+    return _engine
+
+
+def set_engine(engine: Optional[SentimentEngine]):
+    """Swap the engine, e.g. for benchmarks; None goes back to the configured one"""
+    global _engine
+    _engine = engine
+
+
+def _content_key(engine: SentimentEngine, text: str) -> str:
+    return f"{engine.name}:{hashlib.sha1(text.encode('utf-8')).hexdigest()}"
+
+
+def score_texts(texts: Iterable[str], engine: Optional[SentimentEngine] = None) -> List[Score]:
+    """Score texts, reusing cached scores and scoring each distinct uncached text once"""
+    engine = engine or get_engine()
+    texts = list(texts)
+    settings = config.SENTIMENT
+    cache = get_cache("sentiment", ttl=settings['ttl'], max_size=settings['cache_size']) \
+        if settings['cache'] else None
+
+    scores: Dict[str, Score] = {}
+    missing: Dict[str, str] = {}  # text -> cache key
+    for text in dict.fromkeys(texts):
+        key = _content_key(engine, text)
+        cached = cache.get(key) if cache is not None else None
+        if cached is not None:
+            scores[text] = cached
+        else:
+            missing[text] = key
+    if missing:
+        for (text, key), score in zip(missing.items(), engine.score_batch(list(missing))):
+            scores[text] = score
+            if cache is not None:
+                cache.set(key, score)
+    SENTIMENT_SCORED.inc(len(texts) - len(missing), engine=engine.name, source="cache")
+    SENTIMENT_SCORED.inc(len(missing), engine=engine.name, source="engine")
+    return [scores[text] for text in texts]
+
+
+def news_text(news_item: dict) -> Optional[str]:
+    """Headline plus summary, or None for items without a title"""
+    if not isinstance(news_item, dict) or 'title' not in news_item:
+        return None
+    text = news_item['title']
+    if news_item.get('summary'):
+        text += " " + news_item['summary']
+    return text
+
+
+def add_news_sentiment_batch(records: Iterable[dict], engine: Optional[SentimentEngine] = None):
+    """Add sentiment to the news of every record in one scoring pass"""
+    items, texts = [], []
+    for record in records:
+        news = record.get('news') if isinstance(record, dict) else None
+        if not isinstance(news, list):
+            continue
+        for news_item in news:
+            text = news_text(news_item)
+            if text is not None:
+                items.append(news_item)
+                texts.append(text)
+    for news_item, (polarity, subjectivity) in zip(items, score_texts(texts, engine)):
+        news_item['sentiment'] = {'polarity': polarity, 'subjectivity': subjectivity}
@@ -0,0 +1,231 @@
+import contextvars
+import inspect
+import json
+import logging
+import os
+import random
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, Optional
+from app.config import config
+
+logger = logging.getLogger(__name__)
+
+
+class Span:
+    """Timed unit of work within a trace"""
+    recording = True
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str] = None,
+                 attributes: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.trace_id = trace_id
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.attributes: Dict[str, Any] = dict(attributes or {})
+        self.status = "ok"
+        self.start_time = time.time()
+        self._start = time.perf_counter()
+        self.duration: Optional[float] = None
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def set_attributes(self, **attributes):
+        self.attributes.update(attributes)
+
+    def record_error(self, error: BaseException):
+        self.status = "error"
+        self.attributes["error"] = f"{type(error).__name__}: {error}"
+
+    def end(self):
+        if self.duration is not None:
+            return
+        self.duration = time.perf_counter() - self._start
+        _exporter.export(self)
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start_time": self.start_time,
+            "duration_ms": round((self.duration or 0.0) * 1000, 3),
+            "status": self.status,
+            "attributes": self.attributes,
+        }
+
+
+class _NonRecordingSpan(Span):
+    """Stand-in for spans of unsampled traces; every operation is a no-op"""
+    recording = False
+
+    def __init__(self):
+        self.name = ""
+        self.trace_id = ""
+        self.span_id = ""
+        self.parent_id = None
+        self.attributes = {}
+        self.duration = 0.0
+
+    def set_attribute(self, key: str, value: Any):
+        pass
+
+    def set_attributes(self, **attributes):
+        pass
+
+    def record_error(self, error: BaseException):
+        pass
+
+    def end(self):
+        pass
+
+
+NON_RECORDING_SPAN = _NonRecordingSpan()
+
+_current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("current_span", default=None)
+
+
+class SpanExporter:
+    """Receives every finished span of a sampled trace"""
+    def export(self, span: Span):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class NullExporter(SpanExporter):
+    def export(self, span: Span):
+        pass
+
+
+class ConsoleExporter(SpanExporter):
+    """Logs one line per finished span"""
+    def export(self, span: Span):
+        attributes = " ".join(f"{key}={value}" for key, value in span.attributes.items())
+        logger.info(
+            f"span {span.name} trace={span.trace_id} id={span.span_id} parent={span.parent_id} "
+            f"{span.duration * 1000:.1f}ms {span.status} {attributes}"
+        )
+
+
+class FileExporter(SpanExporter):
+    """Appends finished spans to a JSON lines file for offline analysis"""
+    def __init__(self, path: str):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._file = open(path, "a", buffering=1)
+        self._lock = threading.Lock()
+
+    def export(self, span: Span):
+        line = json.dumps(span.to_dict(), default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+
+    def close(self):
+        with self._lock:
+            self._file.close()
+
+
+def _create_exporter() -> SpanExporter:
+    settings = config.TRACING
+    if not settings['enabled']:
+        return NullExporter()
+    if settings['exporter'] == 'file':
+        return FileExporter(settings['path'])
+    if settings['exporter'] == 'console':
+        return ConsoleExporter()
+    return NullExporter()
+
+
+_exporter: SpanExporter = _create_exporter()
+
+
+def set_exporter(exporter: SpanExporter):
+    """Replace the process-wide exporter, e.g. with a bridge to an OpenTelemetry collector"""
+    global _exporter
+    _exporter.close()
+    _exporter = exporter
+
+
+def close_exporter():
+    _exporter.close()
+
+
+def current_span() -> Span:
+    """The innermost active span, or a no-op span outside any sampled trace"""
+    return _current_span.get() or NON_RECORDING_SPAN
+
+
+def start_span(name: str, parent: Optional[Span] = None, **attributes) -> Span:
+    """Create a span without making it current; the caller must call end().
+
+    Root spans start a new trace, sampled at Config.TRACING['sample_rate'].
+    Children of an unsampled trace are never recorded.
+    """
+    parent = parent if parent is not None else _current_span.get()
+    if parent is None:
+        settings = config.TRACING
+        if not settings['enabled'] or random.random() >= settings['sample_rate']:
+            return NON_RECORDING_SPAN
+        return Span(name, uuid.uuid4().hex, attributes=attributes)
+    if not parent.recording:
+        return NON_RECORDING_SPAN
+    return Span(name, parent.trace_id, parent.span_id, attributes)
+
+
+@contextmanager
+def span(name: str, parent: Optional[Span] = None, **attributes) -> Iterator[Span]:
+    """Run the wrapped block inside a new current span"""
+    active = start_span(name, parent, **attributes)
+    token = _current_span.set(active)
+    try:
+        yield active
+    except BaseException as e:
+        active.record_error(e)
+        raise
+    finally:
+        _current_span.reset(token)
+        active.end()
+
+
+@contextmanager
+def use_span(active: Span) -> Iterator[Span]:
+    """Make an existing span current for the wrapped block without ending it"""
+    token = _current_span.set(active)
+    try:
+        yield active
+    finally:
+        _current_span.reset(token)
+
+
+def trace_tool_call(function_name: str, function_call, arguments: Dict[str, Any]):
+    """agno tool hook recording one span per tool call of the running agent"""
+    active = start_span(f"tool.{function_name}", tool=function_name, **{
+        f"arg.{key}": value for key, value in arguments.items() if isinstance(value, (str, int, float, bool))
+    })
+    try:
+        result = function_call(**arguments)
+    except BaseException as e:
+        active.record_error(e)
+        active.end()
+        raise
+    if not inspect.isawaitable(result):
+        active.end()
+        return result
+
+    async def finish():
+        try:
+            return await result
+        except BaseException as e:
+            active.record_error(e)
+            raise
+        finally:
+            active.end()
+    return finish()
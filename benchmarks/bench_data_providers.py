@@ -0,0 +1,62 @@
+"""Benchmark the direct data stage against a MarketDataProvider.
+
+Runs offline against the fixture provider by default:
+
+    python -m benchmarks.bench_data_providers --provider fixture --repeat 200
+    python -m benchmarks.bench_data_providers --provider yfinance --tickers AAPL MSFT GOOGL
+
+--provider store reads through the SQLite market data store in a temporary
+file, with the fixture as upstream; the first repeat fills it:
+
+    python -m benchmarks.bench_data_providers --provider store --repeat 200
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+
+from app.config import config
+from app.data_providers import FixtureProvider, StoreProvider, YFinanceProvider
+from app.market_store import MarketDataStore
+from app.agents.data_agent import add_news_sentiment
+
+
+def run(provider, tickers, repeat):
+    timings = []
+    failures = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        records = provider.fetch(tickers)
+        for record in records.values():
+            if "error" in record:
+                failures += 1
+            else:
+                add_news_sentiment(record)
+        timings.append(time.perf_counter() - start)
+    return timings, failures
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--provider", choices=["fixture", "yfinance", "store"], default="fixture")
+    parser.add_argument("--tickers", nargs="+", default=["AAPL", "MSFT", "GOOGL", "AMZN", "META"])
+    parser.add_argument("--repeat", type=int, default=50)
+    args = parser.parse_args()
+
+    if args.provider == "fixture":
+        provider = FixtureProvider(config.DATA_SOURCE['fixture_path'])
+    elif args.provider == "store":
+        store = MarketDataStore(os.path.join(tempfile.mkdtemp(), "market_data.db"))
+        provider = StoreProvider(store, FixtureProvider(config.DATA_SOURCE['fixture_path']),
+                                 config.MARKET_STORE['max_age'])
+    else:
+        provider = YFinanceProvider(news_limit=config.DATA_SOURCE['news_limit'])
+
+    timings, failures = run(provider, args.tickers, args.repeat)
+    batch_ms = [t * 1000 for t in timings]
+    print(f"Provider: {provider.name}, batch size: {len(args.tickers)}, repeats: {args.repeat}")
+    print(f"Batch latency: mean {statistics.mean(batch_ms):.2f}ms, "
+          f"median {statistics.median(batch_ms):.2f}ms, max {max(batch_ms):.2f}ms")
+    print(f"Per ticker: {statistics.mean(batch_ms) / len(args.tickers):.2f}ms")
+    print(f"Failed records: {failures}")
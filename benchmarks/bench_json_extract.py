@@ -0,0 +1,67 @@
+"""Compare bare json.loads with app.json_extract on recorded-style LLM outputs.
+
+The corpus covers reasoning blocks, code fences, surrounding prose, Python
+literals, trailing commas and truncated replies. Every unparseable reply is
+a re-call (or a fallback) the pipeline would otherwise pay for:
+
+    python -m benchmarks.bench_json_extract --repeat 200
+"""
+import argparse
+import json
+import os
+import statistics
+import time
+
+from app.json_extract import extract
+
+CORPUS_PATH = os.path.join(os.path.dirname(__file__), "fixtures", "llm_responses.json")
+
+
+def bare_loads(text, root):
+    try:
+        value = json.loads(text)
+    except ValueError:
+        return None
+    return value if isinstance(value, dict if root == "{" else list) else None
+
+
+def extracted(text, root):
+    return extract(text, root=root).value
+
+
+def timed(func, cases, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for case in cases:
+            func(case["text"], case["root"])
+        timings.append((time.perf_counter() - start) * 1e6 / len(cases))
+    return statistics.median(timings)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--repeat", type=int, default=200)
+    parser.add_argument("--verbose", action="store_true", help="Show the outcome of every response")
+    args = parser.parse_args()
+
+    with open(CORPUS_PATH) as f:
+        cases = json.load(f)
+    expected = sum(case["expect_json"] for case in cases)
+
+    print(f"Corpus: {len(cases)} responses, {expected} contain JSON")
+    for label, func in [("json.loads", bare_loads), ("extract", extracted)]:
+        outcomes = [(case, func(case["text"], case["root"]) is not None) for case in cases]
+        recovered = sum(ok for case, ok in outcomes if case["expect_json"])
+        false_positives = sum(ok for case, ok in outcomes if not case["expect_json"])
+        print(f"{label:12s} parsed {recovered}/{expected} ({recovered / expected:.0%}), "
+              f"false positives {false_positives}, median {timed(func, cases, args.repeat):7.1f}us/response")
+        if args.verbose:
+            for case, ok in outcomes:
+                print(f"    {case['name']:24s} {'ok' if ok else '-'}")
+
+    statuses = {}
+    for case in cases:
+        status = extract(case["text"], root=case["root"]).status
+        statuses[status] = statuses.get(status, 0) + 1
+    print("extract outcomes: " + ", ".join(f"{status} {count}" for status, count in sorted(statuses.items())))
@@ -0,0 +1,97 @@
+"""Compare key_metrics normalization with the validator it replaced.
+
+Times one recommendation's metrics at a time (the per-construction path) and
+a whole column at once (normalize_metrics_batch), and lists the inputs on
+which the two disagree:
+
+    python -m benchmarks.bench_numeric --rows 2000 --repeat 20
+"""
+import argparse
+import random
+import statistics
+import time
+
+from app.numeric import normalize_metrics, normalize_metrics_batch
+
+SAMPLES = [
+    25.3, 0.42, 18, None, "31.4", "0.18", "15%", "-3.2%", "12.5 %", "1.2B", "$3.4T", "500K", "2.5 million",
+    "(2.1M)", "-5", "-0.7", "10-20", "10 - 20%", "$10 to $20", "above 30", "P/E above 30", "below 0.5", "~25x",
+    "1,234.5", "N/A", "null", "", "High", "approx. 40", "$226.50",
+]
+METRIC_NAMES = ["pe_ratio", "debt_to_equity", "revenue_growth", "market_cap", "current_price", "eps"]
+
+
+def legacy_convert_metrics(value):
+    """InvestmentRecommendation.convert_metrics before app.numeric"""
+    if not isinstance(value, dict):
+        return {}
+
+    converted = {}
+    for k, v in value.items():
+        if isinstance(v, (float, int)):
+            converted[k] = v
+        elif isinstance(v, str):
+            if v.replace('.', '', 1).isdigit():
+                converted[k] = float(v)
+            elif v.lower() in ['n/a', 'na', 'null']:
+                converted[k] = None
+            else:
+                try:
+                    if '%' in v:
+                        converted[k] = float(v.strip('%')) / 100
+                    elif '-' in v:
+                        parts = v.split('-')
+                        converted[k] = (float(parts[0]) + float(parts[1])) / 2
+                    elif any(word in v.lower() for word in ['above', 'below', 'over', 'under']):
+                        for part in v.split():
+                            if part.replace('.', '', 1).isdigit():
+                                converted[k] = float(part)
+                                break
+                        else:
+                            converted[k] = None
+                    else:
+                        converted[k] = None
+                except:
+                    converted[k] = None
+        else:
+            converted[k] = None
+    return converted
+
+
+def synthetic_rows(rows, seed=7):
+    rng = random.Random(seed)
+    return [{name: rng.choice(SAMPLES) for name in METRIC_NAMES} for _ in range(rows)]
+
+
+def timed(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    rows = synthetic_rows(args.rows)
+    values = args.rows * len(METRIC_NAMES)
+    print(f"{args.rows} recommendations x {len(METRIC_NAMES)} metrics")
+    for label, func in [
+        ("legacy validator (per row)", lambda: [legacy_convert_metrics(row) for row in rows]),
+        ("normalize_metrics (per row)", lambda: [normalize_metrics(row) for row in rows]),
+        ("normalize_metrics_batch", lambda: normalize_metrics_batch(rows)),
+    ]:
+        median = timed(func, args.repeat)
+        print(f"{label:30s} median {median:8.2f}ms  ({values / median * 1000:,.0f} values/s)")
+
+    print("\nInputs parsed differently:")
+    for sample in SAMPLES:
+        old = legacy_convert_metrics({"m": sample})["m"]
+        new = normalize_metrics({"m": sample})["m"]
+        if old != new:
+            print(f"  {sample!r:18s} legacy {old!r:14} new {new!r}")
@@ -0,0 +1,86 @@
+"""Compare the two-call pipeline with the fused single-call mode.
+
+Uses fixture market data so only the LLM stages differ, with every cache
+disabled. Needs GROQ_API_KEY:
+
+    python -m benchmarks.bench_pipeline_modes --modes per_ticker fused --repeat 3
+"""
+import argparse
+import asyncio
+import statistics
+import time
+
+from app.config import config
+from app.agents.base import LLM_CALLS
+from app.orchestrator import FUSED_FALLBACKS, Orchestrator
+from app.rate_limit import reset_limiters
+
+
+def quality_flags(result) -> dict:
+    warnings = " ".join(result.warnings)
+    return {
+        "failed": result.confidence_score == 0.0 and "Processing error" in result.warnings,
+        "invalid_json": "Invalid JSON" in result.investment_thesis,
+        "discrepancies": "Metric discrepancies" in warnings,
+        "low_confidence": "Low confidence" in warnings,
+        "empty_metrics": not result.key_metrics,
+    }
+
+
+def llm_calls() -> float:
+    return sum(value for _, _, value in LLM_CALLS.samples())
+
+
+async def run_mode(orchestrator, mode, tickers, criteria, repeat):
+    config.PIPELINE['mode'] = mode
+    # Each mode starts with full request/token budgets so the first does not slow the second
+    reset_limiters()
+    timings, flags, confidences = [], [], []
+    calls_before = llm_calls()
+    fallbacks_before = FUSED_FALLBACKS.value()
+    for _ in range(repeat):
+        for ticker in tickers:
+            start = time.perf_counter()
+            result = await orchestrator.process_ticker(ticker, criteria)
+            timings.append(time.perf_counter() - start)
+            flags.append(quality_flags(result))
+            confidences.append(result.confidence_score)
+    return {
+        "timings": timings,
+        "flags": {name: sum(flag[name] for flag in flags) for name in flags[0]},
+        "confidence": statistics.mean(confidences),
+        "llm_calls": llm_calls() - calls_before,
+        "fused_fallbacks": FUSED_FALLBACKS.value() - fallbacks_before,
+    }
+
+
+async def main(args):
+    config.DATA_SOURCE['mode'] = 'direct'
+    config.DATA_SOURCE['provider'] = 'fixture'
+    config.CACHE_SETTINGS['enabled'] = False
+    criteria = {"max_pe_ratio": args.max_pe, "min_revenue_growth": 0.05}
+
+    orchestrator = Orchestrator()
+    await orchestrator.start()
+    try:
+        for mode in args.modes:
+            stats = await run_mode(orchestrator, mode, args.tickers, criteria, args.repeat)
+            ms = sorted(t * 1000 for t in stats["timings"])
+            p95 = ms[min(len(ms) - 1, int(len(ms) * 0.95))]
+            print(f"Mode: {mode}, tickers: {len(args.tickers)}, repeats: {args.repeat}")
+            print(f"  Latency per ticker: mean {statistics.mean(ms):.0f}ms, "
+                  f"median {statistics.median(ms):.0f}ms, p95 {p95:.0f}ms")
+            print(f"  LLM calls: {stats['llm_calls']:.0f}, fused fallbacks: {stats['fused_fallbacks']:.0f}")
+            print(f"  Mean confidence: {stats['confidence']:.2f}")
+            print("  Quality flags: " + ", ".join(f"{name} {count}" for name, count in stats["flags"].items()))
+    finally:
+        await orchestrator.cleanup()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--modes", nargs="+", choices=["per_ticker", "fused"], default=["per_ticker", "fused"])
+    parser.add_argument("--tickers", nargs="+", default=["AAPL", "MSFT", "GOOGL", "ORCL", "CRM"])
+    parser.add_argument("--repeat", type=int, default=2)
+    parser.add_argument("--max-pe", type=float, default=35)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,93 @@
+"""Benchmark /screen-style vectorized screening on a synthetic universe.
+
+    python -m benchmarks.bench_screen --rows 5000 --repeat 20
+"""
+import argparse
+import random
+import statistics
+import time
+
+from app.criteria import build_frame, evaluate_frame
+from app.screener import Screener
+
+SECTORS = ["Technology", "Communication Services", "Consumer Cyclical", "Financial Services", "Healthcare"]
+INDUSTRIES = ["Software - Application", "Software - Infrastructure", "Semiconductors", "Internet Retail", "Banks"]
+
+CRITERIA = {
+    "min_price": 20,
+    "max_pe_ratio": 35,
+    "max_debt_ratio": 1.0,
+    "min_revenue_growth": 0.05,
+    "sectors": ["Technology", "Software"],
+}
+
+
+def synthetic_universe(rows, seed=7):
+    """CompanyData-shaped records with realistic ranges and some missing fields"""
+    rng = random.Random(seed)
+    records = []
+    for i in range(rows):
+        fundamentals = {
+            "currentPrice": round(rng.uniform(2, 900), 2),
+            "trailingPE": round(rng.uniform(5, 120), 2) if rng.random() > 0.1 else None,
+            "debtToEquity": round(rng.uniform(0, 400), 1) if rng.random() > 0.1 else None,
+            "revenueGrowth": round(rng.uniform(-0.2, 0.6), 3),
+            "marketCap": rng.uniform(1e8, 3e12),
+            "sector": rng.choice(SECTORS),
+            "industry": rng.choice(INDUSTRIES),
+        }
+        records.append({
+            "ticker": f"T{i:05d}",
+            "fundamentals": fundamentals,
+            "news": [],
+            "analyst_recommendations": {},
+            "price_history": {},
+        })
+    return records
+
+
+class _StaticProvider:
+    name = "synthetic"
+
+    def __init__(self, records):
+        self._records = {record["ticker"]: record for record in records}
+
+    def fetch(self, tickers):
+        return {ticker: self._records[ticker] for ticker in tickers}
+
+
+def timed(func, repeat):
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings, result
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--top-n", type=int, default=25)
+    args = parser.parse_args()
+
+    records = synthetic_universe(args.rows)
+    tickers = [record["ticker"] for record in records]
+    screener = Screener(provider=_StaticProvider(records))
+
+    load_ms, frame = timed(lambda: screener.load_frame(tickers), args.repeat)
+    filter_ms, masks = timed(lambda: evaluate_frame(frame, CRITERIA), args.repeat)
+    screen_ms, ranked = timed(lambda: screener.screen(frame, CRITERIA, "pe_ratio").head(args.top_n), args.repeat)
+    build_ms, _ = timed(lambda: build_frame(records), args.repeat)
+
+    print(f"Universe: {args.rows} rows, {int(masks['passed'].sum())} pass, top {len(ranked)} returned")
+    for label, timings in [
+        ("load_frame (records -> columns)", load_ms),
+        ("build_frame only", build_ms),
+        ("evaluate_frame (filters)", filter_ms),
+        ("screen (filter + rank)", screen_ms),
+    ]:
+        median = statistics.median(timings)
+        print(f"{label:34s} median {median:8.2f}ms  ({args.rows / median * 1000:,.0f} rows/s)")
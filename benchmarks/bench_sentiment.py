@@ -0,0 +1,90 @@
+"""Measure headline sentiment throughput for each engine, cold and warm cache.
+
+Headlines come from the market data fixture plus synthetic variants, so the
+run is offline. The legacy path is the previous per-headline TextBlob that
+computed .sentiment twice:
+
+    python -m benchmarks.bench_sentiment --headlines 5000 --repeat 5
+"""
+import argparse
+import json
+import random
+import statistics
+import time
+
+from textblob import TextBlob
+
+from app.cache import get_cache
+from app.config import config
+from app.sentiment import ENGINES, add_news_sentiment_batch, set_engine
+
+SUBJECTS = ["Apple", "Microsoft", "Alphabet", "Nvidia", "Salesforce", "Adobe", "Oracle", "Intuit"]
+EVENTS = [
+    "beats estimates as cloud revenue surges", "misses expectations on weak demand",
+    "shares fall sharply after terrible guidance", "is not a bad bet, analysts say",
+    "posts record quarter!", "faces antitrust scrutiny in Europe", "cuts jobs amid slowing growth",
+    "wins a very large government contract", "doesn't expect margins to improve", "unveils new AI features",
+]
+
+
+def headlines(count, seed=7):
+    with open(config.DATA_SOURCE['fixture_path']) as f:
+        titles = [item['title'] for record in json.load(f).values() for item in record.get('news') or []]
+    rng = random.Random(seed)
+    while len(titles) < count:
+        titles.append(f"{rng.choice(SUBJECTS)} {rng.choice(EVENTS)} ({len(titles)})")
+    return titles[:count]
+
+
+def legacy(texts):
+    for text in texts:
+        analysis = TextBlob(text)
+        analysis.sentiment.polarity, analysis.sentiment.subjectivity
+
+
+def records_for(texts, per_record=10):
+    return [{"news": [{"title": text} for text in texts[i:i + per_record]]} for i in range(0, len(texts), per_record)]
+
+
+def timed(func, repeat, setup=None):
+    timings = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--headlines", type=int, default=5000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    texts = headlines(args.headlines)
+    cache = get_cache("sentiment", ttl=config.SENTIMENT['ttl'], max_size=max(config.SENTIMENT['cache_size'], len(texts)))
+    print(f"{len(texts)} headlines, median of {args.repeat} runs")
+
+    def report(label, seconds):
+        print(f"{label:32s} {seconds * 1000:9.1f}ms  {len(texts) / seconds:12,.0f} headlines/s")
+
+    report("legacy TextBlob (per headline)", timed(lambda: legacy(texts), args.repeat))
+    engines = {name: factory() for name, factory in ENGINES.items()}
+    for name, engine in engines.items():
+        report(f"{name} engine (uncached)", timed(lambda: engine.score_batch(texts), args.repeat))
+        set_engine(engine)
+        report(f"{name} batch, cold cache",
+               timed(lambda: add_news_sentiment_batch(records_for(texts)), args.repeat, setup=cache.clear))
+        report(f"{name} batch, warm cache", timed(lambda: add_news_sentiment_batch(records_for(texts)), args.repeat))
+    set_engine(None)
+
+    baseline = engines["textblob"].score_batch(texts)
+    for name, engine in engines.items():
+        if name == "textblob":
+            continue
+        scores = engine.score_batch(texts)
+        differences = [abs(a[0] - b[0]) for a, b in zip(scores, baseline)]
+        same = sum(difference < 1e-9 for difference in differences)
+        print(f"\n{name} vs textblob polarity: {same}/{len(texts)} identical, max difference {max(differences):.3f}")
@@ -0,0 +1,363 @@
+"""Load test /recommendations at a configurable concurrency and request mix.
+
+Drives the FastAPI app in-process over ASGI (lifespan included), or a running
+server with --url. Requests draw their ticker count from --mix, and
+--duplicate-ratio of them repeat an earlier request to exercise the caches.
+Reports throughput, latency percentiles, a per-stage breakdown taken from
+/metrics and peak memory, and saves everything as JSON for later comparison.
+
+Offline against the mock model backend (the default in-process):
+
+    python -m benchmarks.load_test --requests 200 --concurrency 16 --mix 1:0.6,3:0.3,5:0.1 \\
+        --duplicate-ratio 0.3 --output results/after.json --compare results/before.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import re
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+from datetime import datetime, timezone
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+CRITERIA_VARIANTS = [
+    {"max_pe_ratio": 35, "min_revenue_growth": 0.05},
+    {"min_price": 100, "max_pe_ratio": 30, "max_debt_ratio": 0.5, "sectors": ["Technology", "Software"]},
+    {"max_pe_ratio": 45, "min_revenue_growth": 0.1},
+]
+
+# Higher is better for these; every other compared metric is better lower
+HIGHER_IS_BETTER = {"throughput_rps", "tickers_per_second"}
+COMPARED = ["throughput_rps", "tickers_per_second", "latency_ms.p50", "latency_ms.p95", "latency_ms.p99",
+            "error_rate", "peak_rss_mb"]
+
+_SAMPLE = re.compile(r'^(\w+)(?:\{(.*)\})?\s+(\S+)$')
+_LABEL = re.compile(r'(\w+)="((?:[^"\\]|\\.)*)"')
+
+
+def parse_mix(text):
+    """'1:0.6,3:0.3,5:0.1' -> ([1, 3, 5], [0.6, 0.3, 0.1])"""
+    counts, weights = [], []
+    for part in text.split(","):
+        count, _, weight = part.partition(":")
+        counts.append(int(count))
+        weights.append(float(weight or 1))
+    return counts, weights
+
+
+def build_requests(args, universe):
+    """Deterministic request payloads, flagging which ones repeat an earlier request"""
+    rng = random.Random(args.seed)
+    counts, weights = parse_mix(args.mix)
+    payloads = []
+    for _ in range(args.requests):
+        if payloads and rng.random() < args.duplicate_ratio:
+            payloads.append((rng.choice(payloads)[0], True))
+            continue
+        size = min(rng.choices(counts, weights)[0], len(universe))
+        payload = {"tickers": rng.sample(universe, size), "criteria": rng.choice(CRITERIA_VARIANTS)}
+        payloads.append((payload, False))
+    return payloads
+
+
+def parse_metrics(text):
+    """Prometheus text format -> {(name, frozenset(labels)): value}"""
+    samples = {}
+    for line in text.splitlines():
+        if not line or line.startswith("#"):
+            continue
+        match = _SAMPLE.match(line)
+        if match:
+            name, labels, value = match.groups()
+            samples[(name, frozenset(_LABEL.findall(labels or "")))] = float(value)
+    return samples
+
+
+def metric_delta(before, after, name):
+    """Per-label increase of a counter (or histogram _sum/_count) during the run"""
+    deltas = {}
+    for (sample_name, labels), value in after.items():
+        if sample_name == name:
+            deltas[labels] = value - before.get((sample_name, labels), 0.0)
+    return deltas
+
+
+def stage_breakdown(before, after):
+    sums = metric_delta(before, after, "pipeline_stage_seconds_sum")
+    counts = metric_delta(before, after, "pipeline_stage_seconds_count")
+    stages = defaultdict(lambda: {"count": 0.0, "seconds": 0.0})
+    for labels, count in counts.items():
+        stage = dict(labels).get("stage", "unknown")
+        stages[stage]["count"] += count
+        stages[stage]["seconds"] += sums.get(labels, 0.0)
+    return {
+        stage: {"count": int(values["count"]), "total_s": round(values["seconds"], 3),
+                "mean_ms": round(values["seconds"] / values["count"] * 1000, 1) if values["count"] else None}
+        for stage, values in sorted(stages.items())
+    }
+
+
+def llm_breakdown(before, after):
+    calls = defaultdict(float)
+    for labels, value in metric_delta(before, after, "llm_calls_total").items():
+        calls[dict(labels).get("outcome", "unknown")] += value
+    tokens = defaultdict(float)
+    for labels, value in metric_delta(before, after, "llm_tokens_total").items():
+        tokens[dict(labels).get("kind", "unknown")] += value
+    return {"calls": {k: int(v) for k, v in calls.items()}, "tokens": {k: int(v) for k, v in tokens.items()}}
+
+
+def percentile(values, q):
+    if not values:
+        return None
+    ordered = sorted(values)
+    index = (len(ordered) - 1) * q
+    low, high = int(index), min(int(index) + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (index - low)
+
+
+def latency_summary(latencies):
+    ms = [latency * 1000 for latency in latencies]
+    if not ms:
+        return {}
+    return {
+        "mean": round(statistics.mean(ms), 1),
+        "p50": round(percentile(ms, 0.50), 1),
+        "p95": round(percentile(ms, 0.95), 1),
+        "p99": round(percentile(ms, 0.99), 1),
+        "max": round(max(ms), 1),
+    }
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def drive(client, payloads, concurrency, timeout):
+    """Closed-loop load: `concurrency` workers each send their next request when the last returns"""
+    queue = asyncio.Queue()
+    for item in payloads:
+        queue.put_nowait(item)
+    results = []
+
+    async def worker():
+        while not queue.empty():
+            payload, duplicate = queue.get_nowait()
+            start = time.perf_counter()
+            try:
+                response = await client.post("/recommendations", json=payload, timeout=timeout)
+                status = response.status_code
+            except Exception as e:
+                status = type(e).__name__
+            results.append({
+                "latency": time.perf_counter() - start,
+                "status": status,
+                "tickers": len(payload["tickers"]),
+                "duplicate": duplicate,
+            })
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return results, time.perf_counter() - started
+
+
+def summarize(results, elapsed):
+    ok = [r for r in results if r["status"] == 200]
+    tickers = sum(r["tickers"] for r in ok)
+    return {
+        "requests": len(results),
+        "errors": len(results) - len(ok),
+        "error_rate": round((len(results) - len(ok)) / len(results), 4) if results else 0.0,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(ok) / elapsed, 3) if elapsed else None,
+        "tickers_per_second": round(tickers / elapsed, 3) if elapsed else None,
+        "latency_ms": latency_summary([r["latency"] for r in ok]),
+        "latency_ms_fresh": latency_summary([r["latency"] for r in ok if not r["duplicate"]]),
+        "latency_ms_duplicate": latency_summary([r["latency"] for r in ok if r["duplicate"]]),
+        "latency_ms_by_tickers": {
+            str(count): latency_summary([r["latency"] for r in ok if r["tickers"] == count])
+            for count in sorted({r["tickers"] for r in ok})
+        },
+    }
+
+
+async def run(args):
+    import httpx
+
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url)
+        universe = args.tickers
+        lifespan = None
+    else:
+        # Imported here: the app reads MODEL_PROVIDER and the other settings at import time
+        from app.config import config
+        import main
+        if args.rpm or args.tpm:
+            for limits in config.RATE_LIMITS.values():
+                limits['rpm'] = args.rpm or limits['rpm']
+                limits['tpm'] = args.tpm or limits['tpm']
+        if args.pipeline_mode:
+            config.PIPELINE['mode'] = args.pipeline_mode
+        config.CACHE_SETTINGS['enabled'] = not args.no_cache
+        if args.tickers:
+            universe = args.tickers
+        else:
+            with open(config.DATA_SOURCE['fixture_path']) as f:
+                universe = sorted(json.load(f))
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=main.app), base_url="http://loadtest")
+        lifespan = main.app.router.lifespan_context(main.app)
+
+    payloads = build_requests(args, universe)
+    if args.trace_memory:
+        tracemalloc.start()
+    async with client:
+        if lifespan is not None:
+            await lifespan.__aenter__()
+        try:
+            for payload, _ in payloads[:args.warmup]:
+                await client.post("/recommendations", json=payload, timeout=args.timeout)
+            before = parse_metrics((await client.get("/metrics")).text)
+            results, elapsed = await drive(client, payloads, args.concurrency, args.timeout)
+            after = parse_metrics((await client.get("/metrics")).text)
+        finally:
+            if lifespan is not None:
+                await lifespan.__aexit__(None, None, None)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "revision": git_revision(),
+            "target": args.url or "in-process",
+            "model_provider": os.environ.get("MODEL_PROVIDER", "groq"),
+            "data_mode": os.environ.get("DATA_MODE", "llm"),
+            "pipeline_mode": args.pipeline_mode or os.environ.get("PIPELINE_MODE", "per_ticker"),
+            "requests": args.requests,
+            "concurrency": args.concurrency,
+            "mix": args.mix,
+            "duplicate_ratio": args.duplicate_ratio,
+            "seed": args.seed,
+        },
+        "summary": summarize(results, elapsed),
+        "stages": stage_breakdown(before, after),
+        "llm": llm_breakdown(before, after),
+        "memory": {"peak_rss_mb": None if args.url else peak_rss_mb()},
+    }
+    if args.trace_memory:
+        report["memory"]["python_peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 2 ** 20, 1)
+        tracemalloc.stop()
+    report["summary"]["peak_rss_mb"] = report["memory"]["peak_rss_mb"]
+    return report
+
+
+def print_report(report):
+    summary, meta = report["summary"], report["meta"]
+    print(f"Target: {meta['target']} ({meta['model_provider']}, {meta['pipeline_mode']}), "
+          f"{summary['requests']} requests at concurrency {meta['concurrency']}, revision {meta['revision']}")
+    print(f"  Throughput: {summary['throughput_rps']} req/s, {summary['tickers_per_second']} tickers/s, "
+          f"errors {summary['errors']} ({summary['error_rate']:.1%})")
+    for label in ("latency_ms", "latency_ms_fresh", "latency_ms_duplicate"):
+        latency = summary[label]
+        if latency:
+            print(f"  {label:22s} p50 {latency['p50']:9.1f}  p95 {latency['p95']:9.1f}  "
+                  f"p99 {latency['p99']:9.1f}  max {latency['max']:9.1f}")
+    for count, latency in summary["latency_ms_by_tickers"].items():
+        print(f"  {count + ' ticker(s)':22s} p50 {latency['p50']:9.1f}  p95 {latency['p95']:9.1f}")
+    for stage, values in report["stages"].items():
+        print(f"  stage {stage:16s} {values['count']:6d} runs, mean {values['mean_ms']} ms")
+    print(f"  LLM calls: {report['llm']['calls']}, tokens: {report['llm']['tokens']}")
+    print(f"  Memory: {report['memory']}")
+
+
+def _lookup(report, path):
+    value = report["summary"]
+    for key in path.split("."):
+        value = value.get(key) if isinstance(value, dict) else None
+    return value
+
+
+def compare(report, baseline, threshold):
+    """Print the change of each headline metric; returns the regressions beyond threshold"""
+    print(f"Compared with revision {baseline['meta'].get('revision')} ({baseline['meta'].get('timestamp')}):")
+    regressions = []
+    for path in COMPARED:
+        new, old = _lookup(report, path), _lookup(baseline, path)
+        if new is None or old is None:
+            continue
+        change = (new - old) / old if old else (0.0 if new == old else float("inf"))
+        worse = -change if path in HIGHER_IS_BETTER else change
+        flag = ""
+        if worse > threshold and (old or new):
+            flag = "  REGRESSION"
+            regressions.append(path)
+        print(f"  {path:22s} {old:>10} -> {new:>10}  ({change:+.1%}){flag}")
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--url", help="Test a running server instead of the in-process app")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--mix", default="1:0.6,3:0.3,5:0.1", help="tickers per request and their weights")
+    parser.add_argument("--duplicate-ratio", type=float, default=0.2, help="share of requests repeating an earlier one")
+    parser.add_argument("--tickers", nargs="+", help="ticker universe (default: the market data fixture)")
+    parser.add_argument("--warmup", type=int, default=0, help="requests sent before measuring")
+    parser.add_argument("--pipeline-mode", choices=["per_ticker", "batched", "fused"])
+    parser.add_argument("--model-provider", choices=["mock", "groq"], default="mock")
+    parser.add_argument("--data-mode", choices=["llm", "direct"])
+    parser.add_argument("--rpm", type=int, help="override every client-side RATE_LIMITS rpm")
+    parser.add_argument("--tpm", type=int, help="override every client-side RATE_LIMITS tpm")
+    parser.add_argument("--no-cache", action="store_true")
+    parser.add_argument("--trace-memory", action="store_true", help="also report the Python heap peak (slower)")
+    parser.add_argument("--timeout", type=float, default=300)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="write the JSON report here")
+    parser.add_argument("--compare", help="a previous JSON report to compare against")
+    parser.add_argument("--threshold", type=float, default=0.1, help="relative change counted as a regression")
+    return parser.parse_args(argv)
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if not args.url:
+        os.environ["MODEL_PROVIDER"] = args.model_provider
+        if args.model_provider == "mock":
+            os.environ.setdefault("DATA_PROVIDER", "fixture")
+        if args.data_mode:
+            os.environ["DATA_MODE"] = args.data_mode
+
+    report = asyncio.run(run(args))
+    print_report(report)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Saved {args.output}")
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(report, json.load(f), args.threshold)
+        if regressions:
+            sys.exit(1)
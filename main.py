@@ -1,20 +1,54 @@
 # main.py
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
+from typing import Optional
+import json
 import logging
 import time
 from contextlib import asynccontextmanager
 
+from app.cache import close_caches, cache_stats
+from app.config import config
+from app.criteria import CriteriaError, validate_criteria
+from app.data_providers import upstream_provider
+from app.jobs import JobQueue
+from app.market_store import MarketDataRefresher, close_store
+from app.tracing import close_exporter
+from app.concurrency import run_blocking
+from app.metrics import registry
 from app.orchestrator import Orchestrator
-from app.schemas import InvestmentRecommendation
+from app.prewarm import Prewarmer
+from app.schemas import InvestmentRecommendation, Job
+from app.screener import Screener, frame_to_records, load_universe
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    orchestrator = Orchestrator()
+    await orchestrator.start()
+    app.state.orchestrator = orchestrator
+    job_queue = JobQueue(orchestrator)
+    await job_queue.start()
+    app.state.job_queue = job_queue
+    market_refresher = MarketDataRefresher(upstream_provider())
+    await market_refresher.start()
+    app.state.market_refresher = market_refresher
+    prewarmer = Prewarmer(orchestrator)
+    await prewarmer.start()
+    app.state.prewarmer = prewarmer
+    logger.info("Agent pools ready")
     yield
+    await prewarmer.stop()
+    await market_refresher.stop()
+    await job_queue.stop()
+    await orchestrator.cleanup()
+    close_caches()
+    close_store()
+    close_exporter()
     logger.info("Application shutdown complete")
 
 app = FastAPI(
@@ -29,6 +63,10 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.exception_handler(CriteriaError)
+async def criteria_error(request: Request, exc: CriteriaError):
+    return JSONResponse(status_code=400, content={"detail": str(exc)})
+
 class RecommendationRequest(BaseModel):
     tickers: list[str]
     criteria: dict
@@ -39,13 +77,14 @@ class RecommendationResponse(BaseModel):
 
 @app.post("/recommendations", response_model=RecommendationResponse)
 async def get_recommendations(request: RecommendationRequest):
+    validate_criteria(request.criteria)
     try:
         logger.info(f"Processing request for {request.tickers}")
         start_time = time.time()
         
-        async with Orchestrator() as orchestrator:
-            results = await orchestrator.process_tickers(request.tickers, request.criteria)
-            
+        orchestrator = app.state.orchestrator
+        results = await orchestrator.process_tickers(request.tickers, request.criteria)
+
         return RecommendationResponse(
             recommendations=results,
             processing_time=round(time.time() - start_time, 2)
@@ -54,6 +93,121 @@ async def get_recommendations(request: RecommendationRequest):
         logger.error(f"Error processing request: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/recommendations/stream")
+async def stream_recommendations(request: RecommendationRequest, http_request: Request):
+    """Stream per-stage progress and each recommendation as NDJSON, or as SSE when requested"""
+    # Rejected here, before the response starts, rather than mid-stream
+    validate_criteria(request.criteria)
+    logger.info(f"Streaming request for {request.tickers}")
+    orchestrator = app.state.orchestrator
+    use_sse = "text/event-stream" in http_request.headers.get("accept", "")
+
+    async def events():
+        try:
+            async for event in orchestrator.stream_tickers(request.tickers, request.criteria):
+                payload = json.dumps(event)
+                yield f"event: {event['event']}\ndata: {payload}\n\n" if use_sse else payload + "\n"
+        except Exception as e:
+            logger.error(f"Error streaming request: {str(e)}", exc_info=True)
+            payload = json.dumps({"event": "error", "detail": str(e)})
+            yield f"event: error\ndata: {payload}\n\n" if use_sse else payload + "\n"
+
+    media_type = "text/event-stream" if use_sse else "application/x-ndjson"
+    return StreamingResponse(events(), media_type=media_type)
+
+class JobRequest(RecommendationRequest):
+    priority: int = 0
+
+class JobSubmitted(BaseModel):
+    job_id: str
+    status: str
+
+async def get_job_or_404(job_id: str) -> Job:
+    job = await app.state.job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found or expired")
+    return job
+
+@app.post("/jobs", response_model=JobSubmitted, status_code=202)
+async def submit_job(request: JobRequest):
+    job = await app.state.job_queue.submit(request.tickers, request.criteria, request.priority)
+    logger.info(f"Queued job {job.id} for {len(request.tickers)} tickers")
+    return JobSubmitted(job_id=job.id, status=job.status)
+
+@app.get("/jobs/{job_id}", response_model=Job, response_model_exclude={"results"})
+async def get_job(job_id: str):
+    return await get_job_or_404(job_id)
+
+@app.get("/jobs/{job_id}/result", response_model=RecommendationResponse)
+async def get_job_result(job_id: str):
+    job = await get_job_or_404(job_id)
+    if job.status != "completed":
+        raise HTTPException(status_code=409, detail=f"Job {job_id} is {job.status}")
+    return RecommendationResponse(
+        recommendations=job.results,
+        processing_time=round(job.finished_at - job.started_at, 2)
+    )
+
+@app.delete("/jobs/{job_id}", response_model=Job, response_model_exclude={"results"})
+async def cancel_job(job_id: str):
+    await get_job_or_404(job_id)
+    return await app.state.job_queue.cancel(job_id)
+
+class ScreenRequest(BaseModel):
+    criteria: dict
+    tickers: Optional[list[str]] = None
+    rank_by: Optional[str] = None
+    ascending: bool = True
+    top_n: Optional[int] = None
+    recommend: bool = False
+
+class ScreenResponse(BaseModel):
+    universe_size: int
+    passed: int
+    results: list[dict]
+    recommendations: list[InvestmentRecommendation] = []
+    processing_time: float
+
+@app.post("/screen", response_model=ScreenResponse)
+async def screen_universe(request: ScreenRequest):
+    validate_criteria(request.criteria)
+    try:
+        start_time = time.time()
+        orchestrator = app.state.orchestrator
+        tickers = request.tickers or load_universe()
+        logger.info(f"Screening {len(tickers)} tickers")
+
+        screener = Screener(data_cache=orchestrator.data_cache)
+        frame = await run_blocking(screener.load_frame, tickers)
+        survivors = screener.screen(frame, request.criteria, request.rank_by, request.ascending)
+        top = survivors.head(request.top_n or config.SCREENING['default_top_n'])
+
+        recommendations = []
+        if request.recommend and not top.empty:
+            selected = list(top['ticker'])[:config.SCREENING['max_recommendations']]
+            recommendations = await orchestrator.process_tickers(selected, request.criteria)
+
+        return ScreenResponse(
+            universe_size=len(frame),
+            passed=len(survivors),
+            results=frame_to_records(top),
+            recommendations=recommendations,
+            processing_time=round(time.time() - start_time, 2)
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error screening universe: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
+
+@app.get("/cache/stats")
+async def get_cache_stats():
+    return cache_stats()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file